@@ -1,6 +1,17 @@
+import logging
+
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        import api.signals  # noqa: F401
+        from api.renderers import JSON_ENCODER
+
+        if JSON_ENCODER != "orjson":
+            logger.warning("orjson is not installed, responses are encoded by DRF's (slower) JSON encoder")
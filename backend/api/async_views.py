@@ -0,0 +1,393 @@
+from typing import Awaitable, Callable, Optional, Type
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from api.renderers import STREAM_CONTENT_TYPES, FastJSONRenderer, arender_stream, render_stream
+from api.views import (
+    ChangesView,
+    PhotographerPhotosView,
+    PhotographersView,
+    PhotographerView,
+    PhotosColorView,
+    PhotosSearchView,
+    PhotosView,
+    PhotoView,
+    check_preconditions,
+)
+from photos.db import (
+    EXPORT_CHUNK_SIZE,
+    DbResult,
+    aget_changes,
+    aget_photograph,
+    aget_photograph_validators,
+    aget_photographer,
+    aget_photographer_validators,
+    aget_photographers,
+    aget_photographers_by_ids,
+    aget_photographers_validators,
+    aget_photographs,
+    aget_photographs_by_color,
+    aget_photographs_by_ids,
+    aget_photographs_validators,
+    aiter_photographs_export,
+    asearch_photographs,
+    iter_photographs_export,
+)
+from photos.events import photo_events
+from photos.validators import (
+    ValidatedData,
+    validate_changes_params,
+    validate_color_params,
+    validate_events_params,
+    validate_export_params,
+    validate_ids_params,
+    validate_page_params,
+    validate_photograph_fields_params,
+    validate_photographer_fields_params,
+    validate_search_params,
+)
+from photos.routers import replica_routing
+from photos.timing import timed
+
+
+class AsyncProtectedView(View):
+    """
+    Async counterpart of `ProtectedView` for read endpoints. GET requests are authenticated with the configured
+    DRF authentication classes (via their `aauthenticate`, if available) and handled entirely on the event loop
+    under ASGI. Any other method implemented by `sync_view` is delegated to that DRF view in a worker thread.
+    Responses are rendered with the same JSON renderer, so bodies are identical to the ones `sync_view` returns.
+    """
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    sync_view: Optional[Type[APIView]] = None
+    renderer = FastJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # auth is token based (as with DRF views), so CSRF checks don't apply
+        view = super().as_view(**initkwargs)
+        cls._sync_view_func = staticmethod(cls.sync_view.as_view()) if cls.sync_view else None
+        return csrf_exempt(view)
+
+    async def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        # delegate writes to the sync DRF view
+        method = request.method.lower()
+        if self.sync_view and not hasattr(self, method) and hasattr(self.sync_view, method):
+            return await sync_to_async(self._sync_view_func)(request, *args, **kwargs)
+
+        # authenticate request, returning error if it is not authenticated
+        if error := await self.authenticate(request):
+            return error
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def authenticate(self, request: HttpRequest) -> Optional[HttpResponse]:
+        """Authenticates the request (setting `request.user` / `request.auth`), returning an error response if not."""
+        authenticators = [authentication_class() for authentication_class in self.authentication_classes]
+        try:
+            with timed("auth"):
+                for authenticator in authenticators:
+                    if hasattr(authenticator, "aauthenticate"):
+                        user_auth = await authenticator.aauthenticate(request)
+                    else:
+                        user_auth = await sync_to_async(authenticator.authenticate)(request)
+                    if user_auth is not None:
+                        request.user, request.auth = user_auth
+                        replica_routing.set_user(request.user.pk)
+                        return None
+                raise exceptions.NotAuthenticated()
+        except exceptions.APIException as exc:
+            # mirror DRF's exception handler, including the `WWW-Authenticate` header
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            headers = {"WWW-Authenticate": authenticators[0].authenticate_header(request)} if authenticators else {}
+            return self.render(
+                data, status=status.HTTP_401_UNAUTHORIZED if headers else status.HTTP_403_FORBIDDEN, headers=headers
+            )
+
+    def render(self, data, status: int, headers: Optional[dict[str, str]] = None) -> HttpResponse:
+        """Returns an HTTP response with `data` rendered as JSON."""
+        content = self.renderer.render(data) if data is not None else b""
+        return HttpResponse(content, status=status, content_type=self.renderer.media_type, headers=headers)
+
+    async def conditional_response(
+        self, request: HttpRequest, validators: Awaitable[DbResult], fetch: Callable[[], Awaitable[DbResult]]
+    ) -> HttpResponse:
+        """Async counterpart of `ProtectedView.conditional_response`."""
+        validators: DbResult = await validators
+        if not validators.success:
+            return self.render(validators.errors, status=validators.http_code)
+
+        # return 304 (or 412) if request preconditions say the client's copy is current
+        precondition_status, headers = check_preconditions(request, validators.result)
+        if precondition_status:
+            return self.render(None, status=precondition_status, headers=headers)
+
+        # fetch and return result, returning error if something went wrong
+        result: DbResult = await fetch()
+        if not result.success:
+            return self.render(result.errors, status=result.http_code)
+        return self.render(result.result, status=status.HTTP_200_OK, headers=headers)
+
+    def batch_response(self, result: DbResult) -> HttpResponse:
+        """Async counterpart of `ProtectedView.batch_response`."""
+        if not result.success:
+            return self.render(result.errors, status=result.http_code)
+        return self.render(result.result, status=status.HTTP_200_OK)
+
+
+class AsyncPhotographersView(AsyncProtectedView):
+    """
+    Async view for Photographers records (all of them, or the ones requested by `?ids=`).
+    """
+
+    sync_view = PhotographersView
+
+    async def get(self, request: HttpRequest):
+        # validate incoming pagination and sparse fieldset params
+        page_params: ValidatedData = validate_page_params(request.GET.dict())
+        if not page_params.success:
+            return self.render(page_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photographer_fields_params(request.GET.dict())
+        if not fields_params.success:
+            return self.render(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids_params: ValidatedData = validate_ids_params(request.GET.dict())
+        if not ids_params.success:
+            return self.render(ids_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return the requested photographer records (`?ids=`) rather than a page, if provided
+        options: dict = fields_params.data.read_options()
+        if ids_params.data.ids is not None:
+            return self.batch_response(await aget_photographers_by_ids(ids_params.data.ids, **options))
+
+        # return page of photographer records (or 304 if unchanged), returning error if something went wrong
+        page: dict = page_params.data.model_dump()
+        return await self.conditional_response(
+            request, aget_photographers_validators(**page, **options), lambda: aget_photographers(**page, **options)
+        )
+
+
+class AsyncPhotographerView(AsyncProtectedView):
+    """
+    Async view for getting a specific Photographer record.
+    """
+
+    sync_view = PhotographerView
+
+    async def get(self, request: HttpRequest, photographer_id: int):
+        # validate incoming sparse fieldset params
+        fields_params: ValidatedData = validate_photographer_fields_params(request.GET.dict())
+        if not fields_params.success:
+            return self.render(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # get and return photographer by ID (or 304 if unchanged), returning error if something went wrong
+        options: dict = fields_params.data.read_options()
+        return await self.conditional_response(
+            request,
+            aget_photographer_validators(photographer_id, **options),
+            lambda: aget_photographer(photographer_id, **options),
+        )
+
+
+class AsyncPhotographerPhotosView(AsyncProtectedView):
+    """
+    Async view to retrieve all photos related to the provided `photographer_id`.
+    """
+
+    sync_view = PhotographerPhotosView
+
+    async def get(self, request: HttpRequest, photographer_id: int):
+        # validate incoming pagination and sparse fieldset params
+        page_params: ValidatedData = validate_page_params(request.GET.dict())
+        if not page_params.success:
+            return self.render(page_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.GET.dict())
+        if not fields_params.success:
+            return self.render(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return page of photographs by Photographer (or 304 if unchanged), returning error if something went wrong
+        page: dict = page_params.data.model_dump()
+        options: dict = fields_params.data.read_options()
+        return await self.conditional_response(
+            request,
+            aget_photographs_validators(photographer_id=photographer_id, **page, **options),
+            lambda: aget_photographs(photographer_id=photographer_id, **page, **options),
+        )
+
+
+class AsyncPhotosView(AsyncProtectedView):
+    """
+    Async view to list all photos (or the ones requested by `?ids=`). Creating a new photo is delegated to
+    `PhotosView`.
+    """
+
+    sync_view = PhotosView
+
+    async def get(self, request: HttpRequest):
+        # validate incoming pagination and sparse fieldset params
+        page_params: ValidatedData = validate_page_params(request.GET.dict())
+        if not page_params.success:
+            return self.render(page_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.GET.dict())
+        if not fields_params.success:
+            return self.render(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids_params: ValidatedData = validate_ids_params(request.GET.dict())
+        if not ids_params.success:
+            return self.render(ids_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return the requested photograph records (`?ids=`) rather than a page, if provided
+        options: dict = fields_params.data.read_options()
+        if ids_params.data.ids is not None:
+            return self.batch_response(await aget_photographs_by_ids(ids_params.data.ids, **options))
+
+        # return page of photograph records (or 304 if unchanged), returning error if something went wrong
+        page: dict = page_params.data.model_dump()
+        return await self.conditional_response(
+            request, aget_photographs_validators(**page, **options), lambda: aget_photographs(**page, **options)
+        )
+
+
+class AsyncPhotoView(AsyncProtectedView):
+    """
+    Async view to retrieve a Photograph instance. Updates are delegated to `PhotoView`.
+    """
+
+    sync_view = PhotoView
+
+    async def get(self, request: HttpRequest, photo_id: int):
+        # validate incoming sparse fieldset params
+        fields_params: ValidatedData = validate_photograph_fields_params(request.GET.dict())
+        if not fields_params.success:
+            return self.render(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # get photograph record by provided ID (or 304 if unchanged), returning error if something went wrong
+        options: dict = fields_params.data.read_options()
+        return await self.conditional_response(
+            request, aget_photograph_validators(photo_id, **options), lambda: aget_photograph(photo_id, **options)
+        )
+
+
+class AsyncPhotosSearchView(AsyncProtectedView):
+    """
+    Async view to search photos by title and alt text (`?q=`), best matches first.
+    """
+
+    sync_view = PhotosSearchView
+
+    async def get(self, request: HttpRequest):
+        # validate incoming search (and pagination) and sparse fieldset params
+        search_params: ValidatedData = validate_search_params(request.GET.dict())
+        if not search_params.success:
+            return self.render(search_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.GET.dict())
+        if not fields_params.success:
+            return self.render(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return page of matching photograph records, returning error if something went wrong
+        result: DbResult = await asearch_photographs(
+            **search_params.data.model_dump(), **fields_params.data.read_options()
+        )
+        if not result.success:
+            return self.render(result.errors, status=result.http_code)
+        return self.render(result.result, status=status.HTTP_200_OK)
+
+
+class AsyncPhotosColorView(AsyncProtectedView):
+    """
+    Async view to find the photos with the average colors nearest to a hex color (`?color=`), nearest first.
+    """
+
+    sync_view = PhotosColorView
+
+    async def get(self, request: HttpRequest):
+        # validate incoming color and sparse fieldset params
+        color_params: ValidatedData = validate_color_params(request.GET.dict())
+        if not color_params.success:
+            return self.render(color_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.GET.dict())
+        if not fields_params.success:
+            return self.render(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return nearest photograph records, returning error if something went wrong
+        result: DbResult = await aget_photographs_by_color(
+            **color_params.data.model_dump(), **fields_params.data.read_options()
+        )
+        if not result.success:
+            return self.render(result.errors, status=result.http_code)
+        return self.render(result.result, status=status.HTTP_200_OK)
+
+
+class AsyncChangesView(AsyncProtectedView):
+    """
+    Async view of the change feed: the photos and photographers created or updated, and the ones deleted, since
+    the cursor of the previous sync (`?since=`).
+    """
+
+    sync_view = ChangesView
+
+    async def get(self, request: HttpRequest):
+        # validate incoming change feed params
+        changes_params: ValidatedData = validate_changes_params(request.GET.dict())
+        if not changes_params.success:
+            return self.render(changes_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return changes since the cursor, returning error if something went wrong
+        result: DbResult = await aget_changes(**changes_params.data.model_dump())
+        if not result.success:
+            return self.render(result.errors, status=result.http_code)
+        return self.render(result.result, status=status.HTTP_200_OK)
+
+
+class AsyncPhotosExportView(AsyncProtectedView):
+    """
+    Async view streaming the whole photo catalog (optionally filtered by `?photographer_id=`) ordered by ID, as
+    NDJSON (`?format=ndjson`, default) or a JSON array (`?format=json`). Interrupted exports can be resumed by
+    passing the ID of the last record received as `?after_id=`.
+    """
+
+    async def get(self, request: HttpRequest):
+        # validate incoming export params
+        export_params: ValidatedData = validate_export_params(request.GET.dict())
+        if not export_params.success:
+            return self.render(export_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # stream from an async generator under ASGI; WSGI servers would buffer an async one, so use a sync one there
+        export: dict = export_params.data.model_dump(exclude={"format"})
+        format: str = export_params.data.format
+        if isinstance(request, ASGIRequest):
+            content = arender_stream(aiter_photographs_export(**export), format, EXPORT_CHUNK_SIZE)
+        else:
+            content = render_stream(iter_photographs_export(**export), format, EXPORT_CHUNK_SIZE)
+        return StreamingHttpResponse(content, content_type=STREAM_CONTENT_TYPES[format])
+
+
+class AsyncPhotoEventsView(AsyncProtectedView):
+    """
+    Async view pushing photo create and update events (optionally only for `?photographer_id=`) as server-sent
+    events, so clients don't poll the list endpoints for new photos. Events hold IDs, the records are fetched via
+    `?ids=`. A `resync` event ends the stream when the client falls behind; it should then catch up via the change
+    feed before subscribing again. Requires ASGI, as every open stream would hold a WSGI worker thread.
+    """
+
+    async def get(self, request: HttpRequest):
+        # validate incoming event stream params
+        events_params: ValidatedData = validate_events_params(request.GET.dict())
+        if not events_params.success:
+            return self.render(events_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(request, ASGIRequest) or not photo_events.enabled:
+            error = {"type": "not_implemented", "loc": (), "msg": "Live events are not available on this server."}
+            return self.render([error], status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        return StreamingHttpResponse(
+            photo_events.stream(**events_params.data.model_dump()),
+            content_type="text/event-stream",
+            # keep proxies from buffering the stream
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
@@ -1,3 +1,4 @@
+from functools import cached_property
 from typing import Optional, Tuple
 import os
 
@@ -6,6 +7,12 @@ from rest_framework import exceptions
 from rest_framework.authentication import BaseAuthentication, get_authorization_header
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from api.token_cache import token_cache
 
 EXTERNAL_PUBLIC_KEY = os.environ.get("API_JWT_PUBLIC_KEY")
 EXTERNAL_ISSUER = "frontend.photos"
@@ -15,7 +22,36 @@ EXTERNAL_AUDIENCE = "backend.photos"
 class LocalJWTAuthentication(JWTAuthentication):
     """Validates tokens we issue via /api/token/ using SIMPLE_JWT settings."""
 
-    pass
+    async def aauthenticate(self, request) -> Optional[Tuple[object, Token]]:
+        """Async counterpart of `authenticate`, used by async views so the user lookup runs on the event loop."""
+        # token validation is CPU only, only the user lookup needs to be awaited
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token: Token) -> object:
+        """Async counterpart of `get_user`, applying the same SIMPLE_JWT user checks."""
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("Token contained no recognizable user identification") from e
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed("User not found", code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        return user
 
 
 class ExternalJWTAuthentication(BaseAuthentication):
@@ -24,39 +60,90 @@ class ExternalJWTAuthentication(BaseAuthentication):
     If validation fails, return None so DRF can try the next backend.
     """
 
-    token_backend = TokenBackend(
-        algorithm="RS256",
-        signing_key=None,
-        verifying_key=EXTERNAL_PUBLIC_KEY,
-        audience=EXTERNAL_AUDIENCE,
-        issuer=EXTERNAL_ISSUER,
-        leeway=30,
-    )
+    @cached_property
+    def token_backend(self) -> TokenBackend:
+        # built on first use, as RS256 needs `cryptography` (so this module stays importable without it)
+        return TokenBackend(
+            algorithm="RS256",
+            signing_key=None,
+            verifying_key=EXTERNAL_PUBLIC_KEY,
+            audience=EXTERNAL_AUDIENCE,
+            issuer=EXTERNAL_ISSUER,
+            leeway=30,
+        )
 
     def authenticate(self, request) -> Optional[Tuple[object, None]]:
+        raw = self._get_raw_token(request)
+        if raw is None:
+            return None
+
+        # tokens are reused across requests, so serve repeats from the cache (skipping both the decode and the query)
+        key = token_cache.digest(raw)
+        entry = token_cache.get(key)
+        if entry is not None:
+            return (entry.user, None)
+
+        # attempt to decode the token, letting the next backend try if it's not ours
+        claims = self._decode(raw)
+        if claims is None:
+            return None
+
+        # ensure parity with User table
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(**self._get_user_lookup(claims))
+        self._cache(key, claims, user)
+        return (user, None)
+
+    async def aauthenticate(self, request) -> Optional[Tuple[object, None]]:
+        """Async counterpart of `authenticate`, used by async views so the user lookup runs on the event loop."""
+        raw = self._get_raw_token(request)
+        if raw is None:
+            return None
+
+        key = token_cache.digest(raw)
+        entry = token_cache.get(key)
+        if entry is not None:
+            return (entry.user, None)
+
+        claims = self._decode(raw)
+        if claims is None:
+            return None
+
+        # ensure parity with User table
+        User = get_user_model()
+        user, _ = await User.objects.aget_or_create(**self._get_user_lookup(claims))
+        self._cache(key, claims, user)
+        return (user, None)
+
+    def _get_raw_token(self, request) -> Optional[str]:
+        """Returns the bearer token in the request, or None if there is no Authorization header."""
         # make sure we have an auth header
         auth = get_authorization_header(request).decode("utf-8")
         if not auth.startswith("Bearer "):
             return None
+        return auth.split(" ", 1)[1]
 
-        # attempt to decode the token
-        raw = auth.split(" ", 1)[1]
+    def _decode(self, raw: str) -> Optional[dict]:
+        """Returns the verified claims of the external token `raw`, or None if it isn't a valid one."""
         try:
-            claims = self.token_backend.decode(raw, verify=True)
+            return self.token_backend.decode(raw, verify=True)
         except Exception:
             # Not a valid external token; let the next backend try (e.g., LocalJWTAuthentication).
             return None
 
+    def _cache(self, key: bytes, claims: dict, user: object):
+        """Caches the verified `claims` and resolved `user` of a token, until it expires (less the leeway)."""
+        # tokens without an expiry are verified on every request
+        if "exp" not in claims:
+            return
+        token_cache.set(key, claims, user, claims["exp"] - self.token_backend.get_leeway().total_seconds())
+
+    def _get_user_lookup(self, claims: dict) -> dict:
+        """Returns the `get_or_create` arguments mapping the external identity in `claims` to a Django user."""
         # Map external identity to a Django user
         sub = claims.get("sub") or claims.get("user_id") or claims.get("uid")
         if not sub:
             raise exceptions.AuthenticationFailed("Missing subject claim")
 
-        # ensure parity with User table
         email = claims.get("email")
-        User = get_user_model()
-        user, _ = User.objects.get_or_create(
-            username=f"ext:{sub}",
-            defaults={"email": email or "", "is_active": True},
-        )
-        return (user, None)
+        return {"username": f"ext:{sub}", "defaults": {"email": email or "", "is_active": True}}
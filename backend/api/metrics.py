@@ -0,0 +1,309 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Iterator
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from photos.coalescing import single_flight
+from photos.timing import DB_PHASE, RequestTimings, start_timings, stop_timings
+
+DEFAULT_METRICS_SETTINGS = {
+    "ENABLED": True,
+    "SERVER_TIMING": True,
+    "BUCKETS": (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    "QUERY_BUCKETS": (0, 1, 2, 3, 5, 10, 25, 50, 100),
+}
+"""Defaults for the `API_METRICS` setting (see `backend/settings.py`)."""
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""Content type of the Prometheus text exposition format served by `api.views.MetricsView`."""
+
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+"""Methods recorded as is, any other method is recorded as `OTHER` (so clients can't blow up label cardinality)."""
+
+UNMATCHED_ROUTE = "unmatched"
+"""Route recorded for requests that didn't resolve to a URL pattern."""
+
+POOL_METRICS: dict[str, tuple[str, str, str, int | float]] = {
+    "pool_size": ("api_db_pool_connections", "gauge", "Connections open (in use or idle).", 1),
+    "pool_available": ("api_db_pool_idle_connections", "gauge", "Idle connections, ready to be handed out.", 1),
+    "pool_min": ("api_db_pool_min_connections", "gauge", "Connections kept open even when idle.", 1),
+    "pool_max": ("api_db_pool_max_connections", "gauge", "Connections the pool may open.", 1),
+    "requests_waiting": ("api_db_pool_requests_waiting", "gauge", "Requests waiting for a connection.", 1),
+    "requests_num": ("api_db_pool_requests_total", "counter", "Connections requested from the pool.", 1),
+    "requests_queued": ("api_db_pool_requests_queued_total", "counter", "Requests that had to wait.", 1),
+    "requests_wait_ms": ("api_db_pool_wait_seconds_total", "counter", "Time spent waiting for connections.", 0.001),
+    "requests_errors": ("api_db_pool_requests_errors_total", "counter", "Requests that timed out waiting.", 1),
+    "usage_ms": ("api_db_pool_usage_seconds_total", "counter", "Time connections were in use.", 0.001),
+    "returns_bad": ("api_db_pool_returns_bad_total", "counter", "Connections returned in a bad state.", 1),
+    "connections_num": ("api_db_pool_connections_opened_total", "counter", "Connections opened.", 1),
+    "connections_ms": ("api_db_pool_connect_seconds_total", "counter", "Time spent opening connections.", 0.001),
+    "connections_errors": ("api_db_pool_connections_errors_total", "counter", "Failed connection attempts.", 1),
+    "connections_lost": ("api_db_pool_connections_lost_total", "counter", "Connections that failed checks.", 1),
+}
+"""
+Prometheus metric name, type, help and unit scale for each stat of the psycopg connection pools (see
+`get_pool_stats`). Counters accumulate from the moment the pool was opened.
+"""
+
+
+class Histogram:
+    """Prometheus style histogram: the number of observations at or below each of `buckets`, with their sum."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        # the last count holds observations above every bucket (the `+Inf` bucket)
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self) -> Iterator[tuple[str, int]]:
+        """Yields the `le` label and cumulative count of every bucket, ending with `+Inf`."""
+        total = 0
+        for bound, count in zip((*map(str, self.buckets), "+Inf"), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    """
+    Thread-safe, in-process aggregate of the requests handled by this worker, per route (URL pattern) and method:
+    request counts by status, histograms of their duration and of the time spent in each phase (see
+    `photos.timing`), and a histogram of the number of queries they executed. Rendered in the Prometheus text
+    format by `render`. Each worker process keeps its own registry, so each one has to be scraped.
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float, ...],
+        query_buckets: tuple[int, ...],
+        enabled: bool = True,
+        server_timing: bool = True,
+    ):
+        self.buckets = buckets
+        self.query_buckets = query_buckets
+        self.enabled = enabled
+        # whether `MetricsMiddleware` also adds a `Server-Timing` header to responses
+        self.server_timing = server_timing
+        self._requests: dict[tuple[str, str, int], int] = {}
+        self._durations: dict[tuple[str, str], Histogram] = {}
+        self._phases: dict[tuple[str, str, str], Histogram] = {}
+        self._queries: dict[tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, method: str, status: int, duration: float, timings: RequestTimings):
+        """Records a request to `route`, which took `duration` seconds, with the phase `timings` it recorded."""
+        key = (route, method)
+        with self._lock:
+            self._requests[(route, method, status)] = self._requests.get((route, method, status), 0) + 1
+            self._histogram(self._durations, key, self.buckets).observe(duration)
+            self._histogram(self._queries, key, self.query_buckets).observe(timings.queries)
+            for phase, seconds in timings.phases.items():
+                self._histogram(self._phases, (route, method, phase), self.buckets).observe(seconds)
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format."""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            durations = sorted((key, self._copy(histogram)) for key, histogram in self._durations.items())
+            phases = sorted((key, self._copy(histogram)) for key, histogram in self._phases.items())
+            queries = sorted((key, self._copy(histogram)) for key, histogram in self._queries.items())
+
+        lines: list[str] = [
+            "# HELP api_requests_total Requests handled, by route, method and response status.",
+            "# TYPE api_requests_total counter",
+        ]
+        for (route, method, status), count in requests:
+            lines.append(f"api_requests_total{_labels(route=route, method=method, status=status)} {count}")
+        lines.extend(
+            _render_histograms(
+                "api_request_duration_seconds",
+                "Time spent handling requests (until the response is returned, not streamed), by route and method.",
+                ((dict(route=route, method=method), histogram) for (route, method), histogram in durations),
+            )
+        )
+        lines.extend(
+            _render_histograms(
+                "api_request_phase_seconds",
+                "Time spent in each phase of a request (auth, validate, db, serialize, render), by route and method.",
+                (
+                    (dict(route=route, method=method, phase=phase), histogram)
+                    for (route, method, phase), histogram in phases
+                ),
+            )
+        )
+        lines.extend(
+            _render_histograms(
+                "api_request_queries",
+                "Database queries executed per request, by route and method.",
+                ((dict(route=route, method=method), histogram) for (route, method), histogram in queries),
+            )
+        )
+        reads = single_flight.counters()
+        if reads:
+            lines.extend(_render_read_coalescing(reads))
+        pools = get_pool_stats()
+        if pools:
+            for stat, (name, type, help, scale) in POOL_METRICS.items():
+                lines.extend((f"# HELP {name} {help}", f"# TYPE {name} {type}"))
+                lines.extend(f"{name}{_labels(alias=alias)} {stats[stat] * scale}" for alias, stats in pools.items())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Drops every recorded metric."""
+        with self._lock:
+            self._requests.clear()
+            self._durations.clear()
+            self._phases.clear()
+            self._queries.clear()
+
+    @staticmethod
+    def _histogram(histograms: dict, key: tuple, buckets: tuple) -> Histogram:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    @staticmethod
+    def _copy(histogram: Histogram) -> Histogram:
+        copy = Histogram(histogram.buckets)
+        copy.counts, copy.sum = list(histogram.counts), histogram.sum
+        return copy
+
+
+def _labels(**labels) -> str:
+    """Returns the Prometheus label set for `labels`, escaping their values."""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    """Escapes a label value, as required by the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histograms(name: str, help: str, histograms) -> Iterator[str]:
+    """Yields the lines of histogram metric `name` with the provided (labels, histogram) pairs."""
+    yield f"# HELP {name} {help}"
+    yield f"# TYPE {name} histogram"
+    for labels, histogram in histograms:
+        for bound, count in histogram.samples():
+            yield f"{name}_bucket{_labels(**labels, le=bound)} {count}"
+        yield f"{name}_sum{_labels(**labels)} {histogram.sum}"
+        yield f"{name}_count{_labels(**labels)} {sum(histogram.counts)}"
+
+
+def _render_read_coalescing(reads: dict[str, tuple[int, int]]) -> Iterator[str]:
+    """Yields the lines of the read coalescing metrics (see `photos.coalescing`), by read."""
+    yield "# HELP api_reads_total Reads in photos.db that missed the cache, by read."
+    yield "# TYPE api_reads_total counter"
+    yield from (f"api_reads_total{_labels(read=read)} {calls}" for read, (calls, _) in reads.items())
+    yield "# HELP api_reads_coalesced_total Reads that waited for an identical read in flight, by read."
+    yield "# TYPE api_reads_coalesced_total counter"
+    yield from (f"api_reads_coalesced_total{_labels(read=read)} {coalesced}" for read, (_, coalesced) in reads.items())
+    yield "# HELP api_reads_coalescing_ratio Share of the reads that waited for an identical read in flight, by read."
+    yield "# TYPE api_reads_coalescing_ratio gauge"
+    for read, (calls, coalesced) in reads.items():
+        yield f"api_reads_coalescing_ratio{_labels(read=read)} {coalesced / calls if calls else 0.0}"
+
+
+def get_pool_stats() -> dict[str, dict[str, int]]:
+    """
+    Returns the stats of the connection pool of every pooled database (see `DATABASE_POOL` in `backend/settings.py`)
+    in this process, by alias. Includes each stat in `POOL_METRICS`, as psycopg leaves out counters that are zero.
+    """
+    stats: dict[str, dict[str, int]] = {}
+    for alias in connections:
+        # only the PostgreSQL backend has a `pool`, and only if pooling is configured
+        pool = getattr(connections[alias], "pool", None)
+        if pool is not None:
+            stats[alias] = {**dict.fromkeys(POOL_METRICS, 0), **pool.get_stats()}
+    return stats
+
+
+def format_server_timing(timings: RequestTimings, duration: float) -> str:
+    """Returns the `Server-Timing` header value for the phase `timings` of a request which took `duration`."""
+    metrics: list[str] = []
+    for phase, seconds in timings.phases.items():
+        metric = f"{phase};dur={seconds * 1000:.2f}"
+        if phase == DB_PHASE:
+            metric += f';desc="{timings.queries} queries"'
+        metrics.append(metric)
+    metrics.append(f"total;dur={duration * 1000:.2f}")
+    return ", ".join(metrics)
+
+
+class MetricsMiddleware:
+    """
+    Times every request and the phases recorded during it (see `photos.timing`), adding a `Server-Timing`
+    header with them to the response (if `SERVER_TIMING` is enabled) and recording them in `metrics`.
+    Supports both WSGI and ASGI; should be the first middleware, so the total covers the others as well.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not metrics.enabled:
+            return self.get_response(request)
+
+        timings, token = start_timings()
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_timings(token)
+        return self.finish(request, response, timings, perf_counter() - start)
+
+    async def __acall__(self, request: HttpRequest):
+        if not metrics.enabled:
+            return await self.get_response(request)
+
+        timings, token = start_timings()
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_timings(token)
+        return self.finish(request, response, timings, perf_counter() - start)
+
+    def finish(self, request: HttpRequest, response: HttpResponse, timings: RequestTimings, duration: float):
+        """Records the request in `metrics`, and adds the `Server-Timing` header to its `response`."""
+        match = request.resolver_match
+        route: str = match.route if match and match.route else UNMATCHED_ROUTE
+        method: str = request.method if request.method in METHODS else "OTHER"
+        metrics.record(route, method, response.status_code, duration, timings)
+        if metrics.server_timing:
+            response["Server-Timing"] = format_server_timing(timings, duration)
+        return response
+
+
+def _build_metrics() -> MetricsRegistry:
+    """Builds the module level registry from the `API_METRICS` setting."""
+    config = {**DEFAULT_METRICS_SETTINGS, **getattr(settings, "API_METRICS", {})}
+    return MetricsRegistry(
+        buckets=tuple(config["BUCKETS"]),
+        query_buckets=tuple(config["QUERY_BUCKETS"]),
+        enabled=config["ENABLED"],
+        server_timing=config["SERVER_TIMING"],
+    )
+
+
+metrics = _build_metrics()
+"""Per route request metrics of this process, recorded by `MetricsMiddleware` and served at `/api/v1/metrics`."""
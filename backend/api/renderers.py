@@ -0,0 +1,120 @@
+import secrets
+from functools import partial
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from rest_framework.renderers import JSONRenderer
+
+from photos.renderings import RenderedRecord
+from photos.timing import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - declared dependency, DRF's encoder is only a safety net
+    orjson = None
+
+JSON_ENCODER = "drf" if orjson is None else "orjson"
+"""Encoder `FastJSONRenderer` uses for the payloads it supports, reported by `/api/v1/health`."""
+
+
+RENDERED_MARKER = f"\x00rendered:{secrets.token_hex(8)}"
+"""Placeholder encoded in place of each `RenderedRecord`, unguessable so that no string in a payload matches it."""
+
+
+def _unsupported(rendered: list[bytes], obj: Any):
+    # records rendered ahead of time are spliced in once encoded, as orjson can't embed raw JSON
+    if isinstance(obj, RenderedRecord):
+        rendered.append(obj.content.encode("utf-8"))
+        return RENDERED_MARKER
+    # anything orjson would encode differently from DRF's encoder (datetimes, dataclasses, lazy strings, etc.)
+    raise TypeError
+
+
+def _splice(content: bytes, rendered: list[bytes]) -> bytes:
+    """Replaces the placeholders in `content` with the `rendered` records, in the order they were encoded."""
+    parts: list[bytes] = content.split(orjson.dumps(RENDERED_MARKER))
+    spliced: list[bytes] = [parts[0]]
+    for record, part in zip(rendered, parts[1:], strict=True):
+        spliced += (record, part)
+    return b"".join(spliced)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes compact, unicode JSON with orjson (when installed), producing the same bytes as
+    DRF's JSONRenderer for the payloads this API returns (strings, ints, bools, nulls, lists and dicts).
+    Anything else orjson would encode differently, along with indented or ASCII-only output, falls back to DRF's
+    encoder. Floats are encoded by orjson as well, but with unsigned exponents (`1e16` rather than `1e+16`).
+    Records served from their stored renderings (see `photos.renderings`) are copied into the output as is.
+    """
+
+    @timed("render")
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        rendered: list[bytes] = []
+        try:
+            content: bytes = orjson.dumps(
+                data,
+                default=partial(_unsupported, rendered),
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if rendered:
+            content = _splice(content, rendered)
+
+        # escape \u2028 and \u2029 like DRF does, so the output stays a strict javascript subset
+        return content.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+
+
+STREAM_CONTENT_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+"""Content type of each format supported by `render_stream`."""
+
+
+def render_stream(rows: Iterable[Any], format: str, batch_size: int) -> Iterator[bytes]:
+    """
+    Renders `rows` as NDJSON (one JSON document per line) or as a JSON array (depending on `format`), for
+    a streaming response. Rows are rendered and yielded `batch_size` at a time, to avoid a write per row.
+    """
+    renderer = FastJSONRenderer()
+    if format == "json":
+        yield b"["
+    batch: list[Any] = []
+    first = True
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield _render_stream_batch(renderer, batch, format, first)
+            batch, first = [], False
+    if batch:
+        yield _render_stream_batch(renderer, batch, format, first)
+    if format == "json":
+        yield b"]"
+
+
+async def arender_stream(rows: AsyncIterable[Any], format: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Async counterpart of `render_stream`."""
+    renderer = FastJSONRenderer()
+    if format == "json":
+        yield b"["
+    batch: list[Any] = []
+    first = True
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield _render_stream_batch(renderer, batch, format, first)
+            batch, first = [], False
+    if batch:
+        yield _render_stream_batch(renderer, batch, format, first)
+    if format == "json":
+        yield b"]"
+
+
+def _render_stream_batch(renderer: JSONRenderer, rows: list[Any], format: str, first: bool) -> bytes:
+    """Renders a batch of `rows` for `render_stream`."""
+    if format == "ndjson":
+        return b"".join(renderer.render(row) + b"\n" for row in rows)
+    return (b"" if first else b",") + b",".join(renderer.render(row) for row in rows)
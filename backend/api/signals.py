@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.token_cache import token_cache
+
+UserModel = get_user_model()
+
+
+@receiver(post_save, sender=UserModel)
+@receiver(post_delete, sender=UserModel)
+def on_user_changed(sender, instance, **kwargs):
+    """
+    Drops cached tokens resolved to the saved or deleted User, so the next request re-resolves it (e.g. picking
+    up deactivation). Drops them immediately and again once the transaction commits, like `photos.signals`.
+    """
+    user_id = instance.pk
+    token_cache.invalidate_user(user_id)
+    transaction.on_commit(lambda: token_cache.invalidate_user(user_id))
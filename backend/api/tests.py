@@ -1,3 +1,577 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.test import TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.auth import EXTERNAL_AUDIENCE, EXTERNAL_ISSUER, ExternalJWTAuthentication
+from api.metrics import Histogram, get_pool_stats, metrics
+from api.renderers import FastJSONRenderer
+from api.token_cache import TokenCache, token_cache
+from api.urls import urlpatterns
+from photos.cache import photo_cache
+from photos.coalescing import single_flight
+from photos.color_index import color_index
+from photos.events import PHOTO_CREATED, photo_event, photo_events
+from photos.models import Photograph, Photographer, PhotoSource
+from photos.renderings import RenderedRecord, encode
+from photos.validators import MAX_BATCH_IDS
+
+UserModel = get_user_model()
+
+QUERY_BUDGETS: dict[tuple[str, str], int] = {
+    ("token/", "post"): 1,
+    ("token/refresh/", "post"): 1,
+    ("token/verify/", "post"): 0,
+    ("photographers", "get"): 3,
+    ("photographers/<int:photographer_id>", "get"): 3,
+    ("photographers/<int:photographer_id>/photos", "get"): 3,
+    ("photos", "get"): 3,
+    ("photos", "post"): 8,  # includes the savepoint around the photo and its source
+    ("photos/bulk", "post"): 8,
+    ("photos/color", "get"): 3,
+    ("photos/events", "get"): 1,
+    ("photos/export", "get"): 2,
+    ("photos/search", "get"): 2,
+    ("photos/<int:photo_id>", "get"): 3,
+    ("photos/<int:photo_id>", "put"): 7,
+    ("photos/<int:photo_id>", "patch"): 5,
+    ("changes", "get"): 4,
+    ("health", "get"): 0,
+    ("metrics", "get"): 0,
+}
+"""
+Query budget per (route, method) in `api/urls.py`, including the query made by JWT auth (and the savepoints
+wrapped around atomic writes in tests). Budgets are asserted exactly, so both regressions and improvements
+must be recorded here. They must not depend on the number of rows involved; every route needs an entry.
+"""
+
+PHOTO_COUNT = 10
+"""Number of photos seeded per test, enough for any per-row query to blow through a budget."""
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class QueryBudgetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserModel.objects.create_user(username="budget", email="budget@example.com", password="secret")
+        cls.photographer = Photographer.objects.get(user=cls.user)
+        cls.photos = []
+        for n in range(PHOTO_COUNT):
+            url = f"https://images.example.com/photos/{n}.jpeg"
+            photo = Photograph.objects.create(title=f"photo {n}", url=url, photographer=cls.photographer)
+            PhotoSource.objects.create(photograph=photo, original=url)
+            cls.photos.append(photo)
+
+    def setUp(self):
+        # budgets cover the uncached path, cached reads are covered by `test_cached_reads`
+        photo_cache.clear()
+        color_index.clear()
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}")
+
+    def assertWithinBudget(self, route: str, method: str, path: str, data=None, expected_status: int = 200):
+        with self.assertNumQueries(QUERY_BUDGETS[(route, method)]):
+            response = getattr(self.client, method)(f"/api/v1/{path}", data=data, format="json")
+            # streamed responses only query the database as they are consumed (and can only be consumed once)
+            content = response.getvalue()
+            if response.streaming:
+                response.streaming_content = [content]
+        self.assertEqual(response.status_code, expected_status, content)
+        return response
+
+    def test_every_route_has_a_budget(self):
+        for pattern in urlpatterns:
+            # async views delegate any method they don't implement to their sync view
+            view_classes = [pattern.callback.view_class, getattr(pattern.callback.view_class, "sync_view", None)]
+            methods = {
+                m
+                for view_cls in filter(None, view_classes)
+                for m in view_cls.http_method_names
+                if m not in ("options", "head") and hasattr(view_cls, m)
+            }
+            for method in methods:
+                self.assertIn((str(pattern.pattern), method), QUERY_BUDGETS)
+
+    def test_token_routes(self):
+        self.client.credentials()
+        self.assertWithinBudget("token/", "post", "token/", {"username": "budget", "password": "secret"})
+        self.assertWithinBudget("token/refresh/", "post", "token/refresh/", {"refresh": str(self.refresh)})
+        self.assertWithinBudget("token/verify/", "post", "token/verify/", {"token": str(self.refresh.access_token)})
+
+    def test_photographer_routes(self):
+        pid = self.photographer.id
+        self.assertWithinBudget("photographers", "get", "photographers")
+        self.assertWithinBudget("photographers/<int:photographer_id>", "get", f"photographers/{pid}")
+        response = self.assertWithinBudget(
+            "photographers/<int:photographer_id>/photos", "get", f"photographers/{pid}/photos"
+        )
+        self.assertEqual(len(response.json()["results"]), PHOTO_COUNT)
+
+    def test_photo_routes(self):
+        response = self.assertWithinBudget("photos", "get", "photos")
+        self.assertEqual(len(response.json()["results"]), PHOTO_COUNT)
+        self.assertWithinBudget("photos/<int:photo_id>", "get", f"photos/{self.photos[0].id}")
+
+    def test_export(self):
+        ids = [photo.id for photo in self.photos]
+        response = self.assertWithinBudget("photos/export", "get", "photos/export")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in response.getvalue().splitlines()]
+        self.assertEqual([row["id"] for row in rows], ids)
+        self.assertEqual(rows[0], self.client.get(f"/api/v1/photos/{ids[0]}").json())
+
+        # resumes after the given ID, optionally filtered by photographer, as a JSON array
+        query = f"photos/export?format=json&after_id={ids[4]}&photographer_id={self.photographer.id}"
+        response = self.assertWithinBudget("photos/export", "get", query)
+        self.assertEqual([row["id"] for row in json.loads(response.getvalue())], ids[5:])
+        self.assertEqual(self.client.get("/api/v1/photos/export?format=csv").status_code, 400)
+
+    async def test_export_async(self):
+        response = await self.async_client.get(
+            "/api/v1/photos/export?format=json", headers={"Authorization": f"Bearer {self.refresh.access_token}"}
+        )
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([row["id"] for row in json.loads(content)], [photo.id for photo in self.photos])
+
+    def test_events(self):
+        # WSGI workers can't hold event streams open
+        self.assertWithinBudget("photos/events", "get", "photos/events", expected_status=501)
+        self.assertEqual(self.client.get("/api/v1/photos/events?photographer_id=0").status_code, 400)
+
+    async def test_events_async(self):
+        response = await self.async_client.get(
+            "/api/v1/photos/events", headers={"Authorization": f"Bearer {self.refresh.access_token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+    def test_sparse_fields(self):
+        photo = self.photos[0]
+        response = self.assertWithinBudget("photos", "get", "photos?fields=id,source.tiny&limit=1")
+        self.assertEqual(response.json()["results"], [{"id": photo.id, "source": {"tiny": None}}])
+        response = self.assertWithinBudget("photos/<int:photo_id>", "get", f"photos/{photo.id}?expand=photographer")
+        self.assertEqual(response.json()["photographer"]["user"]["username"], "budget")
+        path = f"photographers/{self.photographer.id}?fields=user.email"
+        response = self.assertWithinBudget("photographers/<int:photographer_id>", "get", path)
+        self.assertEqual(response.json(), {"user": {"email": "budget@example.com"}})
+        response = self.client.get("/api/v1/photos?fields=id,photographer.user.password")
+        self.assertEqual(response.status_code, 400)
+
+    def test_search(self):
+        response = self.assertWithinBudget("photos/search", "get", "photos/search?q=photo 3&fields=id,title")
+        self.assertEqual(response.json()["results"], [{"id": self.photos[3].id, "title": "photo 3"}])
+        self.assertEqual(self.client.get("/api/v1/photos/search").status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/photos/search?q=photo&after=invalid").status_code, 400)
+
+    def test_color(self):
+        self.photos[4].avg_color = "#1e90ff"
+        self.photos[4].save()
+        response = self.assertWithinBudget("photos/color", "get", "photos/color?color=%231E90FF&limit=1&fields=id")
+        self.assertEqual(response.json()["results"], [{"id": self.photos[4].id, "distance": 0.0}])
+        self.assertEqual(self.client.get("/api/v1/photos/color?color=blue").status_code, 400)
+
+    def test_batch_reads(self):
+        missing = self.photos[-1].id + 1
+        ids = [self.photos[3].id, missing, self.photos[1].id, self.photos[3].id]
+        query = ",".join(map(str, ids))
+        # the JWT auth query, then a single query for the whole batch
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/photos?ids={query}&expand=photographer")
+        self.assertEqual([photo["id"] for photo in response.json()["results"]], [ids[0], ids[2]])
+        self.assertEqual(response.json()["missing"], [missing])
+        photo = self.client.get(f"/api/v1/photos/{ids[0]}?expand=photographer").json()
+        self.assertEqual(response.json()["results"][0], photo)
+
+        # a photo created under a missing ID shows up in the cached batch
+        Photograph.objects.create(
+            id=missing, title="new", url="https://images.example.com/new.jpeg", photographer=self.photographer
+        )
+        response = self.client.get(f"/api/v1/photos?ids={query}&expand=photographer")
+        self.assertEqual(response.json()["missing"], [])
+
+        response = self.client.get(f"/api/v1/photographers?ids={self.photographer.id},{missing}&fields=id")
+        self.assertEqual(response.json(), {"results": [{"id": self.photographer.id}], "missing": [missing]})
+        too_many = ",".join(map(str, range(1, MAX_BATCH_IDS + 2)))
+        for query in (too_many, "1,x", "0", ""):
+            self.assertEqual(self.client.get(f"/api/v1/photos?ids={query}").status_code, 400)
+
+    @mock.patch("photos.db.CHANGES_SETTLE_SECONDS", 0)
+    def test_changes(self):
+        # a first sync pages through the whole catalog, each stream ordered by `(last_updated, id)`
+        photos, since = [], ""
+        while True:
+            response = self.assertWithinBudget("changes", "get", f"changes?limit=4&since={since}")
+            photos += [photo["id"] for photo in response.json()["photos"]]
+            since = response.json()["next"]
+            if not response.json()["has_more"]:
+                break
+        self.assertEqual(photos, [photo.id for photo in self.photos])
+        response = self.client.get(f"/api/v1/changes?since={since}")
+        self.assertEqual(
+            response.json(), {"photos": [], "photographers": [], "deleted": [], "next": since, "has_more": False}
+        )
+
+        # then only returns what changed since
+        self.photos[2].title = "updated"
+        self.photos[2].save()
+        deleted_id = self.photos[5].id
+        self.photos[5].delete()
+        response = self.assertWithinBudget("changes", "get", f"changes?since={since}").json()
+        self.assertEqual(
+            [(photo["id"], photo["title"]) for photo in response["photos"]], [(self.photos[2].id, "updated")]
+        )
+        # the delete updated the photographer's stats
+        self.assertEqual([photographer["photo_count"] for photographer in response["photographers"]], [PHOTO_COUNT - 1])
+        self.assertEqual(response["deleted"], [{"type": "photo", "id": deleted_id}])
+        self.assertEqual(self.client.get("/api/v1/changes?since=invalid").status_code, 400)
+
+    def test_cached_reads(self):
+        # once cached, reads only cost the JWT auth query
+        for path in ("photos", f"photos/{self.photos[0].id}", f"photographers/{self.photographer.id}/photos"):
+            self.client.get(f"/api/v1/{path}")
+            with self.assertNumQueries(1):
+                self.client.get(f"/api/v1/{path}")
+
+    def test_conditional_reads(self):
+        # a current ETag is answered with a 304 after only the auth and validator queries
+        for path in ("photos", f"photos/{self.photos[0].id}", f"photographers/{self.photographer.id}/photos"):
+            etag = self.client.get(f"/api/v1/{path}")["ETag"]
+            photo_cache.clear()
+            with self.assertNumQueries(2):
+                response = self.client.get(f"/api/v1/{path}", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+
+    def test_conditional_reads_track_nested_photographer(self):
+        # validators cover the selected representation, and the photographer (and its user) when it's nested
+        paths = (f"photos/{self.photos[0].id}?expand=photographer", "photos?expand=photographer")
+        self.assertNotEqual(self.client.get("/api/v1/photos")["ETag"], self.client.get(f"/api/v1/{paths[1]}")["ETag"])
+        changes = (
+            lambda: Photograph.objects.create(
+                title="new", url="https://example.com/new", photographer=self.photographer
+            ),
+            lambda: UserModel.objects.filter(id=self.user.id).first().save(),
+        )
+        for change in changes:
+            etags = {path: self.client.get(f"/api/v1/{path}")["ETag"] for path in paths}
+            change()
+            for path, etag in etags.items():
+                response = self.client.get(f"/api/v1/{path}", HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200, path)
+                self.assertNotEqual(response["ETag"], etag)
+
+    def test_photo_writes(self):
+        url = "https://images.example.com/photos/new.jpeg"
+        data = {"title": "new", "url": url, "photographer_id": self.photographer.id, "source": {"original": url}}
+        response = self.assertWithinBudget("photos", "post", "photos", data, expected_status=201)
+        self.assertEqual(response.data["photographer"]["id"], self.photographer.id)
+
+        path = f"photos/{self.photos[0].id}"
+        data = {"title": "updated", "source": {"tiny": f"{url}?h=200"}}
+        self.assertWithinBudget("photos/<int:photo_id>", "put", path, data, expected_status=201)
+        self.assertWithinBudget("photos/<int:photo_id>", "patch", path, {"alt_text": "alt"}, expected_status=201)
+
+        # URLs must be valid and unique
+        data = {"title": "new", "photographer_id": self.photographer.id, "source": {}}
+        for bad_url, error in (("not a url", "url"), (url, "unique")):
+            response = self.client.post("/api/v1/photos", {**data, "url": bad_url}, format="json")
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual([e["type"] for e in response.data], [error])
+
+    def test_photo_bulk_writes(self):
+        def photo(n: int, **fields) -> dict:
+            url = f"https://images.example.com/photos/bulk/{n}.jpeg"
+            return {"title": f"bulk {n}", "url": url, "photographer_id": self.photographer.id, "source": {}, **fields}
+
+        # list reads cached before the bulk create must pick up the new photos
+        self.client.get("/api/v1/photos")
+        batch = [photo(n) for n in range(PHOTO_COUNT)]
+        response = self.assertWithinBudget("photos/bulk", "post", "photos/bulk", batch, expected_status=201)
+        self.assertEqual([item["index"] for item in response.data["created"]], list(range(PHOTO_COUNT)))
+        self.assertEqual(len(self.client.get("/api/v1/photos").json()["results"]), PHOTO_COUNT * 2)
+        photographer = self.client.get(f"/api/v1/photographers/{self.photographer.id}").json()
+        self.assertEqual(photographer["photo_count"], PHOTO_COUNT * 2)
+
+        # nothing is created if any photo is invalid, unless partial success is requested
+        batch = [photo(100), photo(101, url="not a url"), photo(102, photographer_id=0), photo(0), photo(100)]
+        response = self.client.post("/api/v1/photos/bulk", batch, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([item["index"] for item in response.data["errors"]], [1, 2, 3, 4])
+        self.assertFalse(Photograph.objects.filter(title="bulk 100").exists())
+        response = self.client.post("/api/v1/photos/bulk?partial=true", batch, format="json")
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data["created"], [{"index": 0, "id": Photograph.objects.get(title="bulk 100").id}])
+        self.assertEqual(self.client.post("/api/v1/photos/bulk", [], format="json").status_code, 400)
+
+    def test_health(self):
+        self.client.credentials()
+        response = self.assertWithinBudget("health", "get", "health")
+        self.assertEqual(response.json()["json_encoder"], "orjson")
+
+    def test_metrics(self):
+        self.client.credentials()
+        self.assertWithinBudget("metrics", "get", "metrics")
+
+
+class AsyncViewTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserModel.objects.create_user(username="async", email="async@example.com")
+        cls.photographer = Photographer.objects.get(user=cls.user)
+        url = "https://images.example.com/photos/0.jpeg"
+        cls.photo = Photograph.objects.create(title="photo 0", url=url, photographer=cls.photographer)
+        PhotoSource.objects.create(photograph=cls.photo, original=url)
+
+    def setUp(self):
+        photo_cache.clear()
+        color_index.clear()
+        self.auth = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+
+    def test_matches_sync_views(self):
+        factory = APIRequestFactory()
+        paths = [
+            "photographers",
+            f"photographers/{self.photographer.id}",
+            f"photos/{self.photo.id}?expand=photographer",
+            "photos?fields=id,source.tiny",
+            "photos/search?q=photo&limit=1",
+            "photos/color?color=333831&limit=1",
+            "photos?limit=0",
+            f"photos?ids={self.photo.id},{self.photo.id + 1}",
+            f"photographers?ids={self.photographer.id}",
+            "changes?limit=1",
+        ]
+        for path in paths:
+            response = self.client.get(f"/api/v1/{path}", HTTP_AUTHORIZATION=self.auth)
+            match = resolve(f"/api/v1/{path}".split("?")[0])
+            request = factory.get(f"/api/v1/{path}", HTTP_AUTHORIZATION=self.auth)
+            sync_response = match.func.view_class.sync_view.as_view()(request, **match.kwargs).render()
+            self.assertEqual(response.status_code, sync_response.status_code)
+            self.assertEqual(response.content, sync_response.content)
+            self.assertEqual(response.get("ETag"), sync_response.get("ETag"))
+
+    async def test_authentication(self):
+        response = await self.async_client.get("/api/v1/photos")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], 'Bearer realm="api"')
+        response = await self.async_client.get("/api/v1/photos", headers={"Authorization": "Bearer invalid"})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "token_not_valid")
+
+        response = await self.async_client.get(f"/api/v1/photos/{self.photo.id}", headers={"Authorization": self.auth})
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(
+            f"/api/v1/photos/{self.photo.id}", headers={"Authorization": self.auth, "If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class PhotoEventsTests(TransactionTestCase):
+    """Live events of committed writes, delivered through a LISTEN connection on PostgreSQL."""
+
+    async def test_streams_committed_writes(self):
+        photographers = []
+        for n in range(2):
+            user = await sync_to_async(UserModel.objects.create_user)(username=f"events.{n}", email=f"{n}@example.com")
+            photographers.append(await Photographer.objects.aget(user=user))
+
+        stream = photo_events.stream(photographer_id=photographers[0].id)
+        try:
+            self.assertEqual(await anext(stream), b": subscribed\n\n")
+            if photo_events.uses_notify:
+                await asyncio.wait_for(photo_events.listening.wait(), 5)
+            photos = [
+                await Photograph.objects.acreate(
+                    title="event", url=f"https://images.example.com/{n}.jpeg", photographer=p
+                )
+                for n, p in enumerate(reversed(photographers))
+            ]
+            event = photo_event(PHOTO_CREATED, photos[1].id, photographers[0].id)
+            self.assertEqual(
+                await asyncio.wait_for(anext(stream), 5),
+                f"event: {PHOTO_CREATED}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n".encode(),
+            )
+        finally:
+            await stream.aclose()
+        self.assertEqual(photo_events.stats()["subscribers"], 0)
+
+
+class MetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserModel.objects.create_user(username="metrics", email="metrics@example.com")
+        cls.photographer = Photographer.objects.get(user=cls.user)
+
+    def setUp(self):
+        photo_cache.clear()
+        metrics.clear()
+        single_flight.clear()
+        self.auth = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+
+    def assertServerTiming(self, response, *phases: str) -> dict[str, str]:
+        timing = dict(metric.split(";", 1) for metric in response["Server-Timing"].split(", "))
+        self.assertEqual(set(timing), {*phases, "total"})
+        return timing
+
+    def test_server_timing(self):
+        response = self.client.get("/api/v1/photographers", HTTP_AUTHORIZATION=self.auth)
+        timing = self.assertServerTiming(response, "auth", "db", "validate", "serialize", "render")
+        self.assertRegex(timing["db"], r'^dur=\d+\.\d\d;desc="3 queries"$')
+
+        # cached reads skip the queries (except for auth) and serialization
+        response = self.client.get("/api/v1/photographers", HTTP_AUTHORIZATION=self.auth)
+        self.assertServerTiming(response, "auth", "db", "validate", "render")
+
+    async def test_server_timing_async(self):
+        response = await self.async_client.get(
+            f"/api/v1/photographers/{self.photographer.id}", headers={"Authorization": self.auth}
+        )
+        self.assertEqual(response.status_code, 200)
+        timing = self.assertServerTiming(response, "auth", "db", "validate", "serialize", "render")
+        self.assertIn('desc="3 queries"', timing["db"])
+
+    def test_metrics(self):
+        self.client.get("/api/v1/photographers", HTTP_AUTHORIZATION=self.auth)
+        self.client.get("/api/v1/photographers")
+        self.client.get("/api/v1/missing")
+        response = self.client.get("/api/v1/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        lines = response.content.decode().splitlines()
+        route = 'route="api/v1/photographers",method="GET"'
+        self.assertIn(f'api_requests_total{{{route},status="200"}} 1', lines)
+        self.assertIn(f'api_requests_total{{{route},status="401"}} 1', lines)
+        self.assertIn('api_requests_total{route="unmatched",method="GET",status="404"} 1', lines)
+        self.assertIn(f"api_request_duration_seconds_count{{{route}}} 2", lines)
+        self.assertIn(f'api_request_phase_seconds_count{{{route},phase="auth"}} 2', lines)
+        # phases are only observed for requests which went through them
+        self.assertIn(f'api_request_phase_seconds_count{{{route},phase="db"}} 1', lines)
+        self.assertIn(f'api_request_queries_bucket{{{route},le="3"}} 2', lines)
+        self.assertIn(f'api_request_queries_bucket{{{route},le="0"}} 1', lines)
+        self.assertIn('api_reads_total{read="photographers"} 1', lines)
+        self.assertIn('api_reads_coalesced_total{read="photographers"} 0', lines)
+        self.assertIn('api_reads_coalescing_ratio{read="photographers"} 0.0', lines)
+
+    @skipUnless(connection.settings_dict["OPTIONS"].get("pool"), "requires a pooled PostgreSQL database")
+    def test_pool_stats(self):
+        self.client.get("/api/v1/photographers", HTTP_AUTHORIZATION=self.auth)
+        stats = get_pool_stats()["default"]
+        self.assertEqual(stats["pool_max"], settings.DATABASE_POOL["max_size"])
+        self.assertGreaterEqual(stats["requests_num"], 1)
+        self.assertEqual(self.client.get("/api/v1/health").json()["db_pool"]["default"]["pool_max"], stats["pool_max"])
+        lines = self.client.get("/api/v1/metrics").content.decode().splitlines()
+        self.assertIn(f'api_db_pool_max_connections{{alias="default"}} {stats["pool_max"]}', lines)
+
+    def test_histogram_buckets(self):
+        histogram = Histogram((1, 2, 5))
+        for value in (0, 1, 1.5, 2, 7):
+            histogram.observe(value)
+        self.assertEqual(list(histogram.samples()), [("1", 2), ("2", 4), ("5", 4), ("+Inf", 5)])
+        self.assertEqual(histogram.sum, 11.5)
+
+
+class ExternalJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        # RS256 needs `cryptography`, the cache doesn't depend on the algorithm
+        self.backend = TokenBackend(
+            "HS256",
+            signing_key="external-signing-key-used-in-tests-only",
+            audience=EXTERNAL_AUDIENCE,
+            issuer=EXTERNAL_ISSUER,
+        )
+        self.backend.leeway = 30
+        self.auth = ExternalJWTAuthentication()
+        self.auth.token_backend = self.backend
+
+    def request(self, expires_in: int = 300):
+        token = self.backend.encode({"sub": "abc", "email": "abc@example.com", "exp": int(time.time()) + expires_in})
+        return APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_caches_verified_tokens(self):
+        request = self.request()
+        user, _ = self.auth.authenticate(request)
+        self.assertEqual(user.username, "ext:abc")
+
+        # repeats skip both the signature verification and the user lookup
+        with mock.patch.object(self.backend, "decode", wraps=self.backend.decode) as decode:
+            with self.assertNumQueries(0):
+                cached_user, _ = self.auth.authenticate(request)
+            self.assertEqual(decode.call_count, 0)
+        self.assertEqual(cached_user.pk, user.pk)
+        self.assertEqual(token_cache.stats(), {"hits": 1, "misses": 1, "evictions": 0, "entries": 1})
+
+        # saving the user drops its tokens, so changes are picked up
+        UserModel.objects.filter(pk=user.pk).update(is_active=False)
+        UserModel.objects.get(pk=user.pk).save()
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate(request)
+        self.assertFalse(user.is_active)
+
+    async def test_caches_verified_tokens_async(self):
+        request = self.request()
+        user, _ = await self.auth.aauthenticate(request)
+        with mock.patch.object(self.backend, "decode") as decode:
+            cached_user, _ = await self.auth.aauthenticate(request)
+            self.assertEqual(decode.call_count, 0)
+        self.assertEqual(cached_user.pk, user.pk)
+
+    def test_skips_tokens_expiring_within_leeway(self):
+        request = self.request(expires_in=10)
+        self.auth.authenticate(request)
+        self.auth.authenticate(request)
+        self.assertEqual(token_cache.stats()["entries"], 0)
+        self.assertIsNone(self.auth.authenticate(APIRequestFactory().get("/", HTTP_AUTHORIZATION="Bearer invalid")))
+
+    def test_bounded(self):
+        cache = TokenCache(max_entries=2)
+        user = UserModel(pk=1)
+        for n in range(3):
+            cache.set(cache.digest(str(n)), {}, user, time.time() + 60)
+        self.assertIsNone(cache.get(cache.digest("0")))
+        self.assertEqual(cache.get(cache.digest("2")).user_id, 1)
+        cache.invalidate_user(1)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "evictions": 1, "entries": 0})
+
+
+class FastJSONRendererTests(APITestCase):
+    def test_matches_json_renderer(self):
+        data = {
+            "results": [
+                {"id": 2**53 + 1, "title": 'Zoë "\\" \u2028\u2029 \x00\x1f\x7f 📷', "source": None, "ok": True}
+            ],
+            "next": "eyJ9",
+            "prev": None,
+            "nested": [[], {}, (1, 2)],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_splices_rendered_records(self):
+        records = [{"id": 1, "title": 'Zoë "\\" \u2028 📷', "source": None}, {"id": 2, "title": "", "source": {}}]
+        data = {"results": records, "next": "\x00rendered", "prev": None}
+        rendered = {**data, "results": [RenderedRecord(encode(record)) for record in records]}
+        self.assertEqual(FastJSONRenderer().render(rendered), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(rendered["results"][0]), JSONRenderer().render(records[0]))
+        # DRF's encoder reads them as mappings
+        self.assertEqual(JSONRenderer().render(rendered), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(rendered, None, {"indent": 4}), JSONRenderer().render(data, None, {"indent": 4})
+        )
+
+    def test_falls_back_to_json_renderer(self):
+        data = {"last_updated": timezone.now(), "detail": ErrorDetail("Not found.", code="not_found"), 1: "int key"}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        context = {"indent": 4}
+        self.assertEqual(FastJSONRenderer().render(data, None, context), JSONRenderer().render(data, None, context))
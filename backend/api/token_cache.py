@@ -0,0 +1,127 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from django.conf import settings
+
+DEFAULT_TOKEN_CACHE_SETTINGS = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 10_000,
+}
+"""Defaults for the `API_TOKEN_CACHE` setting (see `backend/settings.py`)."""
+
+
+@dataclass
+class TokenCacheEntry:
+    """
+    Represents a verified token: its `claims` and the user it resolved to. `expires_at` is a unix timestamp,
+    as tokens expire at wall clock times.
+    """
+
+    claims: dict[str, Any]
+    user_id: Any
+    user: Any
+    expires_at: float
+
+
+class TokenCache:
+    """
+    Bounded, thread-safe LRU cache of verified tokens, keyed by a digest of the raw token (so tokens themselves
+    are never kept in memory). Entries expire with their token, and are dropped when their user is saved or
+    deleted (see `api.signals`), so a cached user never outlives changes to its record.
+    """
+
+    def __init__(self, max_entries: int, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: OrderedDict[bytes, TokenCacheEntry] = OrderedDict()
+        self._users: dict[Any, set[bytes]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def digest(raw_token: str) -> bytes:
+        """Returns the cache key of `raw_token`."""
+        return hashlib.sha256(raw_token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[TokenCacheEntry]:
+        """
+        Returns the entry for `key`, or None if the token isn't cached (or has expired). The entry holds a copy
+        of the cached user, so callers may modify it.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return TokenCacheEntry(entry.claims, entry.user_id, copy.copy(entry.user), entry.expires_at)
+
+    def set(self, key: bytes, claims: dict[str, Any], user: Any, expires_at: float):
+        """Caches the verified `claims` and resolved `user` of the token with `key` until `expires_at`."""
+        if not self.enabled or expires_at <= time.time():
+            return
+
+        entry = TokenCacheEntry(claims, user.pk, copy.copy(user), expires_at)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._users.setdefault(entry.user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: Any):
+        """Drops the entries of every token resolved to the user with `user_id`."""
+        with self._lock:
+            for key in list(self._users.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        """Drops all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._users.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """Returns the hit, miss and eviction counters, along with the current number of entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def _remove(self, key: bytes):
+        # callers must hold the lock
+        entry = self._entries.pop(key)
+        keys = self._users[entry.user_id]
+        keys.discard(key)
+        if not keys:
+            del self._users[entry.user_id]
+
+
+def _build_token_cache() -> TokenCache:
+    """Builds the module level cache from the `API_TOKEN_CACHE` setting."""
+    config = {**DEFAULT_TOKEN_CACHE_SETTINGS, **getattr(settings, "API_TOKEN_CACHE", {})}
+    return TokenCache(max_entries=config["MAX_ENTRIES"], enabled=config["ENABLED"])
+
+
+token_cache = _build_token_cache()
+"""Cache of verified external tokens, shared by `api.auth.ExternalJWTAuthentication` instances."""
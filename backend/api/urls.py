@@ -1,13 +1,18 @@
 from django.urls import path
 
-from .views import (
-    HealthCheckView,
-    PhotographerPhotosView,
-    PhotographersView,
-    PhotographerView,
-    PhotosView,
-    PhotoView,
+from .async_views import (
+    AsyncChangesView,
+    AsyncPhotographerPhotosView,
+    AsyncPhotographersView,
+    AsyncPhotographerView,
+    AsyncPhotoEventsView,
+    AsyncPhotosColorView,
+    AsyncPhotosExportView,
+    AsyncPhotosSearchView,
+    AsyncPhotosView,
+    AsyncPhotoView,
 )
+from .views import HealthCheckView, MetricsView, PhotosBulkView
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -20,19 +25,27 @@ urlpatterns = [
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("token/verify/", TokenVerifyView.as_view(), name="token_verify"),
     # PHOTO VIEWS
-    path("photographers", PhotographersView.as_view(), name="api_photographers"),
+    path("photographers", AsyncPhotographersView.as_view(), name="api_photographers"),
     path(
         "photographers/<int:photographer_id>",
-        PhotographerView.as_view(),
+        AsyncPhotographerView.as_view(),
         name="api_photographers",
     ),
     path(
         "photographers/<int:photographer_id>/photos",
-        PhotographerPhotosView.as_view(),
+        AsyncPhotographerPhotosView.as_view(),
         name="api_photographers_photos",
     ),
-    path("photos", PhotosView.as_view(), name="api_photos"),
-    path("photos/<int:photo_id>", PhotoView.as_view(), name="api_photo"),
-    # HEALTHCHECK
+    path("photos", AsyncPhotosView.as_view(), name="api_photos"),
+    path("photos/bulk", PhotosBulkView.as_view(), name="api_photos_bulk"),
+    path("photos/color", AsyncPhotosColorView.as_view(), name="api_photos_color"),
+    path("photos/events", AsyncPhotoEventsView.as_view(), name="api_photos_events"),
+    path("photos/export", AsyncPhotosExportView.as_view(), name="api_photos_export"),
+    path("photos/search", AsyncPhotosSearchView.as_view(), name="api_photos_search"),
+    path("photos/<int:photo_id>", AsyncPhotoView.as_view(), name="api_photo"),
+    # CHANGE FEED
+    path("changes", AsyncChangesView.as_view(), name="api_changes"),
+    # HEALTHCHECK & METRICS
     path("health", HealthCheckView.as_view(), name="api_healthcheck"),
+    path("metrics", MetricsView.as_view(), name="api_metrics"),
 ]
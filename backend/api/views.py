@@ -1,19 +1,69 @@
+from typing import Any, Callable, Optional
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
+from api.metrics import PROMETHEUS_CONTENT_TYPE, get_pool_stats, metrics
+from api.renderers import JSON_ENCODER
+from api.token_cache import token_cache
+from photos.cache import photo_cache
+from photos.coalescing import single_flight
+from photos.color_index import color_index
 from photos.db import (
     DbResult,
+    bulk_create_photographs,
+    get_changes,
     get_photograph,
+    get_photograph_validators,
     get_photographer,
+    get_photographer_validators,
     get_photographers,
+    get_photographers_by_ids,
+    get_photographers_validators,
     get_photographs,
+    get_photographs_by_color,
+    get_photographs_by_ids,
+    get_photographs_validators,
+    search_photographs,
     serialize_and_save_photograph,
     update_photograph,
 )
-from photos.validators import ValidatedData, validate_photograph
+from photos.events import photo_events
+from photos.renderings import photo_renderings
+from photos.validators import (
+    ValidatedData,
+    validate_bulk_params,
+    validate_changes_params,
+    validate_color_params,
+    validate_ids_params,
+    validate_page_params,
+    validate_photograph,
+    validate_photograph_batch,
+    validate_photograph_fields_params,
+    validate_photographer_fields_params,
+    validate_search_params,
+)
+from photos.routers import replica_routing
+from photos.timing import timed
+
+
+def check_preconditions(request, validators: dict[str, Any]) -> tuple[Optional[int], dict[str, str]]:
+    """
+    Checks the request's conditional headers (`If-None-Match` / `If-Modified-Since`, etc.) against `validators`.
+    Returns the status to respond with if the client's copy is current (304, or 412 for a failed precondition),
+    along with the `ETag` / `Last-Modified` headers to include in the response.
+    """
+    etag, last_modified = validators["etag"], validators["last_modified"]
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    headers = {"ETag": etag, **({"Last-Modified": http_date(last_modified)} if last_modified else {})}
+    precondition = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return (precondition.status_code if precondition else None), headers
 
 
 class ProtectedView(APIView):
@@ -21,18 +71,65 @@ class ProtectedView(APIView):
 
     permission_classes = [IsAuthenticated]
 
+    def perform_authentication(self, request: Request):
+        with timed("auth"):
+            super().perform_authentication(request)
+        replica_routing.set_user(request.user.pk)
+
+    def conditional_response(self, request: Request, validators: DbResult, fetch: Callable[[], DbResult]) -> Response:
+        """
+        Returns the result of `fetch` with the `ETag` / `Last-Modified` headers from `validators`. If the client's
+        copy (`If-None-Match` / `If-Modified-Since`) is still current, a 304 is returned and `fetch` never runs.
+        """
+        if not validators.success:
+            return Response(validators.errors, status=validators.http_code)
+
+        # return 304 (or 412) if request preconditions say the client's copy is current
+        precondition_status, headers = check_preconditions(request, validators.result)
+        if precondition_status:
+            return Response(status=precondition_status, headers=headers)
+
+        # fetch and return result, returning error if something went wrong
+        result: DbResult = fetch()
+        if not result.success:
+            return Response(result.errors, status=result.http_code)
+        return Response(result.result, status=status.HTTP_200_OK, headers=headers)
+
+    def batch_response(self, result: DbResult) -> Response:
+        """Returns the records of a batch read (`?ids=`), or the error if something went wrong."""
+        if not result.success:
+            return Response(result.errors, status=result.http_code)
+        return Response(result.result, status=status.HTTP_200_OK)
+
 
 class PhotographersView(ProtectedView):
     """
-    View for Photographers records.
+    View for Photographers records (all of them, or the ones requested by `?ids=`).
     """
 
     def get(self, request):
-        # return list of all photographer records, returning error if something went wrong
-        result = get_photographers()
-        if not result.success:
-            return Response(result.errors, status=result.http_code)
-        return Response(result.result, status=status.HTTP_200_OK)
+        # validate incoming pagination and sparse fieldset params
+        page_params: ValidatedData = validate_page_params(request.query_params.dict())
+        if not page_params.success:
+            return Response(page_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photographer_fields_params(request.query_params.dict())
+        if not fields_params.success:
+            return Response(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids_params: ValidatedData = validate_ids_params(request.query_params.dict())
+        if not ids_params.success:
+            return Response(ids_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return the requested photographer records (`?ids=`) rather than a page, if provided
+        options: dict = fields_params.data.read_options()
+        if ids_params.data.ids is not None:
+            return self.batch_response(get_photographers_by_ids(ids_params.data.ids, **options))
+
+        # return page of photographer records (or 304 if unchanged), returning error if something went wrong
+        page: dict = page_params.data.model_dump()
+        return self.conditional_response(
+            request, get_photographers_validators(**page, **options), lambda: get_photographers(**page, **options)
+        )
 
 
 class PhotographerView(ProtectedView):
@@ -41,11 +138,18 @@ class PhotographerView(ProtectedView):
     """
 
     def get(self, request, photographer_id: int):
-        # get and return photographer by ID, returning error if something went wrong
-        result: DbResult = get_photographer(photographer_id)
-        if not result.success:
-            return Response(result.errors, status=result.http_code)
-        return Response(result.result, status=status.HTTP_200_OK)
+        # validate incoming sparse fieldset params
+        fields_params: ValidatedData = validate_photographer_fields_params(request.query_params.dict())
+        if not fields_params.success:
+            return Response(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # get and return photographer by ID (or 304 if unchanged), returning error if something went wrong
+        options: dict = fields_params.data.read_options()
+        return self.conditional_response(
+            request,
+            get_photographer_validators(photographer_id, **options),
+            lambda: get_photographer(photographer_id, **options),
+        )
 
 
 class PhotographerPhotosView(ProtectedView):
@@ -54,24 +158,52 @@ class PhotographerPhotosView(ProtectedView):
     """
 
     def get(self, request, photographer_id: int):
-        # return all photographs by specific Photographer, returning error if something went wrong
-        result: DbResult = get_photographs(photographer_id=photographer_id)
-        if not result.success:
-            return Response(result.errors, status=result.http_code)
-        return Response(result.result, status=status.HTTP_200_OK)
+        # validate incoming pagination and sparse fieldset params
+        page_params: ValidatedData = validate_page_params(request.query_params.dict())
+        if not page_params.success:
+            return Response(page_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.query_params.dict())
+        if not fields_params.success:
+            return Response(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return page of photographs by Photographer (or 304 if unchanged), returning error if something went wrong
+        page: dict = page_params.data.model_dump()
+        options: dict = fields_params.data.read_options()
+        return self.conditional_response(
+            request,
+            get_photographs_validators(photographer_id=photographer_id, **page, **options),
+            lambda: get_photographs(photographer_id=photographer_id, **page, **options),
+        )
 
 
 class PhotosView(ProtectedView):
     """
-    List all photos, or create a new photo.
+    List all photos (or the ones requested by `?ids=`), or create a new photo.
     """
 
     def get(self, request):
-        # return all photograph records, returning error if something went wrong
-        result: DbResult = get_photographs()
-        if not result.success:
-            return Response(result.errors, status=result.http_code)
-        return Response(result.result, status=status.HTTP_200_OK)
+        # validate incoming pagination and sparse fieldset params
+        page_params: ValidatedData = validate_page_params(request.query_params.dict())
+        if not page_params.success:
+            return Response(page_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.query_params.dict())
+        if not fields_params.success:
+            return Response(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        ids_params: ValidatedData = validate_ids_params(request.query_params.dict())
+        if not ids_params.success:
+            return Response(ids_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return the requested photograph records (`?ids=`) rather than a page, if provided
+        options: dict = fields_params.data.read_options()
+        if ids_params.data.ids is not None:
+            return self.batch_response(get_photographs_by_ids(ids_params.data.ids, **options))
+
+        # return page of photograph records (or 304 if unchanged), returning error if something went wrong
+        page: dict = page_params.data.model_dump()
+        return self.conditional_response(
+            request, get_photographs_validators(**page, **options), lambda: get_photographs(**page, **options)
+        )
 
     def post(self, request: Request):
         # validate incoming photograph post data
@@ -86,18 +218,110 @@ class PhotosView(ProtectedView):
         return Response(result.result, status=status.HTTP_201_CREATED)
 
 
-class PhotoView(ProtectedView):
+class PhotosSearchView(ProtectedView):
     """
-    Retrieve, update or delete a Photograph instance.
+    Search photos by title and alt text (`?q=`), best matches first.
     """
 
-    def get(self, request, photo_id: int):
-        # get photograph record by provided ID, returning error if something went wrong
-        result: DbResult = get_photograph(photo_id)
+    def get(self, request):
+        # validate incoming search (and pagination) and sparse fieldset params
+        search_params: ValidatedData = validate_search_params(request.query_params.dict())
+        if not search_params.success:
+            return Response(search_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.query_params.dict())
+        if not fields_params.success:
+            return Response(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return page of matching photograph records, returning error if something went wrong
+        result: DbResult = search_photographs(**search_params.data.model_dump(), **fields_params.data.read_options())
         if not result.success:
             return Response(result.errors, status=result.http_code)
         return Response(result.result, status=status.HTTP_200_OK)
 
+
+class PhotosColorView(ProtectedView):
+    """
+    Find the photos with the average colors nearest to a hex color (`?color=`), nearest first.
+    """
+
+    def get(self, request):
+        # validate incoming color and sparse fieldset params
+        color_params: ValidatedData = validate_color_params(request.query_params.dict())
+        if not color_params.success:
+            return Response(color_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        fields_params: ValidatedData = validate_photograph_fields_params(request.query_params.dict())
+        if not fields_params.success:
+            return Response(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return nearest photograph records, returning error if something went wrong
+        result: DbResult = get_photographs_by_color(
+            **color_params.data.model_dump(), **fields_params.data.read_options()
+        )
+        if not result.success:
+            return Response(result.errors, status=result.http_code)
+        return Response(result.result, status=status.HTTP_200_OK)
+
+
+class ChangesView(ProtectedView):
+    """
+    Change feed for clients mirroring the catalog: the photos and photographers created or updated, and the ones
+    deleted, since the cursor of the previous sync (`?since=`).
+    """
+
+    def get(self, request):
+        # validate incoming change feed params
+        changes_params: ValidatedData = validate_changes_params(request.query_params.dict())
+        if not changes_params.success:
+            return Response(changes_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # return changes since the cursor, returning error if something went wrong
+        result: DbResult = get_changes(**changes_params.data.model_dump())
+        if not result.success:
+            return Response(result.errors, status=result.http_code)
+        return Response(result.result, status=status.HTTP_200_OK)
+
+
+class PhotosBulkView(ProtectedView):
+    """
+    Create a batch of photos. Nothing is created if any photo is invalid, unless `?partial=true` is passed.
+    """
+
+    def post(self, request: Request):
+        # validate incoming bulk params and the shape of the batch
+        bulk_params: ValidatedData = validate_bulk_params(request.query_params.dict())
+        if not bulk_params.success:
+            return Response(bulk_params.errors, status=status.HTTP_400_BAD_REQUEST)
+        batch: ValidatedData = validate_photograph_batch(request.data)
+        if not batch.success:
+            return Response(batch.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # validate each photo in one pass, then create them, returning the (per photo) errors if nothing was created
+        items: list[ValidatedData] = [validate_photograph(item) for item in batch.data.root]
+        result: DbResult = bulk_create_photographs(items, partial=bulk_params.data.partial)
+        if not result.success:
+            return Response(result.errors, status=result.http_code)
+        # 207 if only some of the photos were created
+        response_status = status.HTTP_207_MULTI_STATUS if result.result["errors"] else status.HTTP_201_CREATED
+        return Response(result.result, status=response_status)
+
+
+class PhotoView(ProtectedView):
+    """
+    Retrieve, update or delete a Photograph instance.
+    """
+
+    def get(self, request, photo_id: int):
+        # validate incoming sparse fieldset params
+        fields_params: ValidatedData = validate_photograph_fields_params(request.query_params.dict())
+        if not fields_params.success:
+            return Response(fields_params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # get photograph record by provided ID (or 304 if unchanged), returning error if something went wrong
+        options: dict = fields_params.data.read_options()
+        return self.conditional_response(
+            request, get_photograph_validators(photo_id, **options), lambda: get_photograph(photo_id, **options)
+        )
+
     def put(self, request, photo_id: int):
         # update photograph with provided data
         return self._update_photograph(request, photo_id)
@@ -121,4 +345,24 @@ class PhotoView(ProtectedView):
 
 class HealthCheckView(APIView):
     def get(self, request):
-        return Response({"status": "healthy"}, status=status.HTTP_200_OK)
+        return Response(
+            {
+                "status": "healthy",
+                "json_encoder": JSON_ENCODER,
+                "cache": photo_cache.stats(),
+                "coalescing": single_flight.stats(),
+                "token_cache": token_cache.stats(),
+                "color_index": color_index.stats(),
+                "events": photo_events.stats(),
+                "renderings": photo_renderings.stats(),
+                "db_pool": get_pool_stats(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class MetricsView(APIView):
+    """Per route request metrics of this process (see `api.metrics`), in the Prometheus text format."""
+
+    def get(self, request):
+        return HttpResponse(metrics.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# load the nearest-color index while the worker starts taking requests, rather than on the first color query
+from photos.color_index import color_index  # noqa: E402
+
+color_index.warm()
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
+    "photos.routers.ReplicaRoutingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -83,6 +85,29 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are pooled per worker process, by psycopg 3
+# https://docs.djangoproject.com/en/5.2/ref/databases/#connection-pool
+# DATABASE_MAX_CONNECTIONS is the number of connections all workers may hold at once (keep it below the server's
+# `max_connections`, leaving room for migrations, the admin, etc.), split evenly between the UVICORN_WORKERS.
+# A worker never needs more connections than the requests it handles at once (UVICORN_LIMIT_CONCURRENCY), as each
+# request holds at most one connection per database.
+UVICORN_WORKERS = int(os.environ.get("UVICORN_WORKERS", 1))
+UVICORN_LIMIT_CONCURRENCY = int(os.environ.get("UVICORN_LIMIT_CONCURRENCY", 100))
+DATABASE_MAX_CONNECTIONS = int(os.environ.get("DATABASE_MAX_CONNECTIONS", 80))
+DATABASE_POOL_MAX_SIZE = int(
+    os.environ.get("DATABASE_POOL_MAX_SIZE")
+    or max(1, min(UVICORN_LIMIT_CONCURRENCY, DATABASE_MAX_CONNECTIONS // UVICORN_WORKERS))
+)
+DATABASE_POOL = {
+    "min_size": min(int(os.environ.get("DATABASE_POOL_MIN_SIZE", 2)), DATABASE_POOL_MAX_SIZE),
+    "max_size": DATABASE_POOL_MAX_SIZE,
+    # seconds a request waits for a connection when all of them are in use, before failing
+    "timeout": float(os.environ.get("DATABASE_POOL_TIMEOUT", 10)),
+    # idle connections above `min_size` are closed after `max_idle` seconds, any connection after `max_lifetime`
+    "max_idle": float(os.environ.get("DATABASE_POOL_MAX_IDLE", 300)),
+    "max_lifetime": float(os.environ.get("DATABASE_POOL_MAX_LIFETIME", 3600)),
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -90,7 +115,92 @@ DATABASES = {
         "USER": os.environ.get("DATABASE_USER"),
         "PASSWORD": os.environ.get("DATABASE_PASSWORD"),
         "HOST": os.environ.get("DATABASE_HOST"),
+        # pooled connections are checked before being handed out, replacing any the server dropped
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"pool": DATABASE_POOL} if os.environ.get("DATABASE_POOL_ENABLED", "1") == "1" else {},
+    }
+}
+
+# Read replica of `default`, serving the read functions in `photos.db` (see `photos.routers`)
+# Any DATABASE_REPLICA_* variable left unset falls back to the primary's, so a second alias on the same server only
+# needs DATABASE_REPLICA_HOST. Under test, the replica mirrors `default` instead of getting a test database.
+if os.environ.get("DATABASE_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ.get("DATABASE_REPLICA_NAME") or DATABASES["default"]["NAME"],
+        "USER": os.environ.get("DATABASE_REPLICA_USER") or DATABASES["default"]["USER"],
+        "PASSWORD": os.environ.get("DATABASE_REPLICA_PASSWORD") or DATABASES["default"]["PASSWORD"],
+        "HOST": os.environ.get("DATABASE_REPLICA_HOST"),
+        "OPTIONS": {**DATABASES["default"]["OPTIONS"]},
+        "TEST": {"MIRROR": "default"},
     }
+
+DATABASE_ROUTERS = ["photos.routers.ReplicaRouter"]
+
+# After a write, the user's reads stay on `default` for STICKY_SECONDS (keep it above the replication lag)
+# CACHE_ALIAS names the entry in CACHES the pins are kept in, which should be shared by all workers
+PHOTOS_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "STICKY_SECONDS": float(os.environ.get("PHOTOS_REPLICAS_STICKY_SECONDS", 5)),
+    "CACHE_ALIAS": os.environ.get("PHOTOS_REPLICAS_CACHE_ALIAS", "default"),
+}
+
+# Read-through cache for serialized photo & photographer payloads (see `photos.cache`)
+# SHARED_ALIAS may name an entry in CACHES shared by all workers, used behind the in-process LRU; without it,
+# invalidations stay in the worker that made the write, so the cache is turned off for more than one UVICORN_WORKERS
+PHOTOS_CACHE = {
+    "ENABLED": os.environ.get("PHOTOS_CACHE_ENABLED", "1") == "1",
+    "MAX_ENTRIES": int(os.environ.get("PHOTOS_CACHE_MAX_ENTRIES", 10_000)),
+    "TTL": int(os.environ.get("PHOTOS_CACHE_TTL", 300)),
+    "SHARED_ALIAS": os.environ.get("PHOTOS_CACHE_SHARED_ALIAS") or None,
+    "WORKERS": UVICORN_WORKERS,
+}
+
+# Concurrent identical reads missing the cache share one computation per worker (see `photos.coalescing`)
+PHOTOS_COALESCING = {
+    "ENABLED": os.environ.get("PHOTOS_COALESCING_ENABLED", "1") == "1",
+}
+
+# Pre-rendered JSON of each photo's list representation, kept in sync on writes (see `photos.renderings`); run
+# `rebuild_photo_renderings` before enabling them on an existing catalog
+PHOTOS_RENDERINGS = {
+    "ENABLED": os.environ.get("PHOTOS_RENDERINGS_ENABLED", "0") == "1",
+}
+
+# In-process cache of verified external tokens and the users they resolve to (see `api.token_cache`)
+API_TOKEN_CACHE = {
+    "ENABLED": os.environ.get("API_TOKEN_CACHE_ENABLED", "1") == "1",
+    "MAX_ENTRIES": int(os.environ.get("API_TOKEN_CACHE_MAX_ENTRIES", 10_000)),
+}
+
+# In-process nearest-color index over photo colors (see `photos.color_index`)
+PHOTOS_COLOR_INDEX = {
+    "ENABLED": os.environ.get("PHOTOS_COLOR_INDEX_ENABLED", "1") == "1",
+    "CELL_SIZE": float(os.environ.get("PHOTOS_COLOR_INDEX_CELL_SIZE", 8.0)),
+    "TTL": int(os.environ.get("PHOTOS_COLOR_INDEX_TTL", 300)),
+    # load the index in the background when a worker starts, rather than on the first color query
+    "WARM": os.environ.get("PHOTOS_COLOR_INDEX_WARM", "1") == "1",
+}
+
+# Compact PhotoSource storage: variant URLs following a shared SourceTemplate are rebuilt from `original` on read
+# (see `photos.source_templates`); templates are reloaded in-process every TTL seconds
+PHOTOS_SOURCE_TEMPLATES = {
+    "COMPACT": os.environ.get("PHOTOS_SOURCE_TEMPLATES_COMPACT", "1") == "1",
+    "TTL": int(os.environ.get("PHOTOS_SOURCE_TEMPLATES_TTL", 300)),
+}
+
+# Live photo create / update events streamed at /api/v1/photos/events (see `photos.events`), fanned out via Postgres
+# NOTIFY; subscribers falling QUEUE_SIZE events behind are dropped and resync via the change feed
+PHOTOS_EVENTS = {
+    "ENABLED": os.environ.get("PHOTOS_EVENTS_ENABLED", "1") == "1",
+    "QUEUE_SIZE": int(os.environ.get("PHOTOS_EVENTS_QUEUE_SIZE", 100)),
+    "HEARTBEAT_SECONDS": float(os.environ.get("PHOTOS_EVENTS_HEARTBEAT_SECONDS", 15)),
+}
+
+# Per request phase timings (`Server-Timing` header) and per route histograms at /api/v1/metrics (see `api.metrics`)
+API_METRICS = {
+    "ENABLED": os.environ.get("API_METRICS_ENABLED", "1") == "1",
+    "SERVER_TIMING": os.environ.get("API_METRICS_SERVER_TIMING", "1") == "1",
 }
 
 # Password validation
@@ -115,10 +225,14 @@ AUTH_PASSWORD_VALIDATORS = [
 # allows for current and future customizations
 AUTH_USER_MODEL = "photos.User"
 
-# Enable JWT auth for rest framework
+# Enable JWT auth for rest framework, rendering JSON with orjson when it is installed (see `api.renderers`)
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.auth.LocalJWTAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
     ],
 }
 
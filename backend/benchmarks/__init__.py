@@ -0,0 +1,193 @@
+"""
+Benchmarks for the photos API, run as modules from the `backend/` directory (e.g. `python -m benchmarks.async_reads`).
+Each benchmark runs against a throwaway test database seeded with a synthetic catalog, never the configured one.
+Without a configured PostgreSQL database, they run against SQLite (see `benchmarks.settings`).
+"""
+
+import os
+
+import django
+
+# import and ensure Django is setup/loaded first
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+django.setup()
+
+import csv
+import random
+import statistics
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from photos.cache import photo_cache
+from photos.db import reconcile_photographer_stats
+from photos.management.commands.seed_photos import CSV_FILE, SOURCE_COLUMNS
+from photos.models import Photograph, Photographer, PhotoSource
+from photos.routers import replica_routing
+from photos.source_templates import source_templates
+
+UserModel = get_user_model()
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """Creates (and afterwards destroys) a test database, so benchmarks never touch real data."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    # replicas read the test database too, as the test runner does for `TEST["MIRROR"]` aliases
+    for alias in replica_routing.aliases:
+        connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        yield
+    finally:
+        for alias in replica_routing.aliases:
+            connections[alias].close()
+            if hasattr(connections[alias], "close_pool"):
+                connections[alias].close_pool()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_catalog(photographers: int, photos_per_photographer: int) -> Photographer:
+    """Seeds a synthetic catalog, returning the first Photographer (whose User can be issued tokens)."""
+    password = make_password("benchmark")
+    users = UserModel.objects.bulk_create(
+        UserModel(username=f"bench.{n}", email=f"bench.{n}@example.com", password=password)
+        for n in range(photographers)
+    )
+    # bulk_create skips the post_save hook creating Photographer records
+    records = Photographer.objects.bulk_create(Photographer(user=user) for user in users)
+    photos = Photograph.objects.bulk_create(
+        Photograph(
+            title=f"photo {p.id}.{n}",
+            url=f"https://images.example.com/photos/{p.id}/{n}.jpeg",
+            avg_color="#333831",
+            alt_text=f"alt {p.id}.{n}",
+            photographer=p,
+        )
+        for p in records
+        for n in range(photos_per_photographer)
+    )
+    PhotoSource.objects.bulk_create(
+        PhotoSource(photograph=photo, original=photo.url, tiny=f"{photo.url}?h=200&w=280") for photo in photos
+    )
+    photo_cache.clear()
+    return records[0]
+
+
+@dataclass
+class TemplateCatalog:
+    """IDs of notable records in a catalog seeded by `seed_template_catalog`, for benchmarks to request."""
+
+    user: Any
+    largest_photographer_id: int
+    smallest_photographer_id: int
+    photo_id: int
+
+
+def seed_template_catalog(
+    photos: int,
+    photos_per_photographer: int = 20,
+    csv_path: Path = CSV_FILE,
+    batch_size: int = 10_000,
+    seed: int = 42,
+) -> TemplateCatalog:
+    """
+    Seeds a synthetic catalog of `photos` photos modeled on the rows of `csv_path` (`photos.csv` by default): each
+    photo copies a template row's image sizes and source URL patterns (under its own URL), with alt text and title
+    reshuffled from the template vocabulary and the template color jittered, so search and color queries see
+    varied data. Photos are spread over `photos / photos_per_photographer` photographers with a Zipf-like skew, like
+    real catalogs where a few photographers own many photos. The first photographer's User can log in with the
+    password `benchmark`. Denormalized stats and colors are filled in as the app would.
+    """
+    with open(csv_path, newline="") as csvfile:
+        templates = list(csv.DictReader(csvfile))
+    vocabulary = [word for row in templates for word in row["alt"].split()]
+    rng = random.Random(seed)
+
+    # one unusable password for everyone, except the first photographer
+    photographer_count = max(1, photos // photos_per_photographer)
+    users = [
+        UserModel(username=f"template.{n}", email=f"template.{n}@example.com", password=make_password(None))
+        for n in range(photographer_count)
+    ]
+    users[0].password = make_password("benchmark")
+    users = UserModel.objects.bulk_create(users, batch_size=batch_size)
+    photographer_ids = [p.id for p in Photographer.objects.bulk_create(Photographer(user=user) for user in users)]
+
+    # photographer of each photo, weighted by 1 / rank
+    owners = rng.choices(
+        photographer_ids, cum_weights=list(accumulate(1 / (n + 1) for n in range(len(users)))), k=photos
+    )
+    for start in range(0, photos, batch_size):
+        photographs: list[Photograph] = []
+        urls: list[dict[str, str]] = []
+        for n in range(start, min(start + batch_size, photos)):
+            template = templates[n % len(templates)]
+            words = rng.sample(vocabulary, k=min(len(vocabulary), rng.randint(3, 10)))
+            red, green, blue = (
+                min(255, max(0, int(template["avg_color"][i : i + 2], 16) + rng.randint(-40, 40))) for i in (1, 3, 5)
+            )
+            photograph = Photograph(
+                title=" ".join(words[:6]).capitalize(),
+                url=f"{template['url'].rstrip('/')}-{n}/",
+                avg_color=f"#{red:02X}{green:02X}{blue:02X}",
+                alt_text=" ".join(words).capitalize(),
+                photographer_id=owners[n],
+            )
+            photograph.sync_color()
+            photographs.append(photograph)
+            urls.append(
+                {
+                    field: template[column].replace(template["id"], f"{template['id']}{n}")
+                    for field, column in SOURCE_COLUMNS.items()
+                }
+            )
+        # stored compactly, as `seed_photos` does
+        source_templates.ensure(urls)
+        sources = [PhotoSource(**source_templates.compact(fields)) for fields in urls]
+        with transaction.atomic():
+            Photograph.objects.bulk_create(photographs)
+            for photograph, source in zip(photographs, sources):
+                source.photograph = photograph
+            PhotoSource.objects.bulk_create(sources)
+        print(f"seeded {min(start + batch_size, photos)} photos", end="\r", flush=True)
+    print()
+
+    reconcile_photographer_stats()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    photo_cache.clear()
+
+    counts = Counter(owners)
+    return TemplateCatalog(
+        user=users[0],
+        largest_photographer_id=counts.most_common(1)[0][0],
+        smallest_photographer_id=min(counts, key=lambda id: (counts[id], id)),
+        photo_id=photographs[0].id,
+    )
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Returns the `pct` percentile of `samples` (inclusive method)."""
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method="inclusive")[max(0, min(98, round(pct) - 1))]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Returns p50 / p99 / mean of latency `samples` (in seconds) in milliseconds."""
+    return {
+        "p50": percentile(samples, 50) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "mean": statistics.fmean(samples) * 1000 if samples else 0.0,
+    }
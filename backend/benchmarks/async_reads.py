@@ -0,0 +1,102 @@
+"""
+Compares latency of the sync (DRF) and async read views under concurrent load, driving the ASGI application
+in-process (no server or network involved), e.g.
+
+    python -m benchmarks.async_reads --concurrency 32 --requests 2000
+"""
+
+from benchmarks import seed_catalog, summarize, test_database
+
+import argparse
+import asyncio
+import time
+
+from django.core.asgi import get_asgi_application
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from photos.cache import photo_cache
+
+ROUTES = ["photographers", "photographers/{photographer_id}/photos", "photos", "photos/{photo_id}"]
+
+
+async def _get(application, path: str, token: str) -> int:
+    """Sends a GET request for `path` to the ASGI `application`, returning the response status."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+    response = {}
+
+    async def receive():
+        # after the request body, block like a client that keeps the connection open
+        return messages.pop() if messages else await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+
+    await application(scope, receive, send)
+    return response["status"]
+
+
+async def _run(application, path: str, token: str, requests: int, concurrency: int) -> tuple[list[float], float]:
+    """Issues `requests` GETs for `path` from `concurrency` concurrent clients, returning latencies and wall time."""
+    latencies: list[float] = []
+
+    async def client(count: int):
+        for _ in range(count):
+            start = time.perf_counter()
+            status = await _get(application, path, token)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"GET {path} returned {status}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(requests // concurrency) for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photographers", type=int, default=50)
+    parser.add_argument("--photos", type=int, default=20, help="photos per photographer")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route and mode")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--cache", action="store_true", help="serve reads from the photo cache")
+    args = parser.parse_args()
+
+    with test_database(), override_settings(ROOT_URLCONF="benchmarks.urls"):
+        photographer = seed_catalog(args.photographers, args.photos)
+        token = str(RefreshToken.for_user(photographer.user).access_token)
+        ids = {"photographer_id": photographer.id, "photo_id": photographer.photographs.first().id}
+        photo_cache.enabled = args.cache
+        application = get_asgi_application()
+
+        print(f"{'route':<42}{'mode':<7}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}{'req/s':>9}")
+        for route in ROUTES:
+            for mode in ("sync", "async"):
+                path = f"/{mode}/{route.format(**ids)}"
+                asyncio.run(_run(application, path, token, args.concurrency, args.concurrency))  # warm up
+                latencies, elapsed = asyncio.run(_run(application, path, token, args.requests, args.concurrency))
+                stats = summarize(latencies)
+                print(
+                    f"{route:<42}{mode:<7}{stats['p50']:>9.2f}{stats['p99']:>9.2f}{stats['mean']:>9.2f}"
+                    f"{len(latencies) / elapsed:>9.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
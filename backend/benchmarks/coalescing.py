@@ -0,0 +1,77 @@
+"""
+Measures read coalescing (see `photos.coalescing`) on a hot page: bursts of identical concurrent requests for the
+photos of the largest photographer, each from its own thread through the Django test client (as a threaded WSGI
+worker would serve them), with the photo cache off (so every request misses it, as a burst right after an
+invalidation would), with coalescing off and on, e.g.
+
+    python -m benchmarks.coalescing --photos 100000 --concurrency 32
+"""
+
+from benchmarks import percentile, seed_template_catalog, test_database
+from benchmarks.suite import QueryCounter
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from photos.cache import photo_cache
+from photos.coalescing import single_flight
+
+
+def _get(path: str, token: str) -> float:
+    """Sends a GET for `path`, returning its latency."""
+    start = time.perf_counter()
+    response = Client().get(path, headers={"Authorization": f"Bearer {token}"})
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {path} returned {response.status_code}")
+    latency = time.perf_counter() - start
+    # each thread opened its own connection
+    connections.close_all()
+    return latency
+
+
+def _burst(executor: ThreadPoolExecutor, path: str, token: str, concurrency: int) -> list[float]:
+    """Sends `concurrency` identical GETs for `path` at once, returning their latencies."""
+    return list(executor.map(lambda _: _get(path, token), range(concurrency)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=20_000, help="photos in the synthetic catalog")
+    parser.add_argument("--concurrency", type=int, default=32, help="identical requests per burst")
+    parser.add_argument("--bursts", type=int, default=20)
+    args = parser.parse_args()
+
+    with test_database():
+        catalog = seed_template_catalog(args.photos)
+        token = str(RefreshToken.for_user(catalog.user).access_token)
+        path = f"/api/v1/photographers/{catalog.largest_photographer_id}/photos?expand=photographer"
+        photo_cache.enabled = False
+        counter = QueryCounter()
+
+        print(f"{args.photos} photos, bursts of {args.concurrency} requests")
+        print(f"{'coalescing':<12}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'queries':>9}{'coalesced':>11}")
+        executor = ThreadPoolExecutor(max_workers=args.concurrency)
+        for enabled in (False, True):
+            single_flight.enabled = enabled
+            _burst(executor, path, token, args.concurrency)  # warm up
+            single_flight.clear()
+            queries_before, latencies = counter.count, []
+            start = time.perf_counter()
+            for _ in range(args.bursts):
+                latencies.extend(_burst(executor, path, token, args.concurrency))
+            elapsed = time.perf_counter() - start
+            print(
+                f"{'on' if enabled else 'off':<12}{len(latencies) / elapsed:>9.0f}"
+                f"{percentile(latencies, 50) * 1000:>9.2f}{percentile(latencies, 99) * 1000:>9.2f}"
+                f"{(counter.count - queries_before) / len(latencies):>9.2f}{single_flight.stats()['ratio']:>11.1%}"
+            )
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
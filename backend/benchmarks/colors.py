@@ -0,0 +1,96 @@
+"""
+Measures nearest-color search latency (`photos.db.get_photographs_by_color`) with the in-memory color index
+(`photos.color_index`) against a sequential scan computing the distance of every photo, over a large synthetic
+catalog with random colors, e.g.
+
+    python -m benchmarks.colors --photos 1000000
+
+Also reports how long the index takes to load, and checks both paths return the same photos.
+"""
+
+from benchmarks import seed_catalog, summarize, test_database
+
+import argparse
+import random
+import time
+
+from django.db import connection, transaction
+
+from photos.cache import photo_cache
+from photos.color_index import color_index
+from photos.db import get_photographs_by_color
+from photos.models import Photograph, Photographer
+
+
+def seed_photos(count: int, batch_size: int = 10_000):
+    """Seeds `count` photos with uniformly random colors, spread over 100 photographers."""
+    seed_catalog(photographers=100, photos_per_photographer=0)
+    photographer_ids = list(Photographer.objects.values_list("id", flat=True))
+    rng = random.Random(42)
+    for start in range(0, count, batch_size):
+        photographs = [
+            Photograph(
+                title=f"photo {start + n}",
+                url=f"https://images.example.com/colors/{start + n}.jpeg",
+                avg_color=f"#{rng.randrange(1 << 24):06x}",
+                photographer_id=photographer_ids[(start + n) % len(photographer_ids)],
+            )
+            for n in range(min(batch_size, count - start))
+        ]
+        for photograph in photographs:
+            photograph.sync_color()
+        with transaction.atomic():
+            Photograph.objects.bulk_create(photographs)
+        print(f"seeded {min(start + batch_size, count)} photos", end="\r", flush=True)
+    print()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE photos_photograph")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=200_000, help="photos in the synthetic catalog")
+    parser.add_argument("--limit", type=int, default=20, help="nearest photos per query")
+    parser.add_argument("--queries", type=int, default=50, help="random query colors per path")
+    parser.add_argument("--scan-queries", type=int, default=5, help="query colors measured on the scan path")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    colors = [f"#{rng.randrange(1 << 24):06x}" for _ in range(args.queries)]
+
+    with test_database():
+        seed_photos(args.photos)
+        # measure the search paths, not the payload cache
+        photo_cache.enabled = False
+        print(f"{args.photos} photos on {connection.vendor}")
+
+        color_index.clear()
+        start = time.perf_counter()
+        color_index.refresh()
+        print(f"index loaded in {time.perf_counter() - start:.2f}s: {color_index.stats()}")
+
+        results = {}
+        samples: dict[bool, list[float]] = {True: [], False: []}
+        for enabled, queries in ((True, colors), (False, colors[: args.scan_queries])):
+            color_index.enabled = enabled
+            for color in queries:
+                start = time.perf_counter()
+                result = get_photographs_by_color(color=color, limit=args.limit, fields=("id",)).result
+                samples[enabled].append(time.perf_counter() - start)
+                results[(enabled, color)] = [photo["id"] for photo in result["results"]]
+
+        mismatches = [
+            color for color in colors[: args.scan_queries] if results[(True, color)] != results[(False, color)]
+        ]
+        stats = {enabled: summarize(path_samples) for enabled, path_samples in samples.items()}
+        print(f"{'path':<8}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}{'speedup':>9}")
+        for enabled, label in ((False, "scan"), (True, "index")):
+            path_stats = stats[enabled]
+            speedup = f"{stats[False]['mean'] / stats[True]['mean']:>8.1f}x" if enabled else ""
+            print(f"{label:<8}{path_stats['p50']:>9.2f}{path_stats['p99']:>9.2f}{path_stats['mean']:>9.2f}{speedup}")
+        print(f"results match: {not mismatches}" + (f" (differ for {mismatches})" if mismatches else ""))
+
+
+if __name__ == "__main__":
+    main()
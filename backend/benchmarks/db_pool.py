@@ -0,0 +1,80 @@
+"""
+Compares latency of single-row endpoints with and without connection pooling (see `DATABASE_POOL` in
+`backend/settings.py`), driving the ASGI application in-process. Without the pool, every request opens (and
+authenticates) a new PostgreSQL connection, and closes it when done, e.g.
+
+    python -m benchmarks.db_pool --requests 2000 --concurrency 1 16
+
+Requires PostgreSQL (`DATABASE_NAME` etc.), SQLite connections aren't pooled.
+"""
+
+from benchmarks import seed_catalog, summarize, test_database
+from benchmarks.async_reads import _run
+
+import argparse
+import asyncio
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.db import connection
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.metrics import get_pool_stats
+from photos.cache import photo_cache
+
+ROUTES = ["photos/{photo_id}", "photographers/{photographer_id}"]
+
+
+def configure_pool(pooled: bool):
+    """Turns pooling of the default database on or off, closing its current connection and pool."""
+    connection.close()
+    connection.close_pool()
+    # connections of every thread share the settings dict
+    connection.settings_dict["OPTIONS"].pop("pool", None)
+    if pooled:
+        connection.settings_dict["OPTIONS"]["pool"] = settings.DATABASE_POOL
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photographers", type=int, default=50)
+    parser.add_argument("--photos", type=int, default=20, help="photos per photographer")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route, mode and concurrency")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+
+    if connection.vendor != "postgresql":
+        raise SystemExit("connection pooling requires PostgreSQL, set DATABASE_NAME etc.")
+
+    with test_database():
+        photographer = seed_catalog(args.photographers, args.photos)
+        token = str(RefreshToken.for_user(photographer.user).access_token)
+        ids = {"photographer_id": photographer.id, "photo_id": photographer.photographs.first().id}
+        # measure the connection and query round trips, not the payload cache
+        photo_cache.enabled = False
+        application = get_asgi_application()
+        print(f"pool: {settings.DATABASE_POOL}")
+
+        print(f"{'route':<36}{'mode':<8}{'clients':>8}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}{'req/s':>9}")
+        for route in ROUTES:
+            path = f"/api/v1/{route.format(**ids)}"
+            for concurrency in args.concurrency:
+                for mode in ("direct", "pooled"):
+                    configure_pool(mode == "pooled")
+                    asyncio.run(_run(application, path, token, concurrency, concurrency))  # warm up
+                    latencies, elapsed = asyncio.run(_run(application, path, token, args.requests, concurrency))
+                    stats = summarize(latencies)
+                    print(
+                        f"{route:<36}{mode:<8}{concurrency:>8}{stats['p50']:>9.2f}{stats['p99']:>9.2f}"
+                        f"{stats['mean']:>9.2f}{len(latencies) / elapsed:>9.0f}"
+                    )
+        pool = get_pool_stats()["default"]
+        print(
+            f"last pool: {pool['connections_num']} connections opened for {pool['requests_num']} requests, "
+            f"{pool['requests_queued']} queued ({pool['requests_wait_ms']} ms waiting)"
+        )
+        configure_pool(False)
+
+
+if __name__ == "__main__":
+    main()
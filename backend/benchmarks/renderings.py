@@ -0,0 +1,58 @@
+"""
+Compares serving pages of photos from their stored renderings (see `photos.renderings`) with serializing them from
+their columns, from the read through the rendered bytes, with the photo cache off, checking both produce identical
+bytes. Also times `rebuild_photo_renderings` over the whole catalog, e.g.
+
+    python -m benchmarks.renderings --photos 100000 --limit 500
+"""
+
+from benchmarks import seed_template_catalog, summarize, test_database
+
+import argparse
+import time
+
+from api.renderers import FastJSONRenderer
+from photos.cache import photo_cache
+from photos.db import get_photographs, rebuild_photo_renderings
+from photos.models import Photograph
+from photos.renderings import photo_renderings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=20_000, help="photos in the synthetic catalog")
+    parser.add_argument("--limit", type=int, default=500, help="records per page")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        seed_template_catalog(args.photos)
+        start = time.perf_counter()
+        rebuild_photo_renderings()
+        elapsed = time.perf_counter() - start
+        print(f"rebuilt {args.photos} renderings in {elapsed:.1f}s ({args.photos / elapsed:.0f} photos/s)")
+
+        photo_cache.enabled = False
+        ids = list(Photograph.objects.order_by("id").values_list("id", flat=True)[:: args.limit])
+        print(f"{'renderings':<12}{'p50 ms':>9}{'p99 ms':>9}{'speedup':>9}")
+        outputs, baseline = {}, None
+        for enabled in (False, True):
+            photo_renderings.enabled = enabled
+            samples: list[float] = []
+            for n in range(args.iterations):
+                after = ids[n % len(ids)] - 1
+                start = time.perf_counter()
+                content = FastJSONRenderer().render(get_photographs(limit=args.limit, after=after).result)
+                samples.append(time.perf_counter() - start)
+                outputs.setdefault(after, set()).add(content)
+            stats = summarize(samples)
+            baseline = baseline or stats
+            speedup = f"{baseline['p50'] / stats['p50']:>8.1f}x" if enabled else ""
+            print(f"{'on' if enabled else 'off':<12}{stats['p50']:>9.2f}{stats['p99']:>9.2f}{speedup}")
+
+        if any(len(contents) > 1 for contents in outputs.values()):
+            raise AssertionError("pages served from renderings differ from serialized pages")
+
+
+if __name__ == "__main__":
+    main()
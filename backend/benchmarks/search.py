@@ -0,0 +1,100 @@
+"""
+Measures photo search latency (`photos.db.search_photographs`) over a large synthetic catalog, for common and rare
+terms, multiple terms and phrases, on the first page and deep into the results, e.g.
+
+    python -m benchmarks.search --photos 2000000
+
+Titles and alt texts are drawn from a synthetic vocabulary with a Zipf-like word distribution, so some terms match
+a large share of the catalog and others only a handful of photos. Run against PostgreSQL to measure the GIN index
+(other databases fall back to a substring scan, which is only practical for small catalogs).
+"""
+
+from benchmarks import seed_catalog, summarize, test_database
+
+import argparse
+import random
+import time
+from itertools import product
+
+from django.db import connection, transaction
+
+from photos.cache import photo_cache
+from photos.db import search_photographs, _get_photographs_search_queryset
+from photos.models import Photograph, Photographer
+from photos.pagination import decode_rank_cursor
+
+SYLLABLES = ["ka", "lo", "mi", "ser", "tan", "vu", "rel", "po", "dri", "nes", "ul", "fa", "gor", "bi", "zen"]
+VOCABULARY = ["".join(parts) for parts in product(SYLLABLES, repeat=3)]
+"""3375 distinct synthetic words, ranked by how common they are."""
+
+
+def seed_photos(count: int, batch_size: int = 10_000):
+    """Seeds `count` photos with titles and alt texts drawn from `VOCABULARY`, spread over 100 photographers."""
+    seed_catalog(photographers=100, photos_per_photographer=0)
+    photographer_ids = list(Photographer.objects.values_list("id", flat=True))
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    for start in range(0, count, batch_size):
+        words = rng.choices(VOCABULARY, weights=weights, k=min(batch_size, count - start) * 12)
+        with transaction.atomic():
+            Photograph.objects.bulk_create(
+                Photograph(
+                    title=" ".join(words[n * 12 : n * 12 + 4]),
+                    url=f"https://images.example.com/search/{start + n}.jpeg",
+                    alt_text=" ".join(words[n * 12 + 4 : n * 12 + 12]),
+                    photographer_id=photographer_ids[(start + n) % len(photographer_ids)],
+                )
+                for n in range(min(batch_size, count - start))
+            )
+        print(f"seeded {min(start + batch_size, count)} photos", end="\r", flush=True)
+    print()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE photos_photograph")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=200_000, help="photos in the synthetic catalog")
+    parser.add_argument("--limit", type=int, default=50, help="results per page")
+    parser.add_argument("--depth", type=int, default=20, help="page measured for deep pagination")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    queries = {
+        "common term": VOCABULARY[0],
+        "mid term": VOCABULARY[100],
+        "rare term": VOCABULARY[-1],
+        "two terms": f"{VOCABULARY[3]} {VOCABULARY[40]}",
+        "phrase": f'"{VOCABULARY[1]} {VOCABULARY[2]}"',
+    }
+
+    with test_database():
+        seed_photos(args.photos)
+        # measure the database path, not the payload cache
+        photo_cache.enabled = False
+        print(f"{args.photos} photos on {connection.vendor}")
+        print(_get_photographs_search_queryset(queries["rare term"]).order_by("-rank", "id")[: args.limit].explain())
+
+        print(f"{'query':<14}{'page':>6}{'p50 ms':>9}{'p99 ms':>9}{'matches':>10}")
+        for name, q in queries.items():
+            matches = _get_photographs_search_queryset(q).count()
+            after = None
+            for page in range(1, args.depth + 1):
+                if page in (1, args.depth):
+                    samples: list[float] = []
+                    for _ in range(args.iterations):
+                        start = time.perf_counter()
+                        result = search_photographs(q=q, limit=args.limit, after=after).result
+                        samples.append(time.perf_counter() - start)
+                    stats = summarize(samples)
+                    print(f"{name:<14}{page:>6}{stats['p50']:>9.2f}{stats['p99']:>9.2f}{matches:>10}")
+                else:
+                    result = search_photographs(q=q, limit=args.limit, after=after).result
+                if not result["next"]:
+                    break
+                after = decode_rank_cursor(result["next"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares rendering a page of records via the DRF serializers and JSONRenderer with the projection fast path
+(`photos.projections`) and FastJSONRenderer that the list endpoints use, checking both produce identical bytes, e.g.
+
+    python -m benchmarks.serialization --limit 500
+"""
+
+from benchmarks import seed_catalog, summarize, test_database
+
+import argparse
+import time
+from typing import Callable
+
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+from photos.models import Photograph, Photographer
+from photos.pagination import page_queryset
+from photos.projections import get_projection
+from photos.serializers import PhotographerSerializer, PhotographSerializer, PhotographSlimSerializer
+
+CASES = {
+    "photographers": (PhotographerSerializer, lambda: Photographer.objects.select_related("user")),
+    "photos (slim)": (PhotographSlimSerializer, lambda: Photograph.objects.select_related("source")),
+    "photos (full)": (PhotographSerializer, lambda: Photograph.objects.select_related("source", "photographer__user")),
+}
+
+
+def _time(func: Callable[[], bytes], iterations: int) -> list[float]:
+    """Returns the latency of each of `iterations` calls to `func`."""
+    samples: list[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=500, help="records per page")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with test_database():
+        seed_catalog(photographers=args.limit, photos_per_photographer=1)
+
+        print(f"{'page':<16}{'path':<12}{'p50 ms':>9}{'p99 ms':>9}{'speedup':>9}")
+        for name, (serializer_class, queryset) in CASES.items():
+            projection = get_projection(serializer_class)
+
+            def serializer_path() -> bytes:
+                rows = list(page_queryset(queryset(), args.limit))
+                return JSONRenderer().render(serializer_class(rows, many=True).data)
+
+            def projection_path() -> bytes:
+                rows = page_queryset(projection.queryset(queryset()), args.limit)
+                return FastJSONRenderer().render(list(map(projection.to_dict, rows)))
+
+            if serializer_path() != projection_path():
+                raise AssertionError(f"{name}: projection output differs from serializer output")
+
+            baseline = summarize(_time(serializer_path, args.iterations))
+            fast = summarize(_time(projection_path, args.iterations))
+            print(f"{name:<16}{'serializer':<12}{baseline['p50']:>9.2f}{baseline['p99']:>9.2f}")
+            speedup = baseline["p50"] / fast["p50"]
+            print(f"{name:<16}{'projection':<12}{fast['p50']:>9.2f}{fast['p99']:>9.2f}{speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
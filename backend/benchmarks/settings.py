@@ -0,0 +1,24 @@
+"""
+Settings for the benchmarks: the app's own settings, except that the database falls back to SQLite when no
+PostgreSQL database is configured (`DATABASE_NAME` is unset), or when `BENCHMARK_DATABASE=sqlite` is set.
+Benchmarks only ever run against a test database created next to the configured one (see `test_database`).
+`DEBUG` is off, as it is in production (with it on, Django records every query in memory).
+"""
+
+import os
+
+from backend.settings import *  # noqa: F403
+from backend.settings import BASE_DIR
+
+DEBUG = False
+
+if os.environ.get("BENCHMARK_DATABASE", "postgresql" if os.environ.get("DATABASE_NAME") else "sqlite") == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "benchmarks.sqlite3",
+            # a file rather than an in-memory database, so the database's pages don't count towards the process RSS
+            "TEST": {"NAME": BASE_DIR / "benchmarks_test.sqlite3"},
+        }
+    }
+    PHOTOS_REPLICAS = {**PHOTOS_REPLICAS, "ALIASES": []}  # noqa: F405
@@ -0,0 +1,85 @@
+"""
+Compares the size of the PhotoSource table (with its indexes and TOAST) and the cost of reading photo sources,
+with every variant URL stored explicitly and after converting the rows to compact storage (`original` plus a
+shared SourceTemplate, see `photos.source_templates`), over a synthetic catalog modeled on `photos.csv`, e.g.
+
+    python -m benchmarks.source_storage --photos 1000000
+
+Reads are measured as a full scan of the catalog through the Photograph projection (the shape of a large export),
+and as a page of the photo list. PostgreSQL only: table sizes and buffer counts come from its statistics.
+"""
+
+from benchmarks import seed_template_catalog, summarize, test_database
+
+import argparse
+import json
+import time
+from typing import Any
+
+from django.db import connection
+
+from photos.models import Photograph, PhotoSource, SourceTemplate
+from photos.projections import get_projection
+from photos.serializers import PhotographSerializer
+from photos.source_templates import convert_sources, source_templates
+
+
+def _vacuum():
+    """Rewrites the PhotoSource table, so its size only counts live rows, and refreshes planner statistics."""
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM FULL ANALYZE photos_photosource")
+        cursor.execute("ANALYZE photos_sourcetemplate")
+
+
+def _measure(iterations: int, limit: int) -> dict[str, Any]:
+    """Returns the table size, and the buffers and latency of a full scan and a list page, of the current rows."""
+    projection = get_projection(PhotographSerializer)
+    scan = projection.queryset(Photograph.objects.order_by("id"))
+    page = projection.queryset(Photograph.objects.order_by("id"))[:limit]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_total_relation_size('photos_photosource')")
+        size = cursor.fetchone()[0]
+    plan = json.loads(scan.explain(format="json", analyze=True, buffers=True))[0]["Plan"]
+
+    results: dict[str, Any] = {"size": size, "buffers": plan["Shared Hit Blocks"] + plan["Shared Read Blocks"]}
+    for name, queryset in (("scan", scan), ("page", page)):
+        samples: list[float] = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            [projection.to_dict(row) for row in queryset.all()]
+            samples.append(time.perf_counter() - start)
+        results[name] = summarize(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=int, default=200_000, help="photos in the synthetic catalog")
+    parser.add_argument("--limit", type=int, default=50, help="photos per list page")
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+    if connection.vendor != "postgresql":
+        parser.error("requires PostgreSQL (set DATABASE_NAME, see `benchmarks.settings`)")
+
+    with test_database():
+        # seed the explicit layout, as stored before templates existed
+        source_templates.compact_enabled = False
+        seed_template_catalog(args.photos)
+        _vacuum()
+        explicit = _measure(args.iterations, args.limit)
+        compact_rows = convert_sources(PhotoSource, SourceTemplate)
+        _vacuum()
+        compact = _measure(args.iterations, args.limit)
+
+    print(f"{args.photos} photos, {compact_rows} sources stored compactly")
+    print(f"{'storage':<10}{'table MB':>10}{'buffers':>10}{'scan p50 ms':>13}{'page p50 ms':>13}{'page p99 ms':>13}")
+    for name, stats in (("explicit", explicit), ("compact", compact)):
+        print(
+            f"{name:<10}{stats['size'] / 2**20:>10.1f}{stats['buffers']:>10}"
+            f"{stats['scan']['p50']:>13.1f}{stats['page']['p50']:>13.2f}{stats['page']['p99']:>13.2f}"
+        )
+    print(f"table size: {compact['size'] / explicit['size']:.0%} of explicit")
+
+
+if __name__ == "__main__":
+    main()
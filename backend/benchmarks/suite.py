@@ -0,0 +1,364 @@
+"""
+Benchmarks every route in `api/urls.py` over synthetic catalogs modeled on `photos.csv` (see
+`seed_template_catalog`), in process through both the Django test client (WSGI) and the ASGI application, e.g.
+
+    python -m benchmarks.suite --scales 10000 100000 1000000 --output benchmark-results.json
+    python -m benchmarks.suite --baseline benchmarks/baselines/main.json
+
+For each scale, route, method and transport it records throughput, latency percentiles, database queries per
+request and the peak RSS of the process, and writes them to `--output` as JSON. Given a `--baseline` (the output of
+an earlier run), results are compared against it: slower latencies or lower throughput beyond `--threshold`, and any
+additional queries, are flagged as regressions, and the run exits with status 1.
+
+Runs against the configured PostgreSQL database (its test database, never real data), or SQLite when none is
+configured (see `benchmarks.settings`). Reads bypass the photo cache unless `--cache` is passed. Passwords are
+hashed with a fast hasher, so `token/` measures the view rather than the configured hasher's work factor.
+"""
+
+from benchmarks import TemplateCatalog, percentile, seed_template_catalog, test_database
+
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import django
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.urls import urlpatterns
+from photos.cache import photo_cache
+from photos.color_index import color_index
+
+API_PREFIX = "/api/v1/"
+
+Request = tuple[str, Optional[Any], int]
+"""A request to benchmark: its path (relative to `API_PREFIX`), JSON body (or None) and expected status."""
+
+
+@dataclass
+class Context:
+    """State shared by the request builders of a run: the seeded catalog, and tokens for its login user."""
+
+    catalog: TemplateCatalog
+    access: str
+    refresh: str
+    counter: itertools.count
+
+
+def _new_photo(ctx: Context, label: str) -> dict[str, Any]:
+    url = f"https://images.example.com/benchmark/{label}/{next(ctx.counter)}.jpeg"
+    return {
+        "title": f"benchmark {label}",
+        "url": url,
+        "photographer_id": ctx.catalog.largest_photographer_id,
+        "avg_color": "#6D755E",
+        "source": {"original": url, "tiny": f"{url}?h=200&w=280"},
+    }
+
+
+SCENARIOS: dict[tuple[str, str], Optional[Callable[[Context], Request]]] = {
+    ("token/", "post"): lambda ctx: ("token/", {"username": ctx.catalog.user.username, "password": "benchmark"}, 200),
+    ("token/refresh/", "post"): lambda ctx: ("token/refresh/", {"refresh": ctx.refresh}, 200),
+    ("token/verify/", "post"): lambda ctx: ("token/verify/", {"token": ctx.access}, 200),
+    ("photographers", "get"): lambda ctx: ("photographers", None, 200),
+    ("photographers/<int:photographer_id>", "get"): lambda ctx: (
+        f"photographers/{ctx.catalog.largest_photographer_id}",
+        None,
+        200,
+    ),
+    ("photographers/<int:photographer_id>/photos", "get"): lambda ctx: (
+        f"photographers/{ctx.catalog.largest_photographer_id}/photos?expand=photographer",
+        None,
+        200,
+    ),
+    ("photos", "get"): lambda ctx: ("photos", None, 200),
+    ("photos", "post"): lambda ctx: ("photos", _new_photo(ctx, "single"), 201),
+    ("photos/bulk", "post"): lambda ctx: ("photos/bulk", [_new_photo(ctx, "bulk") for _ in range(10)], 201),
+    ("photos/color", "get"): lambda ctx: ("photos/color?color=%236D755E&limit=20", None, 200),
+    # export streams every photo of a photographer, so export the smallest one
+    ("photos/export", "get"): lambda ctx: (
+        f"photos/export?photographer_id={ctx.catalog.smallest_photographer_id}",
+        None,
+        200,
+    ),
+    # event streams stay open until the client leaves, there is no request latency to measure
+    ("photos/events", "get"): None,
+    ("photos/search", "get"): lambda ctx: ("photos/search?q=trees", None, 200),
+    ("photos/<int:photo_id>", "get"): lambda ctx: (f"photos/{ctx.catalog.photo_id}?expand=photographer", None, 200),
+    ("photos/<int:photo_id>", "put"): lambda ctx: (
+        f"photos/{ctx.catalog.photo_id}",
+        {"title": f"benchmark put {next(ctx.counter)}", "source": {"tiny": "https://images.example.com/put.jpeg"}},
+        201,
+    ),
+    ("photos/<int:photo_id>", "patch"): lambda ctx: (
+        f"photos/{ctx.catalog.photo_id}",
+        {"alt_text": f"benchmark patch {next(ctx.counter)}"},
+        201,
+    ),
+    ("changes", "get"): lambda ctx: ("changes?limit=50", None, 200),
+    ("health", "get"): lambda ctx: ("health", None, 200),
+    ("metrics", "get"): lambda ctx: ("metrics", None, 200),
+}
+"""
+Builds a request for every (route, method) in `api/urls.py` (None for routes that aren't benchmarked); `routes()`
+checks none is missing.
+"""
+
+
+class QueryCounter:
+    """Counts queries run on every database connection, including those opened by async views' worker threads."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        for conn in connections.all(initialized_only=True):
+            self._install(conn)
+        connection_created.connect(self._on_connection_created, weak=False)
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def _on_connection_created(self, sender, connection, **kwargs):
+        self._install(connection)
+
+    def _install(self, conn):
+        if self not in conn.execute_wrappers:
+            conn.execute_wrappers.append(self)
+
+
+def routes() -> list[tuple[str, str]]:
+    """Returns every (route, method) served by `api/urls.py`, failing if one has no scenario."""
+    found: list[tuple[str, str]] = []
+    for pattern in urlpatterns:
+        # async views delegate any method they don't implement to their sync view
+        view_classes = [pattern.callback.view_class, getattr(pattern.callback.view_class, "sync_view", None)]
+        for method in sorted(
+            {
+                m
+                for view_cls in filter(None, view_classes)
+                for m in view_cls.http_method_names
+                if m not in ("options", "head") and hasattr(view_cls, m)
+            }
+        ):
+            found.append((str(pattern.pattern), method))
+    missing = [key for key in found if key not in SCENARIOS]
+    if missing:
+        raise SystemExit(f"no benchmark scenario for {missing}, add one to SCENARIOS")
+    return found
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, in KB elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _check(path: str, status: int, expected: int, content: bytes):
+    if status != expected:
+        raise RuntimeError(f"{path} returned {status}, expected {expected}: {content[:500]!r}")
+
+
+def run_wsgi(ctx: Context, build: Callable[[Context], Request], method: str, requests: int) -> list[float]:
+    """Issues `requests` requests one after the other through the test client, returning their latencies."""
+    client = Client(headers={"Authorization": f"Bearer {ctx.access}"})
+    latencies: list[float] = []
+    for _ in range(requests):
+        path, body, expected = build(ctx)
+        start = time.perf_counter()
+        response = getattr(client, method)(API_PREFIX + path, **_body_kwargs(body))
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        latencies.append(time.perf_counter() - start)
+        _check(path, response.status_code, expected, content)
+    return latencies
+
+
+def run_asgi(
+    ctx: Context, build: Callable[[Context], Request], method: str, requests: int, concurrency: int
+) -> list[float]:
+    """Issues `requests` requests from `concurrency` concurrent clients through the ASGI app, returning latencies."""
+    latencies: list[float] = []
+
+    async def worker(count: int):
+        client = AsyncClient()
+        for _ in range(count):
+            path, body, expected = build(ctx)
+            start = time.perf_counter()
+            response = await getattr(client, method)(
+                API_PREFIX + path, headers={"Authorization": f"Bearer {ctx.access}"}, **_body_kwargs(body)
+            )
+            if response.streaming:
+                content = b"".join([chunk async for chunk in response.streaming_content])
+            else:
+                content = response.content
+            latencies.append(time.perf_counter() - start)
+            _check(path, response.status_code, expected, content)
+
+    async def main():
+        counts = [requests // concurrency + (n < requests % concurrency) for n in range(concurrency)]
+        # let every client finish before raising, so no request is left running in a worker thread
+        results = await asyncio.gather(*(worker(count) for count in counts if count), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    asyncio.run(main())
+    return latencies
+
+
+def _body_kwargs(body: Optional[Any]) -> dict[str, Any]:
+    return {} if body is None else {"data": json.dumps(body), "content_type": "application/json"}
+
+
+def measure(
+    ctx: Context, key: tuple[str, str], transport: str, counter: QueryCounter, requests: int, concurrency: int
+) -> dict[str, float]:
+    """Benchmarks one (route, method) over one transport, after a few warm up requests."""
+    build, method = SCENARIOS[key], key[1]
+    run: Callable[[int], list[float]] = (
+        (lambda n: run_wsgi(ctx, build, method, n))
+        if transport == "wsgi"
+        else (lambda n: run_asgi(ctx, build, method, n, concurrency))
+    )
+    run(min(requests, 5))
+
+    queries_before = counter.count
+    start = time.perf_counter()
+    latencies = run(requests)
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "queries": (counter.count - queries_before) / len(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_scale(photos: int, args: argparse.Namespace, counter: QueryCounter) -> dict[str, Any]:
+    """Seeds a catalog of `photos` photos in a fresh test database and benchmarks every route against it."""
+    with test_database():
+        start = time.perf_counter()
+        catalog = seed_template_catalog(photos, photos_per_photographer=args.photos_per_photographer)
+        seed_seconds = time.perf_counter() - start
+        refresh = RefreshToken.for_user(catalog.user)
+        ctx = Context(catalog, str(refresh.access_token), str(refresh), itertools.count())
+        photo_cache.enabled = args.cache
+        color_index.clear()
+
+        results: dict[str, Any] = {}
+        print(f"{photos} photos on {connection.vendor}, seeded in {seed_seconds:.1f}s")
+        print(f"{'route':<52}{'transport':<10}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'queries':>9}{'rss MB':>9}")
+        for key in routes():
+            if SCENARIOS[key] is None:
+                continue
+            if args.routes and not any(pattern in f"{key[1].upper()} {key[0]}" for pattern in args.routes):
+                continue
+            for transport in args.transports:
+                stats = measure(ctx, key, transport, counter, args.requests, args.concurrency)
+                name = f"{key[1].upper()} {key[0]} [{transport}]"
+                results[name] = stats
+                print(
+                    f"{key[1].upper() + ' ' + key[0]:<52}{transport:<10}{stats['throughput']:>9.0f}"
+                    f"{stats['p50_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['queries']:>9.1f}{stats['peak_rss_mb']:>9.0f}"
+                )
+        return {"photos": photos, "seed_seconds": seed_seconds, "routes": results}
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """
+    Returns the regressions of `results` against `baseline`: latency percentiles more than `threshold` (a fraction)
+    above the baseline's, throughput more than `threshold` below it, or more queries per request. Only scales and
+    routes present in both are compared.
+    """
+    regressions: list[str] = []
+    for scale, scale_results in results["scales"].items():
+        baseline_routes = baseline.get("scales", {}).get(scale, {}).get("routes", {})
+        for name, stats in scale_results["routes"].items():
+            before = baseline_routes.get(name)
+            if before is None:
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                if stats[metric] > before[metric] * (1 + threshold):
+                    regressions.append(f"{scale} {name}: {metric} {before[metric]:.2f} -> {stats[metric]:.2f}")
+            if stats["throughput"] < before["throughput"] * (1 - threshold):
+                regressions.append(
+                    f"{scale} {name}: throughput {before['throughput']:.0f} -> {stats['throughput']:.0f} req/s"
+                )
+            if stats["queries"] > before["queries"]:
+                regressions.append(f"{scale} {name}: queries {before['queries']:.1f} -> {stats['queries']:.1f}")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000], help="catalog sizes (photos) to run")
+    parser.add_argument("--photos-per-photographer", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route, method and transport")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients on the ASGI transport")
+    parser.add_argument("--transports", nargs="+", choices=["wsgi", "asgi"], default=["wsgi", "asgi"])
+    parser.add_argument("--routes", nargs="*", help="only run routes containing any of these, e.g. 'GET photos'")
+    parser.add_argument("--cache", action="store_true", help="serve reads from the photo cache")
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--baseline", type=Path, help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="tolerated slowdown, as a fraction")
+    args = parser.parse_args()
+
+    counter = QueryCounter()
+    results: dict[str, Any] = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "vendor": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "platform": platform.platform(),
+            "args": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        },
+        "scales": {},
+    }
+    with override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]):
+        for photos in args.scales:
+            results["scales"][str(photos)] = run_scale(photos, args, counter)
+            # write after every scale, so a long run that is interrupted keeps the finished scales
+            args.output.write_text(json.dumps(results, indent=2))
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        print(f"{len(regressions)} regressions against {args.baseline}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Measures the per-request overhead of ExternalJWTAuthentication with and without the verified-token cache
+(`api.token_cache`), replaying the same RS256 token like the frontend does, e.g.
+
+    python -m benchmarks.token_auth --requests 2000
+
+Needs `cryptography` for RS256 (it signs a throwaway key pair generated here).
+"""
+
+from benchmarks import summarize, test_database
+
+import argparse
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.backends import TokenBackend
+
+from api.auth import EXTERNAL_AUDIENCE, EXTERNAL_ISSUER, ExternalJWTAuthentication
+from api.token_cache import token_cache
+
+
+def _build_backend() -> TokenBackend:
+    """Returns an RS256 TokenBackend, configured like ExternalJWTAuthentication's, with a fresh key pair."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = (
+        key.public_key()
+        .public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+        .decode()
+    )
+    return TokenBackend(
+        algorithm="RS256",
+        signing_key=private_pem,
+        verifying_key=public_pem,
+        audience=EXTERNAL_AUDIENCE,
+        issuer=EXTERNAL_ISSUER,
+        leeway=30,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="authenticated requests per run")
+    args = parser.parse_args()
+
+    backend = _build_backend()
+    token = backend.encode({"sub": "bench", "email": "bench@example.com", "exp": int(time.time()) + 3600})
+    request = APIRequestFactory().get("/api/v1/photos", HTTP_AUTHORIZATION=f"Bearer {token}")
+    auth = ExternalJWTAuthentication()
+    auth.token_backend = backend
+
+    with test_database():
+        print(f"{'token cache':<14}{'p50 ms':>9}{'p99 ms':>9}{'mean ms':>9}{'speedup':>9}")
+        results = {}
+        for enabled in (False, True):
+            token_cache.clear()
+            token_cache.enabled = enabled
+            samples: list[float] = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                if auth.authenticate(request) is None:
+                    raise AssertionError("token was rejected")
+                samples.append(time.perf_counter() - start)
+            results[enabled] = summarize(samples)
+
+        for enabled, stats in results.items():
+            speedup = f"{results[False]['mean'] / stats['mean']:>8.1f}x" if enabled else ""
+            label = "enabled" if enabled else "disabled"
+            print(f"{label:<14}{stats['p50']:>9.3f}{stats['p99']:>9.3f}{stats['mean']:>9.3f}{speedup}")
+        print(f"cache stats: {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+from django.urls import path
+
+from api.async_views import AsyncPhotographerPhotosView, AsyncPhotographersView, AsyncPhotosView, AsyncPhotoView
+from api.views import PhotographerPhotosView, PhotographersView, PhotosView, PhotoView
+
+# mounts the sync (DRF) and async read views side by side, so the same requests can be timed against both
+urlpatterns = [
+    path("sync/photographers", PhotographersView.as_view()),
+    path("sync/photographers/<int:photographer_id>/photos", PhotographerPhotosView.as_view()),
+    path("sync/photos", PhotosView.as_view()),
+    path("sync/photos/<int:photo_id>", PhotoView.as_view()),
+    path("async/photographers", AsyncPhotographersView.as_view()),
+    path("async/photographers/<int:photographer_id>/photos", AsyncPhotographerPhotosView.as_view()),
+    path("async/photos", AsyncPhotosView.as_view()),
+    path("async/photos/<int:photo_id>", AsyncPhotoView.as_view()),
+]
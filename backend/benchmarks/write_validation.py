@@ -0,0 +1,86 @@
+"""
+Compares the CPU time spent validating a photo write payload (modeled on the rows of `photos.csv`, with all eight
+source URLs) by `validate_photograph` alone, plus the URL uniqueness check `photos.db` still runs, with the previous
+pipeline, which passed the validated data through `PhotographSerializer.is_valid()` once more (repeating every
+field and nested `PhotoSourceSerializer` check, and the uniqueness query), e.g.
+
+    python -m benchmarks.write_validation --iterations 5000
+"""
+
+from benchmarks import summarize, test_database
+
+import argparse
+import csv
+import time
+from typing import Any, Callable
+
+from photos.management.commands.seed_photos import CSV_FILE, SOURCE_COLUMNS
+from photos.models import Photograph
+from photos.serializers import PhotographSerializer
+from photos.validators import validate_photograph
+
+
+def _payloads(count: int) -> list[dict[str, Any]]:
+    """Returns `count` create payloads built from the rows of `photos.csv`, each under a URL of its own."""
+    with open(CSV_FILE, newline="") as csvfile:
+        rows = list(csv.DictReader(csvfile))
+    payloads: list[dict[str, Any]] = []
+    for n in range(count):
+        row = rows[n % len(rows)]
+        payloads.append(
+            {
+                "title": row["alt"][:255] or "photo",
+                "url": f"{row['url']}?copy={n}",
+                "photographer_id": 1,
+                "avg_color": row["avg_color"],
+                "alt_text": row["alt"][:255] or None,
+                "source": {field: row[column] or None for field, column in SOURCE_COLUMNS.items()},
+            }
+        )
+    return payloads
+
+
+def _time(func: Callable[[dict[str, Any]], Any], payloads: list[dict[str, Any]]) -> list[float]:
+    """Returns the CPU time of each call of `func` with one of `payloads`."""
+    samples: list[float] = []
+    for payload in payloads:
+        start = time.process_time()
+        func(payload)
+        samples.append(time.process_time() - start)
+    return samples
+
+
+def single_pass(payload: dict[str, Any]):
+    validated = validate_photograph(payload)
+    assert validated.success
+    Photograph.objects.filter(url=validated.data["url"]).exists()
+
+
+def serializer_pass(payload: dict[str, Any]):
+    validated = validate_photograph(payload)
+    assert validated.success
+    assert PhotographSerializer(data=validated.data).is_valid()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="payloads validated per pipeline")
+    args = parser.parse_args()
+
+    payloads = _payloads(args.iterations)
+    with test_database():
+        # warm up (compiled regexes, serializer fields, database connection)
+        for func in (single_pass, serializer_pass):
+            _time(func, payloads[:50])
+        baseline = summarize(_time(serializer_pass, payloads))
+        fast = summarize(_time(single_pass, payloads))
+
+    print(f"{'pipeline':<24}{'p50 µs':>9}{'p99 µs':>9}{'mean µs':>9}")
+    for name, stats in (("pydantic + serializer", baseline), ("pydantic (single pass)", fast)):
+        print(f"{name:<24}{stats['p50'] * 1000:>9.0f}{stats['p99'] * 1000:>9.0f}{stats['mean'] * 1000:>9.0f}")
+    saved = (baseline["mean"] - fast["mean"]) * 1000
+    print(f"CPU saved per write: {saved:.0f} µs ({baseline['mean'] / fast['mean']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
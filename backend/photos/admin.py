@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import Photograph, Photographer, PhotoSource
+from .models import Photograph, Photographer, PhotoSource, SourceTemplate, Tombstone
 
 User = get_user_model()
 
@@ -53,5 +53,32 @@ class PhotoSourceAdmin(admin.ModelAdmin):
         "large_2x",
         "portrait",
         "landscape",
+        "template",
     )
     list_display_links = ("id",)
+
+
+@admin.register(SourceTemplate)
+class SourceTemplateAdmin(admin.ModelAdmin):
+    """Enables display of SourceTemplate records in the admin system."""
+
+    list_display = (
+        "id",
+        "name",
+        "medium",
+        "small",
+        "tiny",
+        "large",
+        "large_2x",
+        "portrait",
+        "landscape",
+    )
+    list_display_links = ("id", "name")
+
+
+@admin.register(Tombstone)
+class TombstoneAdmin(admin.ModelAdmin):
+    """Enables display of Tombstone records in the admin system."""
+
+    list_display = ("id", "kind", "record_id", "deleted_at")
+    list_display_links = ("id",)
@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SETTINGS = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 10_000,
+    "TTL": 300,
+    "SHARED_ALIAS": None,
+    "WORKERS": 1,
+}
+"""Defaults for the `PHOTOS_CACHE` setting (see `backend/settings.py`)."""
+
+_TAG_KEY_PREFIX = "photos:tag:"
+_ENTRY_KEY_PREFIX = "photos:entry:"
+
+
+def _new_version(invalidated_at: float = 0.0) -> str:
+    # versions carry the (wall clock) time of the invalidation that created them, see `PhotoCache.invalidated_at`
+    return f"{invalidated_at:.3f}:{uuid.uuid4().hex}"
+
+
+@dataclass
+class CacheEntry:
+    """
+    Represents a cached payload. `tags` holds the version of every tag the payload depends on,
+    captured when it was computed; a payload is only valid while all of those versions are current.
+    """
+
+    value: Any
+    tags: dict[str, str]
+    expires_at: float = field(default=0.0)
+
+
+class PhotoCache:
+    """
+    Bounded in-process LRU cache with TTL for serialized payloads, with tag based invalidation.
+
+    Invalidating a tag bumps its version, which turns every entry computed against the previous version
+    into a miss. If `shared_alias` names a Django cache, entries and tag versions are also kept there so that
+    every worker shares them, with the local LRU acting as a first level in front of it. Otherwise they only live
+    in this process, which never sees the invalidations of writes made by other processes.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, shared_alias: Optional[str] = None, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.enabled = enabled
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._versions: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def shared(self):
+        """Returns the shared Django cache backend, if one is configured."""
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """Returns a `(hit, value)` tuple for the provided `key`."""
+        if not self.enabled:
+            return False, None
+
+        # check the local LRU first, then fall back to the shared backend (if configured)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(_ENTRY_KEY_PREFIX + key)
+            if entry is not None:
+                self._store(key, entry, now)
+
+        # entries are only valid while every tag they depend on is still at the captured version
+        if entry is not None and self.versions(entry.tags) == entry.tags:
+            with self._lock:
+                self.hits += 1
+            return True, entry.value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key: str, value: Any, tags: dict[str, str]):
+        """Caches `value` under `key`, where `tags` are the tag versions captured before it was computed."""
+        if not self.enabled:
+            return
+        entry = CacheEntry(value=value, tags=tags)
+        self._store(key, entry, time.monotonic())
+        if self.shared is not None:
+            self.shared.set(_ENTRY_KEY_PREFIX + key, entry, timeout=self.ttl)
+
+    def versions(self, tags: Iterable[str]) -> dict[str, str]:
+        """Returns the current version of each of the provided `tags`, creating versions for unknown tags."""
+        tags = list(tags)
+        if self.shared is not None:
+            found = self.shared.get_many([_TAG_KEY_PREFIX + tag for tag in tags])
+            versions = {tag: found.get(_TAG_KEY_PREFIX + tag) for tag in tags}
+            for tag, version in versions.items():
+                if version is None:
+                    # an unknown (or evicted) tag starts at a fresh version, so nothing cached against it is valid
+                    self.shared.add(_TAG_KEY_PREFIX + tag, _new_version(), timeout=None)
+                    versions[tag] = self.shared.get(_TAG_KEY_PREFIX + tag)
+            return versions
+
+        with self._lock:
+            versions = {}
+            for tag in tags:
+                if tag not in self._versions:
+                    self._versions[tag] = _new_version()
+                    # tag versions are bounded too, a dropped tag simply invalidates entries that used it
+                    if len(self._versions) > self.max_entries * 4:
+                        self._versions.popitem(last=False)
+                self._versions.move_to_end(tag)
+                versions[tag] = self._versions[tag]
+            return versions
+
+    def invalidate(self, *tags: str):
+        """Invalidates every entry that depends on any of the provided `tags`."""
+        now = time.time()
+        if self.shared is not None:
+            self.shared.set_many({_TAG_KEY_PREFIX + tag: _new_version(now) for tag in tags}, timeout=None)
+            return
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = _new_version(now)
+                self._versions.move_to_end(tag)
+            while len(self._versions) > self.max_entries * 4:
+                self._versions.popitem(last=False)
+
+    def invalidated_at(self, versions: dict[str, str]) -> float:
+        """Returns the time the most recent of `versions` was created by `invalidate`, `0.0` if none was."""
+        return max((float(version.split(":", 1)[0]) for version in versions.values() if ":" in version), default=0.0)
+
+    async def aget(self, key: str) -> tuple[bool, Any]:
+        """Async counterpart of `get`; only a shared backend lookup is moved off the event loop."""
+        return await self._acall(self.get, key)
+
+    async def aset(self, key: str, value: Any, tags: dict[str, str]):
+        """Async counterpart of `set`."""
+        return await self._acall(self.set, key, value, tags)
+
+    async def aversions(self, tags: Iterable[str]) -> dict[str, str]:
+        """Async counterpart of `versions`."""
+        return await self._acall(self.versions, tags)
+
+    def clear(self):
+        """Drops every local entry and tag version (the shared backend is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Returns the hit, miss and eviction counters, along with the current number of local entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    async def _acall(self, func, *args):
+        # local operations never block, so they run inline instead of paying for a thread hop
+        if self.shared is None:
+            return func(*args)
+        return await sync_to_async(func)(*args)
+
+    def _store(self, key: str, entry: CacheEntry, now: float):
+        # (re)insert entry into the local LRU, evicting the least recently used entries when full
+        entry = CacheEntry(value=entry.value, tags=entry.tags, expires_at=now + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+def _build_photo_cache() -> PhotoCache:
+    """
+    Builds the module level cache from the `PHOTOS_CACHE` setting. A cache without `SHARED_ALIAS` is disabled when
+    there are several `WORKERS`, as they would keep serving payloads invalidated by each other's writes.
+    """
+    config = {**DEFAULT_CACHE_SETTINGS, **getattr(settings, "PHOTOS_CACHE", {})}
+    enabled: bool = config["ENABLED"]
+    if enabled and not config["SHARED_ALIAS"] and config["WORKERS"] > 1:
+        logger.warning(
+            "photo cache disabled: %d workers without a shared cache would not see each other's invalidations, "
+            "set PHOTOS_CACHE_SHARED_ALIAS to enable it",
+            config["WORKERS"],
+        )
+        enabled = False
+    return PhotoCache(
+        max_entries=config["MAX_ENTRIES"],
+        ttl=config["TTL"],
+        shared_alias=config["SHARED_ALIAS"],
+        enabled=enabled,
+    )
+
+
+photo_cache = _build_photo_cache()
+"""Cache shared by the read functions in `photos.db`."""
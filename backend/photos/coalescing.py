@@ -0,0 +1,132 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from django.conf import settings
+
+DEFAULT_COALESCING_SETTINGS = {
+    "ENABLED": True,
+}
+"""Defaults for the `PHOTOS_COALESCING` setting (see `backend/settings.py`)."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls within a worker: the first call for a key runs the computation, and the
+    calls arriving while it is in flight wait for it instead of running it again. Every waiter gets its result,
+    or its exception. Sync calls share computations across threads, and async calls across tasks, including tasks
+    of other event loops (e.g. async views run by `async_to_sync` under WSGI, one loop per request). A sync call
+    never waits on an async computation (or vice versa), as a thread blocked on the event loop (or on the thread
+    `sync_to_async` runs the computation in) could deadlock it.
+
+    `name` groups keys for the counters, e.g. by read function.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flights: dict[str, Future] = {}
+        self._async_flights: dict[str, Future] = {}
+        self._counters: dict[str, list[int]] = {}
+
+    def do(self, name: str, key: str, func: Callable[[], Any]) -> Any:
+        """Returns the result of `func()`, shared with the concurrent calls for `key` from other threads."""
+        if not self.enabled:
+            return func()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+            self._count(name, leader)
+        if not leader:
+            return flight.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            # calls arriving from now on compute anew
+            with self._lock:
+                del self._flights[key]
+        flight.set_result(result)
+        return result
+
+    async def ado(self, name: str, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the result of `await func()`, shared with the concurrent calls for `key` from other tasks."""
+        if not self.enabled:
+            return await func()
+        with self._lock:
+            flight = self._async_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._async_flights[key] = Future()
+            self._count(name, leader)
+        if leader:
+            # computed in a task of its own, so cancelling the call that started it doesn't fail the others
+            task = asyncio.get_running_loop().create_task(func())
+            task.add_done_callback(partial(self._land, key, flight))
+            return await asyncio.shield(task)
+
+        try:
+            return await asyncio.shield(asyncio.wrap_future(flight))
+        except asyncio.CancelledError:
+            # the computation was cancelled along with the event loop it ran in (rather than this call), redo it
+            if flight.cancelled():
+                return await func()
+            raise
+
+    def _land(self, key: str, flight: Future, task: asyncio.Task):
+        """Hands the outcome of the finished `task` to the calls waiting on `flight`."""
+        with self._lock:
+            del self._async_flights[key]
+        if task.cancelled():
+            flight.cancel()
+        elif task.exception() is not None:
+            flight.set_exception(task.exception())
+        else:
+            flight.set_result(task.result())
+
+    def _count(self, name: str, leader: bool):
+        counters = self._counters.get(name)
+        if counters is None:
+            counters = self._counters[name] = [0, 0]
+        counters[0] += 1
+        if not leader:
+            counters[1] += 1
+
+    def counters(self) -> dict[str, tuple[int, int]]:
+        """Returns the `(calls, coalesced calls)` counters of each name."""
+        with self._lock:
+            return {name: (calls, coalesced) for name, (calls, coalesced) in self._counters.items()}
+
+    def clear(self):
+        """Resets the counters."""
+        with self._lock:
+            self._counters.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Returns the call counters over all names, the share of calls that were coalesced, and the calls in flight."""
+        with self._lock:
+            calls = sum(calls for calls, _ in self._counters.values())
+            coalesced = sum(coalesced for _, coalesced in self._counters.values())
+            in_flight = len(self._flights) + len(self._async_flights)
+        return {
+            "calls": calls,
+            "coalesced": coalesced,
+            "ratio": round(coalesced / calls, 4) if calls else 0.0,
+            "in_flight": in_flight,
+        }
+
+
+def _build_single_flight() -> SingleFlight:
+    """Builds the read coalescing from the `PHOTOS_COALESCING` setting."""
+    config = {**DEFAULT_COALESCING_SETTINGS, **getattr(settings, "PHOTOS_COALESCING", {})}
+    return SingleFlight(enabled=config["ENABLED"])
+
+
+single_flight = _build_single_flight()
@@ -0,0 +1,375 @@
+import heapq
+import logging
+import math
+import threading
+import time
+from array import array
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import connections, router
+
+from photos.colors import Lab
+from photos.models import Photograph
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COLOR_INDEX_SETTINGS = {
+    "ENABLED": True,
+    "CELL_SIZE": 8.0,
+    "TTL": 300,
+    "LOAD_CHUNK_SIZE": 10_000,
+    "WARM": True,
+}
+"""Defaults for the `PHOTOS_COLOR_INDEX` setting (see `backend/settings.py`)."""
+
+DEFAULT_COLOR_LIMIT = 20
+"""Number of nearest photos returned by color queries, unless a `limit` is provided."""
+
+MAX_COLOR_LIMIT = 100
+"""Maximum number of nearest photos a color query may ask for."""
+
+# bounds of the CIELAB gamut covered by the grid; sRGB colors fall well within them, anything else is clamped
+_L_RANGE = (0.0, 100.0)
+_AB_RANGE = (-128.0, 128.0)
+
+
+class _Cell:
+    """Photos whose color falls in one grid cell, as packed arrays: their IDs and their interleaved `L, a, b`."""
+
+    __slots__ = ("ids", "labs")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.labs = array("f")
+
+    def append(self, id: int, lab: Lab):
+        self.ids.append(id)
+        self.labs.extend(lab)
+
+    def remove(self, id: int):
+        # swap the entry with the last one, so removal doesn't shift the arrays
+        index = self.ids.index(id)
+        last = len(self.ids) - 1
+        self.ids[index] = self.ids[last]
+        self.labs[index * 3 : index * 3 + 3] = self.labs[last * 3 : last * 3 + 3]
+        del self.ids[last]
+        del self.labs[last * 3 :]
+
+
+class _Grid:
+    """
+    Uniform grid over CIELAB with cells of `cell_size` on every axis. `cell_of` maps photo IDs (used as indexes,
+    as IDs are dense) to the cell holding them, so updates and removals only touch that cell.
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.shape = (
+            math.ceil((_L_RANGE[1] - _L_RANGE[0]) / cell_size) + 1,
+            math.ceil((_AB_RANGE[1] - _AB_RANGE[0]) / cell_size) + 1,
+            math.ceil((_AB_RANGE[1] - _AB_RANGE[0]) / cell_size) + 1,
+        )
+        self.cells: dict[int, _Cell] = {}
+        self.cell_of = array("i")
+        self.size = 0
+        self.max_id = 0
+        # bounds (inclusive, in cell coordinates) of the occupied cells, so searches stop once they are covered
+        self.low = list(self.shape)
+        self.high = [-1, -1, -1]
+
+    def coords(self, lab: Lab) -> tuple[int, int, int]:
+        """Returns the coordinates of the cell `lab` falls in (colors outside the grid are clamped to its edges)."""
+        return tuple(
+            min(max(int((value - origin) // self.cell_size), 0), extent - 1)
+            for value, origin, extent in zip(lab, (_L_RANGE[0], _AB_RANGE[0], _AB_RANGE[0]), self.shape)
+        )
+
+    def key(self, coords: Iterable[int]) -> int:
+        i, j, k = coords
+        return (i * self.shape[1] + j) * self.shape[2] + k
+
+    def add(self, id: int, lab: Lab):
+        """Adds (or moves) the photo with `id` to the cell of `lab`."""
+        self.remove(id)
+        coords = self.coords(lab)
+        key = self.key(coords)
+        self.cells.setdefault(key, _Cell()).append(id, lab)
+        if id >= len(self.cell_of):
+            self.cell_of.extend([-1] * (id + 1 - len(self.cell_of)))
+        self.cell_of[id] = key
+        self.size += 1
+        self.max_id = max(self.max_id, id)
+        for axis, value in enumerate(coords):
+            self.low[axis] = min(self.low[axis], value)
+            self.high[axis] = max(self.high[axis], value)
+
+    def remove(self, id: int):
+        """Removes the photo with `id`, if it is in the grid."""
+        key = self.cell_of[id] if id < len(self.cell_of) else -1
+        if key < 0:
+            return
+        cell = self.cells[key]
+        cell.remove(id)
+        if not cell.ids:
+            del self.cells[key]
+        self.cell_of[id] = -1
+        self.size -= 1
+
+    def nearest(self, lab: Lab, k: int) -> list[tuple[float, int]]:
+        """
+        Returns the squared distances and IDs of the (at most) `k` photos nearest to `lab`, nearest first.
+        Cells are visited in rings of growing (Chebyshev) distance around the cell of `lab`; a cell is skipped
+        if its box is farther than the current `k`th nearest photo, and the search stops once no unvisited cell
+        can be nearer than it (or every occupied cell was visited).
+        """
+        if not self.size or k < 1:
+            return []
+
+        center = self.coords(lab)
+        origins = (_L_RANGE[0], _AB_RANGE[0], _AB_RANGE[0])
+        # distance from `lab` to the nearest face of its own cell; ring `r` is at least `r` cells further out
+        margin = min(
+            min(value - (origin + index * self.cell_size), origin + (index + 1) * self.cell_size - value)
+            for value, origin, index in zip(lab, origins, center)
+        )
+        margin = max(margin, 0.0)
+        rings = max(max(abs(c - low), abs(high - c)) for c, low, high in zip(center, self.low, self.high))
+
+        # max-heap (via negated keys) of the `k` nearest photos found so far, ties broken by ID
+        heap: list[tuple[float, int]] = []
+        ql, qa, qb = lab
+        for ring in range(rings + 1):
+            for coords in self._ring(center, ring):
+                cell = self.cells.get(self.key(coords))
+                if cell is None:
+                    continue
+                if len(heap) == k and self._box_distance(lab, coords, origins) > -heap[0][0]:
+                    continue
+                labs = cell.labs
+                for id, lightness, a, b in zip(cell.ids, labs[0::3], labs[1::3], labs[2::3]):
+                    dl, da, db = lightness - ql, a - qa, b - qb
+                    entry = (-(dl * dl + da * da + db * db), -id)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+            bound = ring * self.cell_size + margin
+            if len(heap) == k and -heap[0][0] <= bound * bound:
+                break
+        return sorted((-distance, -id) for distance, id in heap)
+
+    def _ring(self, center: tuple[int, int, int], ring: int) -> Iterable[tuple[int, int, int]]:
+        """Yields the coordinates of occupied-range cells at Chebyshev distance `ring` from `center`."""
+        ci, cj, ck = center
+        i_range = range(max(ci - ring, self.low[0]), min(ci + ring, self.high[0]) + 1)
+        j_range = range(max(cj - ring, self.low[1]), min(cj + ring, self.high[1]) + 1)
+        k_range = range(max(ck - ring, self.low[2]), min(ck + ring, self.high[2]) + 1)
+        for i in i_range:
+            i_edge = abs(i - ci) == ring
+            for j in j_range:
+                if i_edge or abs(j - cj) == ring:
+                    # on a face of the ring, every cell along the last axis belongs to it
+                    for k in k_range:
+                        yield i, j, k
+                else:
+                    # inside the ring, only the two cells capping the last axis do
+                    for k in (ck - ring, ck + ring):
+                        if k in k_range:
+                            yield i, j, k
+
+    def _box_distance(self, lab: Lab, coords: tuple[int, int, int], origins: tuple[float, ...]) -> float:
+        """Returns the squared distance from `lab` to the nearest point of the cell at `coords`."""
+        total = 0.0
+        for value, origin, index in zip(lab, origins, coords):
+            low = origin + index * self.cell_size
+            delta = max(low - value, 0.0, value - low - self.cell_size)
+            total += delta * delta
+        return total
+
+
+class ColorIndex:
+    """
+    In-memory nearest-color index over the CIELAB components of photo colors (see `Photograph.color_l`), built
+    as a uniform grid of packed arrays, so top-k queries only compare against photos in nearby cells rather than
+    scanning the whole catalog.
+
+    The index is loaded from the database on the first query, or ahead of it by `warm` when a worker starts. Like
+    rebuilds, loads run without holding the lock, so writes aren't held up by them. Saves and deletes in this
+    process update it once their transaction commits (see `photos.signals`), and photos created by other processes
+    are picked up by a cheap catch-up query (`id > max_id`) before every search. Colors changed or photos deleted
+    elsewhere are picked up by a full rebuild every `ttl` seconds, done in a background thread while the current
+    grid keeps serving.
+    """
+
+    def __init__(
+        self, cell_size: float, ttl: float, load_chunk_size: int, enabled: bool = True, warm_on_start: bool = True
+    ):
+        self.cell_size = cell_size
+        self.ttl = ttl
+        self.load_chunk_size = load_chunk_size
+        self.enabled = enabled
+        self.warm_on_start = warm_on_start
+        self._grid: Optional[_Grid] = None
+        self._loaded_at = 0.0
+        # changes applied while a load or rebuild is in progress, replayed onto the new grid before it is swapped in
+        self._pending: Optional[list[tuple[int, Optional[Lab]]]] = None
+        # set once the initial load in progress (if any) is done
+        self._loading: Optional[threading.Event] = None
+        self._lock = threading.RLock()
+        self.queries = 0
+        self.rebuilds = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._grid is not None
+
+    def nearest(self, lab: Lab, k: int) -> list[tuple[int, float]]:
+        """Returns the IDs of the (at most) `k` photos with the colors nearest to `lab`, with their distances."""
+        self.refresh()
+        with self._lock:
+            self.queries += 1
+            return [(id, math.sqrt(distance)) for distance, id in self._grid.nearest(lab, k)]
+
+    def refresh(self):
+        """
+        Loads the index if it isn't loaded yet, otherwise catches up with photos created since it was loaded, and
+        starts a background rebuild if it is older than `ttl`.
+        """
+        while True:
+            with self._lock:
+                if self._grid is not None:
+                    max_id = self._grid.max_id
+                    break
+                loading, leader = self._loading, self._loading is None
+                if leader:
+                    self._loading = loading = threading.Event()
+                    self._pending = []
+            if leader:
+                # loaded in this thread (rather than in the background) so it sees the caller's transaction
+                try:
+                    self._build()
+                finally:
+                    with self._lock:
+                        self._pending = self._loading = None
+                    loading.set()
+                return
+            # wait for the load in progress; if it failed, the next waiter to wake up loads instead
+            loading.wait()
+
+        for id, lab in self._fetch(Photograph.objects.filter(id__gt=max_id)):
+            self.update(id, lab)
+
+        with self._lock:
+            if self._pending is None and time.monotonic() - self._loaded_at >= self.ttl:
+                self._pending = []
+                threading.Thread(target=self._rebuild, name="color-index-rebuild", daemon=True).start()
+
+    def update(self, id: int, lab: Optional[Lab]):
+        """Sets the color of the photo with `id` (removing it from the index if `lab` is None)."""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((id, lab))
+            # without a grid, the photo is read along with the rest when the index is loaded
+            if self._grid is not None:
+                self._apply(self._grid, id, lab)
+
+    def remove(self, id: int):
+        """Removes the photo with `id` from the index."""
+        self.update(id, None)
+
+    def warm(self):
+        """
+        Loads the index in a background thread, unless it is disabled (or `warm_on_start` is off) or already loaded,
+        e.g. when a worker starts, so the first color query doesn't wait for a full load.
+        """
+        if self.enabled and self.warm_on_start and not self.loaded:
+            threading.Thread(target=self._warm, name="color-index-warm", daemon=True).start()
+
+    def clear(self):
+        """Drops the index (it is reloaded on the next query) and resets the counters."""
+        with self._lock:
+            self._grid = None
+            self._pending = None
+            self.queries = self.rebuilds = 0
+
+    def stats(self) -> dict[str, int]:
+        """Returns the query and rebuild counters, along with the number of indexed photos and occupied cells."""
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "rebuilds": self.rebuilds,
+                "photos": self._grid.size if self._grid else 0,
+                "cells": len(self._grid.cells) if self._grid else 0,
+            }
+
+    def _load(self) -> _Grid:
+        """Builds a grid from every photo with a color."""
+        grid = _Grid(self.cell_size)
+        for id, lab in self._fetch(Photograph.objects.all()):
+            grid.add(id, lab)
+        return grid
+
+    def _fetch(self, queryset) -> Iterable[tuple[int, Lab]]:
+        rows = (
+            queryset.filter(color_l__isnull=False)
+            .order_by("id")
+            .values_list("id", "color_l", "color_a", "color_b")
+            .iterator(chunk_size=self.load_chunk_size)
+        )
+        return ((id, (lightness, a, b)) for id, lightness, a, b in rows)
+
+    def _build(self):
+        """Loads a new grid and swaps it in, once the changes applied in the meantime (`_pending`) are replayed."""
+        grid = self._load()
+        with self._lock:
+            if self._pending is None:
+                # cleared while loading
+                return
+            for id, lab in self._pending:
+                self._apply(grid, id, lab)
+            self._grid = grid
+            self._loaded_at = time.monotonic()
+            self.rebuilds += 1
+
+    def _warm(self):
+        try:
+            self.refresh()
+        except Exception:
+            # the first query loads the index instead
+            logger.exception("failed to warm the color index")
+        finally:
+            connections[router.db_for_read(Photograph)].close()
+
+    def _rebuild(self):
+        try:
+            self._build()
+        finally:
+            with self._lock:
+                if self._loading is None:
+                    # unless cleared meanwhile and reloading, which tracks its own changes
+                    self._pending = None
+            connections[router.db_for_read(Photograph)].close()
+
+    @staticmethod
+    def _apply(grid: _Grid, id: int, lab: Optional[Lab]):
+        if lab is None:
+            grid.remove(id)
+        else:
+            grid.add(id, lab)
+
+
+def _build_color_index() -> ColorIndex:
+    """Builds the module level index from the `PHOTOS_COLOR_INDEX` setting."""
+    config = {**DEFAULT_COLOR_INDEX_SETTINGS, **getattr(settings, "PHOTOS_COLOR_INDEX", {})}
+    return ColorIndex(
+        cell_size=config["CELL_SIZE"],
+        ttl=config["TTL"],
+        load_chunk_size=config["LOAD_CHUNK_SIZE"],
+        enabled=config["ENABLED"],
+        warm_on_start=config["WARM"],
+    )
+
+
+color_index = _build_color_index()
+"""Nearest-color index over all photos, shared by `photos.db.get_photographs_by_color` calls in this process."""
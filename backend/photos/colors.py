@@ -0,0 +1,48 @@
+import re
+from typing import Optional
+
+HEX_COLOR = re.compile(r"^#?([0-9a-fA-F]{6}|[0-9a-fA-F]{3})$")
+"""Matches `#RRGGBB` (or `#RGB`) hex colors, with the `#` optional."""
+
+Lab = tuple[float, float, float]
+"""A color in CIELAB (`L*`, `a*`, `b*`), where euclidean distance approximates perceived difference."""
+
+# D65 reference white, which sRGB is defined against
+_WHITE = (0.95047, 1.0, 1.08883)
+_EPSILON = (6 / 29) ** 3
+
+
+def parse_hex(value: Optional[str]) -> Optional[tuple[int, int, int]]:
+    """Returns the `(r, g, b)` components of the hex color `value`, or None if it isn't one."""
+    match = HEX_COLOR.match(value.strip()) if value else None
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = "".join(digit * 2 for digit in digits)
+    return int(digits[0:2], 16), int(digits[2:4], 16), int(digits[4:6], 16)
+
+
+def hex_to_lab(value: Optional[str]) -> Optional[Lab]:
+    """Returns the CIELAB components of the (sRGB) hex color `value`, or None if it isn't one."""
+    rgb = parse_hex(value)
+    if rgb is None:
+        return None
+
+    # sRGB -> linear RGB -> CIE XYZ (D65), normalized by the reference white
+    r, g, b = (_linearize(channel / 255) for channel in rgb)
+    x = (0.4124564 * r + 0.3575761 * g + 0.1804375 * b) / _WHITE[0]
+    y = (0.2126729 * r + 0.7151522 * g + 0.0721750 * b) / _WHITE[1]
+    z = (0.0193339 * r + 0.1191920 * g + 0.9503041 * b) / _WHITE[2]
+
+    # CIE XYZ -> CIELAB
+    fx, fy, fz = _lab_f(x), _lab_f(y), _lab_f(z)
+    return 116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz)
+
+
+def _linearize(channel: float) -> float:
+    return channel / 12.92 if channel <= 0.04045 else ((channel + 0.055) / 1.055) ** 2.4
+
+
+def _lab_f(t: float) -> float:
+    return t ** (1 / 3) if t > _EPSILON else t / (3 * (6 / 29) ** 2) + 4 / 29
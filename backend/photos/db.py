@@ -1,18 +1,55 @@
+import hashlib
+import math
 from dataclasses import dataclass, field
-from typing import Any, Optional, Type, TypeVar
+from datetime import datetime, timedelta
+from functools import partial, wraps
+from itertools import islice
+from inspect import iscoroutinefunction, signature
+from operator import itemgetter
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Type, TypeVar
 
-from django.db.models import Model, QuerySet
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Model, Q, QuerySet, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.http import quote_etag
 from rest_framework.serializers import ModelSerializer
 from rest_framework import status
 
-from photos.models import Photograph, Photographer
+from photos.cache import photo_cache
+from photos.coalescing import single_flight
+from photos.color_index import DEFAULT_COLOR_LIMIT, color_index
+from photos.colors import Lab, hex_to_lab
+from photos.models import Photograph, PhotographRendering, Photographer, PhotoSource, Tombstone
+from photos.pagination import (
+    DEFAULT_PAGE_LIMIT,
+    ChangeKey,
+    Page,
+    build_page,
+    changes_queryset,
+    encode_changes_cursor,
+    page_queryset,
+    page_ranked_queryset,
+)
+from photos.projections import SerializerProjection, get_projection
+from photos.renderings import PAGE_LOOKUPS, photo_renderings
+from photos.routers import reads_from_replica, replica_routing
 from photos.serializers import PhotographSerializer, PhotographSlimSerializer, PhotographerSerializer
+from photos.source_templates import source_templates
+from photos.signals import photographs_bulk_created
+from photos.timing import timed
 from photos.validators import ValidatedData
 
 
 M = TypeVar("M", bound=Model)
 """Represents a generic type for a Django Model, used to genericize types for QuerySet."""
 
+SEARCH_CONFIG = "english"
+"""Text search configuration the `search_vector` column is built with (see migration 0003), queries must match it."""
+
 
 @dataclass
 class DbResult:
@@ -29,108 +66,1236 @@ class DbResult:
     http_code: Optional[int] = field(default_factory=lambda: status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def get_photographers() -> DbResult:
-    """Returns a list of all Photographer records."""
-    queryset: QuerySet[M] = Photographer.objects.all().select_related("user")
-    serializer: PhotographerSerializer = PhotographerSerializer(queryset, many=True)
-    return DbResult(success=True, result=serializer.data)
+def cached(name: str, tags: Callable[..., Iterable[str]], result_tags: Optional[Callable[[Any], Iterable[str]]] = None):
+    """
+    Caches the result payload of successful `DbResult`s returned by the decorated read function in `photo_cache`.
+    `tags` receives the call arguments and returns the cache tags known up front. Their versions are captured
+    before the function runs, so a write that lands mid-computation still invalidates the cached payload.
+    `result_tags` receives the payload and returns any tags that can only be derived from it.
+    Tags are invalidated by the receivers in `photos.signals`. Sync and async functions are both supported;
+    a sync function and its async counterpart should use the same `name` so they share cached payloads.
+    Payloads read from a replica aren't cached while one of their tags was invalidated within the stickiness
+    window, as the replica may not have caught up with that write yet (see `photos.routers`).
+    Concurrent identical calls that miss the cache share a single computation (see `photos.coalescing`).
+    """
 
+    def decorator(func):
+        func_signature = signature(func)
+
+        def get_key_and_tags(args, kwargs) -> tuple[str, list[str]]:
+            # build cache key and up front tags from the bound call arguments
+            bound = func_signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = ":".join([name, *(f"{arg}={value}" for arg, value in bound.arguments.items())])
+            return key, list(tags(**bound.arguments))
+
+        if iscoroutinefunction(func):
+
+            async def acompute(key: str, versions: dict[str, str], args, kwargs) -> DbResult:
+                # compute result and cache it (only if successful)
+                result: DbResult = await func(*args, **kwargs)
+                if result.success:
+                    if result_tags:
+                        versions.update(await photo_cache.aversions(result_tags(result.result)))
+                    if not replica_routing.lagging(photo_cache.invalidated_at(versions)):
+                        await photo_cache.aset(key, result.result, versions)
+                return result
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> DbResult:
+                # return cached payload, if found
+                key, key_tags = get_key_and_tags(args, kwargs)
+                hit, payload = await photo_cache.aget(key)
+                if hit:
+                    return DbResult(success=True, result=payload)
+
+                # otherwise compute it, or wait for an identical call already computing it
+                versions = await photo_cache.aversions(key_tags)
+                compute = partial(acompute, key, versions, args, kwargs)
+                return await single_flight.ado(name, _get_flight_key(key, versions), compute)
+
+            return async_wrapper
+
+        def compute(key: str, versions: dict[str, str], args, kwargs) -> DbResult:
+            # compute result and cache it (only if successful)
+            result: DbResult = func(*args, **kwargs)
+            if result.success:
+                if result_tags:
+                    versions.update(photo_cache.versions(result_tags(result.result)))
+                if not replica_routing.lagging(photo_cache.invalidated_at(versions)):
+                    photo_cache.set(key, result.result, versions)
+            return result
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> DbResult:
+            # return cached payload, if found
+            key, key_tags = get_key_and_tags(args, kwargs)
+            hit, payload = photo_cache.get(key)
+            if hit:
+                return DbResult(success=True, result=payload)
+
+            # otherwise compute it, or wait for an identical call already computing it
+            versions = photo_cache.versions(key_tags)
+            return single_flight.do(name, _get_flight_key(key, versions), partial(compute, key, versions, args, kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def _get_flight_key(key: str, versions: dict[str, str]) -> str:
+    """
+    Returns the key under which calls for cache `key` share a computation. Calls only share one if they read from
+    the same place (a replica, or `default` when pinned there after a write) and none of the tags they depend
+    on was invalidated since it started, so read-your-writes holds for the callers that join it.
+    """
+    source = "primary" if replica_routing.db_for_read() is None else "replica"
+    return ":".join([key, source, *(versions[tag] for tag in sorted(versions))])
+
+
+def _photographers_tags(**_) -> list[str]:
+    return ["photographers"]
+
+
+def _photographer_tags(id: int, **_) -> list[str]:
+    return [f"photographer:{id}"]
+
+
+def _photographer_result_tags(photographer: dict[str, Any]) -> list[str]:
+    if "user" not in photographer:
+        return []
+    # payloads pruned via `fields` may nest the User without its ID, fall back to the tag of all photographers
+    return [f"user:{photographer['user']['id']}"] if "id" in photographer["user"] else ["photographers"]
+
+
+def _photographs_tags(photographer_id: Optional[int] = None, prefetch_photographer: bool = False, **_) -> list[str]:
+    return [
+        f"photographer:{photographer_id}:photos" if photographer_id else "photos",
+        *(["photographers"] if prefetch_photographer else []),
+    ]
+
+
+def _photograph_tags(id: int, **_) -> list[str]:
+    return [f"photo:{id}"]
+
+
+def _photograph_validators_tags(id: int, prefetch_photographer: bool = False, **_) -> list[str]:
+    # the nested Photographer's ID isn't known up front, fall back to the tag of all of them
+    return [f"photo:{id}", *(["photographers"] if prefetch_photographer else [])]
+
+
+def _photograph_result_tags(photo: dict[str, Any]) -> list[str]:
+    if "photographer" not in photo:
+        return []
+    # payloads pruned via `fields` may nest the Photographer without its ID, fall back to the tag of all of them
+    if "id" not in photo["photographer"]:
+        return ["photographers"]
+    return [f"photographer:{photo['photographer']['id']}", *_photographer_result_tags(photo["photographer"])]
+
+
+def _photographers_batch_tags(ids: tuple[int, ...], **_) -> list[str]:
+    return [f"photographer:{id}" for id in ids]
 
-def get_photographer(id: int) -> DbResult:
-    """Returns Photographer record with ID matching provided `id`."""
-    # find Photographer by ID, return 404 if not found
-    photographer: Photographer = Photographer.objects.filter(id=id).select_related("user").first()
-    if not photographer:
-        return DbResult(success=False, http_code=status.HTTP_404_NOT_FOUND)
 
-    # return serialized Photographer data
-    serializer: PhotographerSerializer = PhotographerSerializer(photographer)
-    return DbResult(success=True, result=serializer.data)
+def _photographers_batch_result_tags(batch: dict[str, Any]) -> list[str]:
+    # missing IDs may be created later, which invalidates the tag of all photographers
+    return [
+        *(tag for photographer in batch["results"] for tag in _photographer_result_tags(photographer)),
+        *(["photographers"] if batch["missing"] else []),
+    ]
 
 
-def get_photographs(photographer_id: Optional[int] = None, prefetch_photographer: Optional[bool] = False) -> DbResult:
+def _photographs_batch_tags(ids: tuple[int, ...], **_) -> list[str]:
+    return [f"photo:{id}" for id in ids]
+
+
+def _photographs_batch_result_tags(batch: dict[str, Any]) -> list[str]:
+    # missing IDs may be created later, which invalidates the tag of all photos
+    return [
+        *(tag for photo in batch["results"] for tag in _photograph_result_tags(photo)),
+        *(["photos"] if batch["missing"] else []),
+    ]
+
+
+@reads_from_replica
+@cached("photographers", tags=_photographers_tags)
+def get_photographers(
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """
+    Returns a page of Photographer records, ordered by ID.
+    `after` / `before` are the decoded ID cursors to seek from (see `photos.pagination`).
+    If `fields` is provided, records only include those field paths (see `photos.serializers.prune_fields`).
+    """
+    # fetch page of photographers via keyset pagination on ID, projected onto the serialized columns
+    queryset: QuerySet[M] = _get_photographers_page_queryset(limit, after, before, fields)
+    return _get_photographers_page_result(list(queryset), limit, after, before, fields)
+
+
+@reads_from_replica
+@cached("photographer", tags=_photographer_tags, result_tags=_photographer_result_tags)
+def get_photographer(id: int, fields: Optional[tuple[str, ...]] = None) -> DbResult:
+    """
+    Returns Photographer record with ID matching provided `id`.
+    If `fields` is provided, the record only includes those field paths (see `photos.serializers.prune_fields`).
     """
-    Returns list of Photograph records, optionally filtered by `photographer_id`.
+    # find Photographer by ID, projected onto the serialized columns, and return it (or 404 if not found)
+    projection: SerializerProjection = get_projection(PhotographerSerializer, fields)
+    return _get_record_result(projection, projection.queryset(Photographer.objects.filter(id=id)).first())
+
+
+@reads_from_replica
+@cached("photographs", tags=_photographs_tags)
+def get_photographs(
+    photographer_id: Optional[int] = None,
+    prefetch_photographer: Optional[bool] = False,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """
+    Returns a page of Photograph records ordered by ID, optionally filtered by `photographer_id`.
     If `prefetch_photographer` is True, the `photographer` field will be fetched and populated.
+    `after` / `before` are the decoded ID cursors to seek from (see `photos.pagination`).
+    If `fields` is provided, records only include those field paths (see `photos.serializers.prune_fields`).
+    Default records are served from their stored renderings where enabled (see `photos.renderings`).
     """
-    # build initial queryset (optionally filtering on photographer_id)
-    queryset: QuerySet[M] = (
-        Photograph.objects.filter(photographer_id=photographer_id).all()
-        if photographer_id
-        else Photograph.objects.all()
-    )
+    if photo_renderings.serves(prefetch_photographer, fields):
+        # fetch page of stored renderings, serializing only the photos whose rendering is missing or stale
+        rows: list[tuple] = list(_get_photographs_page_renderings(photographer_id, limit, after, before))
+        stale: list[int] = photo_renderings.stale_ids(rows[:limit])
+        fallback_rows: list[tuple] = list(_get_photographs_renderings_fallback(stale)) if stale else []
+        return _get_photographs_rendered_page_result(rows, fallback_rows, limit, after, before)
 
-    # instantiate full or limited serializer and returned serialized result
-    serializer: Type[ModelSerializer] = _get_photograph_serializer(
-        queryset, many=True, prefetch_photographer=prefetch_photographer
+    # fetch page of photographs via keyset pagination on ID, projected onto the serialized columns
+    queryset: QuerySet[M] = _get_photographs_page_projection(
+        photographer_id, prefetch_photographer, limit, after, before, fields
     )
-    return DbResult(success=True, result=serializer.data)
+    return _get_photographs_page_result(list(queryset), prefetch_photographer, limit, after, before, fields)
 
 
-def get_photograph(id: int, prefetch_photographer: Optional[bool] = False) -> DbResult:
+@reads_from_replica
+@cached("photograph", tags=_photograph_tags, result_tags=_photograph_result_tags)
+def get_photograph(
+    id: int, prefetch_photographer: Optional[bool] = False, fields: Optional[tuple[str, ...]] = None
+) -> DbResult:
     """
     Returns a specific Photograph record that has an ID matching `photo_id`.
     If `prefetch_photographer` is True, the `photographer` field will be fetched and populated.
+    If `fields` is provided, the record only includes those field paths (see `photos.serializers.prune_fields`).
     """
-    # get photograph record by ID, return 404 if not found
-    photograph: Photograph = Photograph.objects.filter(id=id).first()
-    if not photograph:
-        return DbResult(success=False, http_code=status.HTTP_404_NOT_FOUND)
+    # get photograph record by ID, projected onto the serialized columns, and return it (or 404 if not found)
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    return _get_record_result(projection, projection.queryset(Photograph.objects.filter(id=id)).first())
+
+
+@reads_from_replica
+@cached("photographs_search", tags=_photographs_tags)
+def search_photographs(
+    q: str,
+    prefetch_photographer: Optional[bool] = False,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[tuple[float, int]] = None,
+    before: Optional[tuple[float, int]] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """
+    Returns a page of Photograph records whose title or alt text match the search `q`, best matches first.
+    `after` / `before` are the decoded `(rank, id)` cursors to seek from (see `photos.pagination`).
+    `prefetch_photographer` and `fields` work like they do for `get_photographs`.
+    """
+    # fetch page of matches via keyset pagination on (rank, id), projected onto the serialized columns
+    queryset: QuerySet[M] = _get_photographs_search_projection(q, prefetch_photographer, limit, after, before, fields)
+    return _get_photographs_search_result(list(queryset), prefetch_photographer, limit, after, before, fields)
+
+
+@reads_from_replica
+@cached("photographs_color", tags=_photographs_tags)
+def get_photographs_by_color(
+    color: str,
+    prefetch_photographer: Optional[bool] = False,
+    limit: int = DEFAULT_COLOR_LIMIT,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """
+    Returns the `limit` Photograph records whose average color is nearest to the hex `color`, nearest first, each
+    with its `distance` (CIE76, i.e. euclidean distance in CIELAB). Neighbours are found via `color_index`, unless
+    it is disabled, in which case every photo with a color is scanned.
+    `prefetch_photographer` and `fields` work like they do for `get_photographs`.
+    """
+    lab: Lab = hex_to_lab(color)
+    if not color_index.enabled:
+        queryset: QuerySet[M] = _get_photographs_color_scan_projection(lab, prefetch_photographer, limit, fields)
+        return _get_photographs_color_scan_result(list(queryset), prefetch_photographer, fields)
+
+    # find nearest neighbours in the index, then fetch their records projected onto the serialized columns
+    neighbours: list[tuple[int, float]] = color_index.nearest(lab, limit)
+    queryset: QuerySet[M] = _get_photographs_color_projection(neighbours, prefetch_photographer, fields)
+    return _get_photographs_color_result(list(queryset), neighbours, prefetch_photographer, fields)
+
+
+@reads_from_replica
+@cached("photographers_batch", tags=_photographers_batch_tags, result_tags=_photographers_batch_result_tags)
+def get_photographers_by_ids(ids: tuple[int, ...], fields: Optional[tuple[str, ...]] = None) -> DbResult:
+    """
+    Returns the Photographer records with the provided `ids` (in that order), fetched in a single query, along
+    with the IDs that weren't found.
+    If `fields` is provided, records only include those field paths (see `photos.serializers.prune_fields`).
+    """
+    projection: SerializerProjection = get_projection(PhotographerSerializer, fields)
+    queryset: QuerySet[M] = _get_batch_projection(projection, Photographer.objects.all(), ids)
+    return _get_batch_result(projection, list(queryset), ids)
+
+
+@reads_from_replica
+@cached("photographs_batch", tags=_photographs_batch_tags, result_tags=_photographs_batch_result_tags)
+def get_photographs_by_ids(
+    ids: tuple[int, ...], prefetch_photographer: Optional[bool] = False, fields: Optional[tuple[str, ...]] = None
+) -> DbResult:
+    """
+    Returns the Photograph records with the provided `ids` (in that order), fetched in a single query, along with
+    the IDs that weren't found.
+    `prefetch_photographer` and `fields` work like they do for `get_photographs`.
+    """
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    queryset: QuerySet[M] = _get_batch_projection(projection, Photograph.objects.all(), ids)
+    return _get_batch_result(projection, list(queryset), ids)
 
-    # return serialized Photograph data
-    serializer: Type[ModelSerializer] = _get_photograph_serializer(
-        photograph, prefetch_photographer=prefetch_photographer
+
+@reads_from_replica
+@cached("photographers_validators", tags=_photographers_tags)
+def get_photographers_validators(
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """
+    Returns conditional GET validators (`etag`, `last_modified`) for the page of Photographer records that
+    `get_photographers` would return for the same arguments, without fetching or serializing the records.
+    The nested User is covered by `Photographer.last_updated`, which is bumped when it changes.
+    """
+    queryset: QuerySet[M] = page_queryset(Photographer.objects.all(), limit, after, before)
+    aggregates: dict[str, Any] = queryset.aggregate(**_PAGE_VALIDATOR_AGGREGATES)
+    return _get_page_validators_result(aggregates, "photographers", fields, limit, after, before)
+
+
+@reads_from_replica
+@cached("photographer_validators", tags=_photographer_tags)
+def get_photographer_validators(id: int, fields: Optional[tuple[str, ...]] = None) -> DbResult:
+    """
+    Returns conditional GET validators (`etag`, `last_modified`) for the Photographer record matching `id`, as
+    `get_photographer` would return it for the same arguments.
+    """
+    last_updated = Photographer.objects.filter(id=id).values_list("last_updated", flat=True).first()
+    return _get_record_validators_result(last_updated, "photographer", id, fields)
+
+
+@reads_from_replica
+@cached("photographs_validators", tags=_photographs_tags)
+def get_photographs_validators(
+    photographer_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    prefetch_photographer: Optional[bool] = False,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """
+    Returns conditional GET validators (`etag`, `last_modified`) for the page of Photograph records that
+    `get_photographs` would return for the same arguments, without fetching or serializing the records.
+    If `prefetch_photographer` is True, they also cover the nested Photographers (and their Users).
+    """
+    queryset: QuerySet[M] = _get_photographs_page_queryset(photographer_id, None, limit, after, before)
+    aggregates: dict[str, Any] = queryset.aggregate(**_get_photographs_validator_aggregates(prefetch_photographer))
+    return _get_page_validators_result(
+        aggregates, "photographs", photographer_id, prefetch_photographer, fields, limit, after, before
+    )
+
+
+@reads_from_replica
+@cached("photograph_validators", tags=_photograph_validators_tags)
+def get_photograph_validators(
+    id: int, prefetch_photographer: Optional[bool] = False, fields: Optional[tuple[str, ...]] = None
+) -> DbResult:
+    """
+    Returns conditional GET validators (`etag`, `last_modified`) for the Photograph record matching `id`, as
+    `get_photograph` would return it for the same arguments. If `prefetch_photographer` is True, they also cover
+    the nested Photographer (and its User), taking the later of the two `last_updated`.
+    """
+    row = (
+        Photograph.objects.filter(id=id).values_list(*_get_photograph_validator_lookups(prefetch_photographer)).first()
+    )
+    return _get_record_validators_result(max(row) if row else None, "photograph", id, prefetch_photographer, fields)
+
+
+CHANGES_SETTLE_SECONDS = 5.0
+"""
+Age a change must reach before the change feed reports it. `last_updated` is set before a write commits, so a
+younger change could still be followed by an older one committing late (or by a replica catching up), which a
+cursor past it would skip. Should exceed the longest write transaction and the replication lag.
+"""
+
+
+@reads_from_replica
+def get_changes(since: Optional[tuple[Optional[ChangeKey], ...]] = None, limit: int = DEFAULT_PAGE_LIMIT) -> DbResult:
+    """
+    Returns the Photograph and Photographer records created or updated, and the ones deleted, since the position
+    in each stream held by `since` (a decoded changes cursor, see `photos.pagination`), or from the start. Each
+    stream is ordered by `(last_updated, id)` and returns at most `limit` records, so the cost scales with the
+    number of changes rather than the catalog. `next` is the cursor to pass on the next sync and `has_more` tells
+    whether more changes are waiting already.
+    """
+    querysets: tuple[QuerySet[M], ...] = _get_changes_querysets(since, limit)
+    return _get_changes_result([list(queryset) for queryset in querysets], since, limit)
+
+
+# Async counterparts of the read functions above, for async views served under ASGI. These evaluate querysets
+# with Django's async ORM and share cached payloads with their sync counterparts.
+
+
+@reads_from_replica
+@cached("photographers", tags=_photographers_tags)
+async def aget_photographers(
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """Async counterpart of `get_photographers`."""
+    queryset: QuerySet[M] = _get_photographers_page_queryset(limit, after, before, fields)
+    return _get_photographers_page_result([row async for row in queryset], limit, after, before, fields)
+
+
+@reads_from_replica
+@cached("photographer", tags=_photographer_tags, result_tags=_photographer_result_tags)
+async def aget_photographer(id: int, fields: Optional[tuple[str, ...]] = None) -> DbResult:
+    """Async counterpart of `get_photographer`."""
+    projection: SerializerProjection = get_projection(PhotographerSerializer, fields)
+    return _get_record_result(projection, await projection.queryset(Photographer.objects.filter(id=id)).afirst())
+
+
+@reads_from_replica
+@cached("photographs", tags=_photographs_tags)
+async def aget_photographs(
+    photographer_id: Optional[int] = None,
+    prefetch_photographer: Optional[bool] = False,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """Async counterpart of `get_photographs`."""
+    if photo_renderings.serves(prefetch_photographer, fields):
+        rows: list[tuple] = [
+            row async for row in _get_photographs_page_renderings(photographer_id, limit, after, before)
+        ]
+        stale: list[int] = photo_renderings.stale_ids(rows[:limit])
+        fallback_rows: list[tuple] = [row async for row in _get_photographs_renderings_fallback(stale)] if stale else []
+        return _get_photographs_rendered_page_result(rows, fallback_rows, limit, after, before)
+
+    queryset: QuerySet[M] = _get_photographs_page_projection(
+        photographer_id, prefetch_photographer, limit, after, before, fields
+    )
+    rows: list[tuple] = [row async for row in queryset]
+    return _get_photographs_page_result(rows, prefetch_photographer, limit, after, before, fields)
+
+
+@reads_from_replica
+@cached("photograph", tags=_photograph_tags, result_tags=_photograph_result_tags)
+async def aget_photograph(
+    id: int, prefetch_photographer: Optional[bool] = False, fields: Optional[tuple[str, ...]] = None
+) -> DbResult:
+    """Async counterpart of `get_photograph`."""
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    return _get_record_result(projection, await projection.queryset(Photograph.objects.filter(id=id)).afirst())
+
+
+@reads_from_replica
+@cached("photographs_search", tags=_photographs_tags)
+async def asearch_photographs(
+    q: str,
+    prefetch_photographer: Optional[bool] = False,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[tuple[float, int]] = None,
+    before: Optional[tuple[float, int]] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """Async counterpart of `search_photographs`."""
+    queryset: QuerySet[M] = _get_photographs_search_projection(q, prefetch_photographer, limit, after, before, fields)
+    rows: list[tuple] = [row async for row in queryset]
+    return _get_photographs_search_result(rows, prefetch_photographer, limit, after, before, fields)
+
+
+@reads_from_replica
+@cached("photographs_color", tags=_photographs_tags)
+async def aget_photographs_by_color(
+    color: str,
+    prefetch_photographer: Optional[bool] = False,
+    limit: int = DEFAULT_COLOR_LIMIT,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """Async counterpart of `get_photographs_by_color`."""
+    lab: Lab = hex_to_lab(color)
+    if not color_index.enabled:
+        queryset: QuerySet[M] = _get_photographs_color_scan_projection(lab, prefetch_photographer, limit, fields)
+        rows: list[tuple] = [row async for row in queryset]
+        return _get_photographs_color_scan_result(rows, prefetch_photographer, fields)
+
+    # the index may need to load (or catch up) from the database first, so search it in a worker thread
+    neighbours: list[tuple[int, float]] = await sync_to_async(color_index.nearest)(lab, limit)
+    queryset: QuerySet[M] = _get_photographs_color_projection(neighbours, prefetch_photographer, fields)
+    rows: list[tuple] = [row async for row in queryset]
+    return _get_photographs_color_result(rows, neighbours, prefetch_photographer, fields)
+
+
+@reads_from_replica
+@cached("photographers_batch", tags=_photographers_batch_tags, result_tags=_photographers_batch_result_tags)
+async def aget_photographers_by_ids(ids: tuple[int, ...], fields: Optional[tuple[str, ...]] = None) -> DbResult:
+    """Async counterpart of `get_photographers_by_ids`."""
+    projection: SerializerProjection = get_projection(PhotographerSerializer, fields)
+    queryset: QuerySet[M] = _get_batch_projection(projection, Photographer.objects.all(), ids)
+    return _get_batch_result(projection, [row async for row in queryset], ids)
+
+
+@reads_from_replica
+@cached("photographs_batch", tags=_photographs_batch_tags, result_tags=_photographs_batch_result_tags)
+async def aget_photographs_by_ids(
+    ids: tuple[int, ...], prefetch_photographer: Optional[bool] = False, fields: Optional[tuple[str, ...]] = None
+) -> DbResult:
+    """Async counterpart of `get_photographs_by_ids`."""
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    queryset: QuerySet[M] = _get_batch_projection(projection, Photograph.objects.all(), ids)
+    return _get_batch_result(projection, [row async for row in queryset], ids)
+
+
+@reads_from_replica
+@cached("photographers_validators", tags=_photographers_tags)
+async def aget_photographers_validators(
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """Async counterpart of `get_photographers_validators`."""
+    queryset: QuerySet[M] = page_queryset(Photographer.objects.all(), limit, after, before)
+    aggregates: dict[str, Any] = await queryset.aaggregate(**_PAGE_VALIDATOR_AGGREGATES)
+    return _get_page_validators_result(aggregates, "photographers", fields, limit, after, before)
+
+
+@reads_from_replica
+@cached("photographer_validators", tags=_photographer_tags)
+async def aget_photographer_validators(id: int, fields: Optional[tuple[str, ...]] = None) -> DbResult:
+    """Async counterpart of `get_photographer_validators`."""
+    last_updated = await Photographer.objects.filter(id=id).values_list("last_updated", flat=True).afirst()
+    return _get_record_validators_result(last_updated, "photographer", id, fields)
+
+
+@reads_from_replica
+@cached("photographs_validators", tags=_photographs_tags)
+async def aget_photographs_validators(
+    photographer_id: Optional[int] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    prefetch_photographer: Optional[bool] = False,
+    fields: Optional[tuple[str, ...]] = None,
+) -> DbResult:
+    """Async counterpart of `get_photographs_validators`."""
+    queryset: QuerySet[M] = _get_photographs_page_queryset(photographer_id, None, limit, after, before)
+    aggregates: dict[str, Any] = await queryset.aaggregate(
+        **_get_photographs_validator_aggregates(prefetch_photographer)
+    )
+    return _get_page_validators_result(
+        aggregates, "photographs", photographer_id, prefetch_photographer, fields, limit, after, before
     )
-    return DbResult(success=True, result=serializer.data)
+
+
+@reads_from_replica
+@cached("photograph_validators", tags=_photograph_validators_tags)
+async def aget_photograph_validators(
+    id: int, prefetch_photographer: Optional[bool] = False, fields: Optional[tuple[str, ...]] = None
+) -> DbResult:
+    """Async counterpart of `get_photograph_validators`."""
+    lookups: tuple[str, ...] = _get_photograph_validator_lookups(prefetch_photographer)
+    row = await Photograph.objects.filter(id=id).values_list(*lookups).afirst()
+    return _get_record_validators_result(max(row) if row else None, "photograph", id, prefetch_photographer, fields)
+
+
+@reads_from_replica
+async def aget_changes(
+    since: Optional[tuple[Optional[ChangeKey], ...]] = None, limit: int = DEFAULT_PAGE_LIMIT
+) -> DbResult:
+    """Async counterpart of `get_changes`."""
+    querysets: tuple[QuerySet[M], ...] = _get_changes_querysets(since, limit)
+    return _get_changes_result([[row async for row in queryset] for queryset in querysets], since, limit)
+
+
+EXPORT_CHUNK_SIZE = 2000
+"""Number of rows fetched per round trip from the server-side cursor by the export functions."""
+
+
+def iter_photographs_export(
+    photographer_id: Optional[int] = None, after_id: Optional[int] = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> Iterator[dict[str, Any]]:
+    """
+    Yields every Photograph record (limited serializer representation) ordered by ID, optionally filtered by
+    `photographer_id` and resuming after the record with ID `after_id`. Rows are read via a server-side cursor
+    (where the database supports it) `chunk_size` at a time, so memory use is flat regardless of catalog size.
+    Exports are never cached.
+    """
+    projection: SerializerProjection = get_projection(PhotographSlimSerializer)
+    for row in _get_photographs_export_queryset(photographer_id, after_id).iterator(chunk_size=chunk_size):
+        yield projection.to_dict(row)
+
+
+async def aiter_photographs_export(
+    photographer_id: Optional[int] = None, after_id: Optional[int] = None, chunk_size: int = EXPORT_CHUNK_SIZE
+) -> AsyncIterator[dict[str, Any]]:
+    """Async counterpart of `iter_photographs_export`."""
+    # `aiterator()` evaluates `values_list` querysets on the event loop, so step the (lazy) sync iterator in a
+    # thread instead; the thread is the same for every chunk, so the server-side cursor's connection is too
+    projection: SerializerProjection = get_projection(PhotographSlimSerializer)
+    rows: Iterator[tuple] = _get_photographs_export_queryset(photographer_id, after_id).iterator(chunk_size=chunk_size)
+    while chunk := await sync_to_async(list)(islice(rows, chunk_size)):
+        for row in chunk:
+            yield projection.to_dict(row)
 
 
 def update_photograph(photo_id: int, validated_data: ValidatedData) -> DbResult:
     """
-    Updates an existing Photograph with provided `validated_data`.
+    Updates an existing Photograph (creating or updating its PhotoSource) with provided `validated_data`.
     """
-    # find existing photograph by ID, return 404 if not found
-    photograph: Photograph = Photograph.objects.select_related("source").filter(id=photo_id).first()
+    # find existing photograph by ID (joining everything the full serializer reads), return 404 if not found
+    queryset: QuerySet[M] = _get_photograph_queryset(Photograph.objects.filter(id=photo_id), prefetch_photographer=True)
+    photograph: Photograph = queryset.first()
     if not photograph:
         return DbResult(success=False, http_code=status.HTTP_404_NOT_FOUND)
 
-    # serialize data, return error if serializer did not validate the data
-    update_data = validated_data.data.model_dump(exclude_unset=True, exclude_none=True)
-    serializer = PhotographSerializer(instance=photograph, data=update_data, partial=True)
-    if not serializer.is_valid():
-        return DbResult(success=False, errors=serializer.errors)
+    # the data was fully validated already, only the URL's uniqueness is left to check
+    update_data: dict[str, Any] = dict(validated_data.data)
+    source_data: Optional[dict[str, Any]] = update_data.pop("source", None)
+    if "url" in update_data and Photograph.objects.filter(url=update_data["url"]).exclude(id=photo_id).exists():
+        return DbResult(success=False, errors=[_get_url_taken_error()], http_code=status.HTTP_400_BAD_REQUEST)
 
-    # save via serializer and return success
-    updated_photo = serializer.save()
-    return DbResult(success=True, result=PhotographSerializer(updated_photo).data)
+    # save photograph and source, returning error if the URL was taken since it was checked
+    try:
+        with transaction.atomic():
+            for attr, value in update_data.items():
+                setattr(photograph, attr, value)
+            photograph.save()
+            if source_data is not None:
+                if source := getattr(photograph, "source", None):
+                    # URLs a compact source rebuilds from its template may no longer follow it once updated
+                    fields: dict[str, Any] = source_templates.compact(
+                        {**source_templates.expand(source), **source_data}
+                    )
+                    for attr, value in fields.items():
+                        setattr(source, attr, value)
+                    source.save()
+                else:
+                    PhotoSource.objects.create(photograph=photograph, **source_templates.compact(source_data))
+    except IntegrityError as e:
+        return DbResult(success=False, errors=[_get_error("integrity_error", str(e))], http_code=409)
+
+    return DbResult(success=True, result=_serialize_photograph(photograph))
 
 
 def serialize_and_save_photograph(validated_data: ValidatedData) -> DbResult:
-    """Serializes and saves provided validated Photograph data."""
-    # serialize data, return error if serializer did not validate the data
-    serializer = PhotographSerializer(data=validated_data.data.model_dump())
-    if not serializer.is_valid():
-        return DbResult(success=False, errors=serializer.errors)
-
-    # find Photographer record to link with photo, return 400 error if not found
-    photographer = Photographer.objects.filter(id=validated_data.data.photographer_id).first()
+    """Saves a new Photograph (and its PhotoSource) from provided validated data, returning it serialized."""
+    create_data: dict[str, Any] = dict(validated_data.data)
+    source_data: dict[str, Any] = create_data.pop("source")
+
+    # find Photographer record (and the User the serializer nests) to link with photo, return 400 error if not found
+    photographer = Photographer.objects.filter(id=create_data.pop("photographer_id")).select_related("user").first()
     if not photographer:
         return DbResult(success=False, http_code=status.HTTP_400_BAD_REQUEST)
 
-    # save to database and return success respone
-    serializer.save(photographer=photographer)
-    return DbResult(success=True, result=serializer.data)
+    # the data was fully validated already, only the URL's uniqueness is left to check
+    if Photograph.objects.filter(url=create_data["url"]).exists():
+        return DbResult(success=False, errors=[_get_url_taken_error()], http_code=status.HTTP_400_BAD_REQUEST)
 
+    # save to database and return success respone, or error if the URL was taken since it was checked
+    try:
+        with transaction.atomic():
+            photograph = Photograph.objects.create(photographer=photographer, **create_data)
+            PhotoSource.objects.create(photograph=photograph, **source_templates.compact(source_data))
+    except IntegrityError as e:
+        return DbResult(success=False, errors=[_get_error("integrity_error", str(e))], http_code=409)
 
-def _get_photograph_serializer(
-    queryset: QuerySet[M],
-    prefetch_photographer: Optional[bool] = False,
-    many: Optional[bool] = False,
-) -> Type[ModelSerializer]:
-    """Returns a full or limimted Photograph serializer (depending on `prefetch_photographer`)."""
-    # if we need to prefetch Photographer, add that to the queryset now
+    return DbResult(success=True, result=_serialize_photograph(photograph))
+
+
+def _serialize_photograph(photograph: Photograph) -> dict[str, Any]:
+    """Serializes a Photograph that was just written, rebuilding the URLs its (compact) source doesn't store."""
+    with timed("serialize"):
+        data = PhotographSerializer(photograph).data
+        if data["source"] is not None:
+            data["source"].update(source_templates.expand(photograph.source))
+    return data
+
+
+BULK_CREATE_BATCH_SIZE = 1000
+"""Number of rows inserted per INSERT statement by `bulk_create_photographs`."""
+
+
+def bulk_create_photographs(items: list[ValidatedData], partial: bool = False) -> DbResult:
+    """
+    Creates Photograph records (with their PhotoSource records) for a batch of validated photo payloads.
+    Every item is checked up front (photographers and existing URLs are resolved in one query each), then all
+    records are inserted with `bulk_create` in a single transaction. If any item is invalid, nothing is created,
+    unless `partial` is True, in which case the valid items are still created.
+    The result lists the `index` and `id` of each created photo and the `index` and `errors` of each invalid one.
+    """
+    errors: dict[int, list[dict[str, Any]]] = {
+        index: item.errors for index, item in enumerate(items) if not item.success
+    }
+    valid: dict[int, Any] = {index: item.data for index, item in enumerate(items) if item.success}
+
+    # resolve photographers and already taken URLs in one query each
+    photographer_ids: set[int] = set(
+        Photographer.objects.filter(id__in={data["photographer_id"] for data in valid.values()}).values_list(
+            "id", flat=True
+        )
+    )
+    taken_urls: set[str] = set(
+        Photograph.objects.filter(url__in=[data["url"] for data in valid.values()]).values_list("url", flat=True)
+    )
+
+    # build records (their fields were fully validated already), checking the constraints that need the database
+    photographs: dict[int, Photograph] = {}
+    sources: dict[int, PhotoSource] = {}
+    for index, data in valid.items():
+        fields: dict[str, Any] = {name: value for name, value in data.items() if name != "source"}
+        photograph = Photograph(**fields)
+        photograph.sync_color()
+        source = PhotoSource(**source_templates.compact(data["source"]))
+        item_errors: list[dict[str, Any]] = []
+        if data["photographer_id"] not in photographer_ids:
+            item_errors.append(_get_error("does_not_exist", "Photographer does not exist.", "photographer_id"))
+        if data["url"] in taken_urls:
+            item_errors.append(_get_url_taken_error())
+        taken_urls.add(data["url"])
+
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        photographs[index] = photograph
+        sources[index] = source
+
+    # nothing is created unless all items are valid, or partial success was requested
+    errors_result: list[dict[str, Any]] = [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+    if errors and (not partial or not photographs):
+        return DbResult(success=False, errors={"created": [], "errors": errors_result}, http_code=400)
+
+    # insert all records in one transaction, letting receivers know (as `bulk_create` doesn't send `post_save`)
+    try:
+        with transaction.atomic():
+            Photograph.objects.bulk_create(photographs.values(), batch_size=BULK_CREATE_BATCH_SIZE)
+            for index, source in sources.items():
+                source.photograph = photographs[index]
+            PhotoSource.objects.bulk_create(sources.values(), batch_size=BULK_CREATE_BATCH_SIZE)
+            photographs_bulk_created.send(sender=Photograph, photographs=list(photographs.values()))
+    except IntegrityError as e:
+        # e.g. a URL taken by a concurrent request since it was checked
+        return DbResult(success=False, errors=[_get_error("integrity_error", str(e))], http_code=409)
+
+    created: list[dict[str, int]] = [{"index": index, "id": photo.id} for index, photo in photographs.items()]
+    return DbResult(success=True, result={"created": created, "errors": errors_result})
+
+
+RECONCILE_BATCH_SIZE = 1000
+"""Number of Photographer records checked (and repaired) per transaction by `reconcile_photographer_stats`."""
+
+
+def reconcile_photographer_stats(
+    photographer_ids: Optional[Iterable[int]] = None, batch_size: int = RECONCILE_BATCH_SIZE, dry_run: bool = False
+) -> list[int]:
+    """
+    Repairs drift in the denormalized `photo_count` / `latest_photo_date` of Photographer records (all of them, or
+    those with `photographer_ids`), e.g. after writes that bypassed the receivers in `photos.signals`. Records are
+    walked in batches of `batch_size`; each batch is locked, compared against aggregates of its photos in one query,
+    and only the drifted records are updated. Returns the IDs of the drifted records (left as is if `dry_run`).
+    """
+    queryset: QuerySet[M] = Photographer.objects.order_by("id")
+    if photographer_ids is not None:
+        queryset = queryset.filter(id__in=list(photographer_ids))
+
+    drifted: list[int] = []
+    last_id = 0
+    while ids := list(queryset.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]):
+        with transaction.atomic():
+            # lock the batch first, so counts written by concurrent photo writes aren't lost
+            list(Photographer.objects.select_for_update().filter(id__in=ids).order_by("id").values_list("id"))
+            rows = Photographer.objects.filter(id__in=ids).values_list(
+                "id", "photo_count", "latest_photo_date", Count("photographs"), Max("photographs__date_created")
+            )
+            repairs: list[Photographer] = [
+                Photographer(id=id, photo_count=count, latest_photo_date=latest, last_updated=timezone.now())
+                for id, stored_count, stored_latest, count, latest in rows
+                if (stored_count, stored_latest) != (count, latest)
+            ]
+            if repairs and not dry_run:
+                Photographer.objects.bulk_update(repairs, ["photo_count", "latest_photo_date", "last_updated"])
+        drifted += [photographer.id for photographer in repairs]
+        last_id = ids[-1]
+
+    if drifted and not dry_run:
+        photo_cache.invalidate("photographers", *(f"photographer:{id}" for id in drifted))
+    return drifted
+
+
+def rebuild_photo_renderings(
+    photograph_ids: Optional[Iterable[int]] = None, batch_size: int = RECONCILE_BATCH_SIZE
+) -> dict[str, list[int]]:
+    """
+    Renders and stores the renderings of Photograph records (all of them, or those with `photograph_ids`, see
+    `photos.renderings`), whether renderings are enabled or not, e.g. to render an existing catalog before enabling
+    them. Works like `check_photo_renderings` with repairs, except current renderings are stored anew as well.
+    """
+    return _reconcile_photo_renderings(photograph_ids, batch_size, dry_run=False, force=True)
+
+
+def check_photo_renderings(
+    photograph_ids: Optional[Iterable[int]] = None, batch_size: int = RECONCILE_BATCH_SIZE, dry_run: bool = True
+) -> dict[str, list[int]]:
+    """
+    Checks the stored renderings of Photograph records (all of them, or those with `photograph_ids`) against
+    renderings of their current columns, returning the IDs of the photos whose rendering is `missing`, `stale`
+    (rendered from an older version of the photo, so it isn't served) or `drifted` (current stamp, but different
+    content, e.g. after a SourceTemplate changed). Unless `dry_run`, those renderings are repaired.
+    """
+    return _reconcile_photo_renderings(photograph_ids, batch_size, dry_run=dry_run, force=False)
+
+
+def _reconcile_photo_renderings(
+    photograph_ids: Optional[Iterable[int]], batch_size: int, dry_run: bool, force: bool
+) -> dict[str, list[int]]:
+    """
+    Walks Photograph records in batches of `batch_size`; each batch is locked, rendered in one query, compared
+    against its stored renderings in another, and the renderings that differ (all of them if `force`) are stored.
+    """
+    queryset: QuerySet[M] = Photograph.objects.order_by("id")
+    if photograph_ids is not None:
+        queryset = queryset.filter(id__in=list(photograph_ids))
+
+    report: dict[str, list[int]] = {"missing": [], "stale": [], "drifted": []}
+    last_id = 0
+    while ids := list(queryset.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size]):
+        with transaction.atomic():
+            # lock the batch first, so renderings stored by concurrent photo writes aren't overwritten
+            list(Photograph.objects.select_for_update().filter(id__in=ids).order_by("id").values_list("id"))
+            stored: dict[int, tuple[str, datetime]] = {
+                id: (content, last_updated)
+                for id, content, last_updated in PhotographRendering.objects.filter(photograph_id__in=ids).values_list(
+                    "photograph_id", "content", "last_updated"
+                )
+            }
+            repairs: list[PhotographRendering] = []
+            for rendering in photo_renderings.render(Photograph.objects.filter(id__in=ids)):
+                content, last_updated = stored.get(rendering.photograph_id, (None, None))
+                if content is None:
+                    report["missing"].append(rendering.photograph_id)
+                elif last_updated != rendering.last_updated:
+                    report["stale"].append(rendering.photograph_id)
+                elif content != rendering.content:
+                    report["drifted"].append(rendering.photograph_id)
+                elif not force:
+                    continue
+                repairs.append(rendering)
+            if repairs and not dry_run:
+                photo_renderings.store(repairs)
+        last_id = ids[-1]
+
+    # drifted renderings may have been served, and cached along with their pages
+    if report["drifted"] and not dry_run:
+        photographer_ids = Photograph.objects.filter(id__in=report["drifted"]).values_list("photographer_id", flat=True)
+        photo_cache.invalidate("photos", *{f"photographer:{id}:photos" for id in photographer_ids})
+    return report
+
+
+def _get_error(type: str, msg: str, *loc: str) -> dict[str, Any]:
+    """Returns an error in the same shape as a (pydantic) validation error."""
+    return {"type": type, "loc": loc, "msg": msg}
+
+
+def _get_url_taken_error() -> dict[str, Any]:
+    """Returns the error for a Photograph URL that is already taken."""
+    return _get_error("unique", "Photograph with this url already exists.", "url")
+
+
+def _make_etag(*parts: Any) -> str:
+    """Returns a quoted ETag derived from the provided `parts`."""
+    return quote_etag(hashlib.md5(":".join(map(str, parts)).encode("utf-8")).hexdigest())
+
+
+_PAGE_VALIDATOR_AGGREGATES = {"count": Count("id"), "id_sum": Sum("id"), "last_updated": Max("last_updated")}
+"""
+Aggregates over the rows in a page window that make up its conditional GET validators. The count and ID sum change
+whenever rows enter or leave the window, and the max `last_updated` changes whenever a row in it is updated.
+"""
+
+
+def _get_photographs_validator_aggregates(prefetch_photographer: Optional[bool]) -> dict[str, Any]:
+    """
+    Returns the aggregates making up the validators of a page of Photographs: the `_PAGE_VALIDATOR_AGGREGATES`,
+    and if `prefetch_photographer`, the max `last_updated` of their Photographers, which is bumped whenever a
+    Photographer's stats or its User change.
+    """
+    if not prefetch_photographer:
+        return _PAGE_VALIDATOR_AGGREGATES
+    return {**_PAGE_VALIDATOR_AGGREGATES, "photographer_last_updated": Max("photographer__last_updated")}
+
+
+def _get_photograph_validator_lookups(prefetch_photographer: Optional[bool]) -> tuple[str, ...]:
+    """
+    Returns the `last_updated` columns making up the validators of a Photograph record: its own, and if
+    `prefetch_photographer`, its Photographer's.
+    """
+    return ("last_updated", "photographer__last_updated") if prefetch_photographer else ("last_updated",)
+
+
+def _get_page_validators_result(aggregates: dict[str, Any], *key: Any) -> DbResult:
+    """
+    Returns conditional GET validators for a page, from the aggregates over its window and the `key` (the
+    endpoint and the arguments selecting the page and its representation).
+    No `last_modified` is returned for pages, since a row leaving the page (e.g. a delete) does not move the
+    max `last_updated` forward.
+    """
+    return DbResult(success=True, result={"etag": _make_etag(*key, *aggregates.values()), "last_modified": None})
+
+
+def _get_record_validators_result(last_updated: Optional[datetime], *key: Any) -> DbResult:
+    """
+    Returns conditional GET validators for a single record, from its `last_updated` and the `key` (the record and
+    the arguments selecting its representation), or 404 if the record was not found.
+    """
+    if not last_updated:
+        return DbResult(success=False, http_code=status.HTTP_404_NOT_FOUND)
+    return DbResult(success=True, result={"etag": _make_etag(*key, last_updated), "last_modified": last_updated})
+
+
+def _get_photographers_page_queryset(
+    limit: int, after: Optional[int], before: Optional[int], fields: Optional[tuple[str, ...]]
+) -> QuerySet[M]:
+    """
+    Returns the `PhotographerSerializer` projection (see `photos.projections`), pruned to `fields` if provided,
+    for a page of Photographers.
+    """
+    projection: SerializerProjection = get_projection(PhotographerSerializer, fields)
+    return page_queryset(projection.queryset(Photographer.objects.all()), limit, after, before)
+
+
+@timed("serialize")
+def _get_photographers_page_result(
+    rows: list[tuple], limit: int, after: Optional[int], before: Optional[int], fields: Optional[tuple[str, ...]]
+) -> DbResult:
+    """Returns the serialized page of Photographer records fetched via `_get_photographers_page_queryset`."""
+    projection: SerializerProjection = get_projection(PhotographerSerializer, fields)
+    page: Page = build_page(rows, limit, after, before, key=projection.pk)
+    return DbResult(success=True, result=page.as_result(map(projection.to_dict, page.rows)))
+
+
+@timed("serialize")
+def _get_record_result(projection: SerializerProjection, row: Optional[tuple]) -> DbResult:
+    """Returns the serialized record fetched via `projection`, or 404 if it was not found."""
+    if row is None:
+        return DbResult(success=False, http_code=status.HTTP_404_NOT_FOUND)
+    return DbResult(success=True, result=projection.to_dict(row))
+
+
+def _get_batch_projection(projection: SerializerProjection, queryset: QuerySet[M], ids: tuple[int, ...]) -> QuerySet[M]:
+    """
+    Returns `projection` of the records in `queryset` with the provided `ids`, with each row's ID appended (as
+    `fields` may leave it out) to put the rows in the requested order.
+    """
+    return queryset.filter(id__in=ids).values_list(*projection.lookups, "id")
+
+
+@timed("serialize")
+def _get_batch_result(projection: SerializerProjection, rows: list[tuple], ids: tuple[int, ...]) -> DbResult:
+    """
+    Returns the records fetched via `_get_batch_projection` serialized in the order of `ids`, along with the IDs
+    that weren't found (`missing`).
+    """
+    rows_by_id: dict[int, tuple] = {row[-1]: row for row in rows}
+    results: list[dict[str, Any]] = [projection.to_dict(rows_by_id[id]) for id in ids if id in rows_by_id]
+    return DbResult(success=True, result={"results": results, "missing": [id for id in ids if id not in rows_by_id]})
+
+
+def _get_changes_querysets(
+    since: Optional[tuple[Optional[ChangeKey], ...]], limit: int
+) -> tuple[QuerySet[M], QuerySet[M], QuerySet[M]]:
+    """
+    Returns the querysets of the photos (limited serializer projection) and photographers changed, and the
+    tombstones of the records deleted, since the positions in `since`, each row ending with its change key.
+    """
+    photos, photographers, deleted = since or (None, None, None)
+    until: datetime = timezone.now() - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+    photo_lookups: list[Any] = get_projection(PhotographSlimSerializer).lookups
+    photographer_lookups: list[Any] = get_projection(PhotographerSerializer).lookups
+    return (
+        changes_queryset(
+            Photograph.objects.values_list(*photo_lookups, "last_updated", "id"), "last_updated", photos, until, limit
+        ),
+        changes_queryset(
+            Photographer.objects.values_list(*photographer_lookups, "last_updated", "id"),
+            "last_updated",
+            photographers,
+            until,
+            limit,
+        ),
+        changes_queryset(
+            Tombstone.objects.values_list("kind", "record_id", "deleted_at", "id"), "deleted_at", deleted, until, limit
+        ),
+    )
+
+
+@timed("serialize")
+def _get_changes_result(
+    streams: list[list[tuple]], since: Optional[tuple[Optional[ChangeKey], ...]], limit: int
+) -> DbResult:
+    """Returns the change feed response for the rows fetched via `_get_changes_querysets`."""
+    photos, photographers, deleted = (rows[:limit] for rows in streams)
+    # each stream resumes after the last record returned, or where it was if none were
+    keys: list[Optional[ChangeKey]] = [
+        (rows[-1][-2], rows[-1][-1]) if rows else key
+        for rows, key in zip((photos, photographers, deleted), since or (None, None, None))
+    ]
+    photo_projection: SerializerProjection = get_projection(PhotographSlimSerializer)
+    photographer_projection: SerializerProjection = get_projection(PhotographerSerializer)
+    return DbResult(
+        success=True,
+        result={
+            "photos": [photo_projection.to_dict(row) for row in photos],
+            "photographers": [photographer_projection.to_dict(row) for row in photographers],
+            "deleted": [{"type": kind, "id": record_id} for kind, record_id, *_ in deleted],
+            "next": encode_changes_cursor(*keys),
+            "has_more": any(len(rows) > limit for rows in streams),
+        },
+    )
+
+
+def _get_photographs_page_queryset(
+    photographer_id: Optional[int],
+    prefetch_photographer: Optional[bool],
+    limit: int,
+    after: Optional[int],
+    before: Optional[int],
+) -> QuerySet[M]:
+    """
+    Returns the queryset for a page of Photograph records (optionally filtered on `photographer_id`).
+    If `prefetch_photographer` is None, no relations are joined (e.g. when only aggregating over the page).
+    """
+    queryset: QuerySet[M] = (
+        Photograph.objects.filter(photographer_id=photographer_id) if photographer_id else Photograph.objects.all()
+    )
+    if prefetch_photographer is not None:
+        queryset = _get_photograph_queryset(queryset, prefetch_photographer=prefetch_photographer)
+    return page_queryset(queryset, limit, after, before)
+
+
+def _get_photographs_page_projection(
+    photographer_id: Optional[int],
+    prefetch_photographer: Optional[bool],
+    limit: int,
+    after: Optional[int],
+    before: Optional[int],
+    fields: Optional[tuple[str, ...]],
+) -> QuerySet[M]:
+    """
+    Returns the full or limited Photograph serializer projection (depending on `prefetch_photographer`, see
+    `photos.projections`), pruned to `fields` if provided, for a page of Photograph records (optionally filtered
+    on `photographer_id`). Only the columns of the remaining fields are selected, and only their relations joined.
+    """
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    queryset: QuerySet[M] = _get_photographs_page_queryset(photographer_id, None, limit, after, before)
+    return projection.queryset(queryset)
+
+
+def _get_photographs_page_renderings(
+    photographer_id: Optional[int], limit: int, after: Optional[int], before: Optional[int]
+) -> QuerySet[M]:
+    """
+    Returns the stored renderings (along with the stamps telling whether they're current, see
+    `photos.renderings.PAGE_LOOKUPS`) for a page of Photograph records (optionally filtered on `photographer_id`).
+    """
+    return _get_photographs_page_queryset(photographer_id, None, limit, after, before).values_list(*PAGE_LOOKUPS)
+
+
+def _get_photographs_renderings_fallback(ids: list[int]) -> QuerySet[M]:
+    """Returns the limited Photograph serializer projection of the records whose rendering can't be served."""
+    return photo_renderings.projection.queryset(Photograph.objects.filter(id__in=ids))
+
+
+@timed("serialize")
+def _get_photographs_rendered_page_result(
+    rows: list[tuple], fallback_rows: list[tuple], limit: int, after: Optional[int], before: Optional[int]
+) -> DbResult:
+    """Returns the page of Photograph records fetched via `_get_photographs_page_renderings`."""
+    page: Page = build_page(rows, limit, after, before, key=itemgetter(0))
+    return DbResult(success=True, result=page.as_result(photo_renderings.records(page.rows, fallback_rows)))
+
+
+def _get_photographs_search_queryset(q: str) -> QuerySet[M]:
+    """
+    Returns the Photograph records matching the search `q`, annotated with their `rank`. On PostgreSQL, `q` is
+    parsed as a web search (quoted phrases, `or`, `-word`) and matched against the `search_vector` column through
+    its GIN index, ranked by `ts_rank` (title matches weigh more than alt text matches). Other databases (e.g.
+    SQLite in tests) fall back to a case-insensitive substring match on title and alt text, with equal ranks.
+    """
+    if connections[router.db_for_read(Photograph)].vendor != "postgresql":
+        return Photograph.objects.filter(Q(title__icontains=q) | Q(alt_text__icontains=q)).annotate(
+            rank=Value(0.0, output_field=FloatField())
+        )
+
+    # `search_vector` is maintained by a trigger rather than the model (see migration 0003), so reference it as SQL
+    query = SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG)
+    # params must be a list, the search lookup concatenates them with the query's
+    vector = RawSQL(f'"{Photograph._meta.db_table}"."search_vector"', [], output_field=SearchVectorField())
+    # ranks are compared against cursors, cast them from `real` so they round trip through JSON exactly
+    rank = Cast(SearchRank(vector, query), output_field=FloatField())
+    return Photograph.objects.annotate(search_vector=vector, rank=rank).filter(search_vector=query)
+
+
+def _get_photographs_search_projection(
+    q: str,
+    prefetch_photographer: Optional[bool],
+    limit: int,
+    after: Optional[tuple[float, int]],
+    before: Optional[tuple[float, int]],
+    fields: Optional[tuple[str, ...]],
+) -> QuerySet[M]:
+    """
+    Returns the full or limited Photograph serializer projection (see `_get_photographs_page_projection`) for a page
+    of search matches, with each row's `rank` appended for its cursor.
+    """
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    queryset: QuerySet[M] = page_ranked_queryset(_get_photographs_search_queryset(q), limit, after, before)
+    return queryset.values_list(*projection.lookups, "rank")
+
+
+@timed("serialize")
+def _get_photographs_search_result(
+    rows: list[tuple],
+    prefetch_photographer: Optional[bool],
+    limit: int,
+    after: Optional[tuple[float, int]],
+    before: Optional[tuple[float, int]],
+    fields: Optional[tuple[str, ...]],
+) -> DbResult:
+    """Returns the serialized page of Photograph records fetched via `_get_photographs_search_projection`."""
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    page: Page = build_page(rows, limit, after, before, key=lambda row: (row[-1], projection.pk(row)))
+    return DbResult(success=True, result=page.as_result(map(projection.to_dict, page.rows)))
+
+
+def _get_photographs_color_projection(
+    neighbours: list[tuple[int, float]], prefetch_photographer: Optional[bool], fields: Optional[tuple[str, ...]]
+) -> QuerySet[M]:
+    """
+    Returns the full or limited Photograph serializer projection (see `_get_photographs_page_projection`) of the
+    `neighbours` found in `color_index`, with each row's ID appended to match it with its distance.
+    """
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    queryset: QuerySet[M] = Photograph.objects.filter(id__in=[id for id, _ in neighbours])
+    return queryset.values_list(*projection.lookups, "id")
+
+
+@timed("serialize")
+def _get_photographs_color_result(
+    rows: list[tuple],
+    neighbours: list[tuple[int, float]],
+    prefetch_photographer: Optional[bool],
+    fields: Optional[tuple[str, ...]],
+) -> DbResult:
+    """
+    Returns the serialized Photograph records fetched via `_get_photographs_color_projection`, nearest first.
+    Neighbours deleted by another process since the index last caught up are missing from `rows`, and dropped.
+    """
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    rows_by_id: dict[int, tuple] = {row[-1]: row for row in rows}
+    results: list[dict[str, Any]] = [
+        {**projection.to_dict(rows_by_id[id]), "distance": round(distance, 4)}
+        for id, distance in neighbours
+        if id in rows_by_id
+    ]
+    return DbResult(success=True, result={"results": results})
+
+
+def _get_photographs_color_scan_projection(
+    lab: Lab, prefetch_photographer: Optional[bool], limit: int, fields: Optional[tuple[str, ...]]
+) -> QuerySet[M]:
+    """
+    Returns the full or limited Photograph serializer projection (see `_get_photographs_page_projection`) of the
+    `limit` photos nearest to `lab`, computing the distance of every photo with a color, with each row's squared
+    distance appended.
+    """
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    distance = sum(
+        ((F(field) - value) * (F(field) - value) for field, value in zip(Photograph.COLOR_FIELDS, lab)),
+        Value(0.0),
+    )
+    queryset: QuerySet[M] = (
+        Photograph.objects.filter(color_l__isnull=False)
+        .annotate(color_distance=ExpressionWrapper(distance, output_field=FloatField()))
+        .order_by("color_distance", "id")[:limit]
+    )
+    return queryset.values_list(*projection.lookups, "color_distance")
+
+
+@timed("serialize")
+def _get_photographs_color_scan_result(
+    rows: list[tuple], prefetch_photographer: Optional[bool], fields: Optional[tuple[str, ...]]
+) -> DbResult:
+    """Returns the serialized Photograph records fetched via `_get_photographs_color_scan_projection`."""
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    results: list[dict[str, Any]] = [
+        {**projection.to_dict(row), "distance": round(math.sqrt(row[-1]), 4)} for row in rows
+    ]
+    return DbResult(success=True, result={"results": results})
+
+
+def _get_photographs_export_queryset(photographer_id: Optional[int], after_id: Optional[int]) -> QuerySet[M]:
+    """Returns the limited Photograph serializer projection of all records, for `iter_photographs_export`."""
+    queryset: QuerySet[M] = (
+        Photograph.objects.filter(photographer_id=photographer_id) if photographer_id else Photograph.objects.all()
+    )
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    return get_projection(PhotographSlimSerializer).queryset(queryset.order_by("id"))
+
+
+@timed("serialize")
+def _get_photographs_page_result(
+    rows: list[tuple],
+    prefetch_photographer: Optional[bool],
+    limit: int,
+    after: Optional[int],
+    before: Optional[int],
+    fields: Optional[tuple[str, ...]],
+) -> DbResult:
+    """Returns the serialized page of Photograph records fetched via `_get_photographs_page_projection`."""
+    projection: SerializerProjection = get_projection(_get_photograph_serializer_class(prefetch_photographer), fields)
+    page: Page = build_page(rows, limit, after, before, key=projection.pk)
+    return DbResult(success=True, result=page.as_result(map(projection.to_dict, page.rows)))
+
+
+def _get_photograph_queryset(queryset: QuerySet[M], prefetch_photographer: Optional[bool] = False) -> QuerySet[M]:
+    """
+    Joins every relation read by the full or limited Photograph serializer (depending on `prefetch_photographer`),
+    so serializing any number of rows never issues per-row queries.
+    """
+    # `source` is nested by both serializers; the full serializer also nests Photographer and its User
     if prefetch_photographer:
-        queryset = queryset.select_related("photographer")
+        return queryset.select_related("source", "photographer__user")
+    return queryset.select_related("source")
+
 
-    # construct full/limited serializer and return it
-    SerializerCls: Type[ModelSerializer] = PhotographSerializer if prefetch_photographer else PhotographSlimSerializer
-    return SerializerCls(queryset, many=many)
+def _get_photograph_serializer_class(prefetch_photographer: Optional[bool] = False) -> Type[ModelSerializer]:
+    """Returns the full or limited Photograph serializer class (depending on `prefetch_photographer`)."""
+    return PhotographSerializer if prefetch_photographer else PhotographSlimSerializer
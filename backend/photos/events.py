@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+from functools import partial
+from typing import Any, AsyncIterator, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENT_SETTINGS = {
+    "ENABLED": True,
+    "CHANNEL": "photo_events",
+    "QUEUE_SIZE": 100,
+    "HEARTBEAT_SECONDS": 15.0,
+    "RECONNECT_SECONDS": 1.0,
+}
+"""Defaults for the `PHOTOS_EVENTS` setting (see `backend/settings.py`)."""
+
+PHOTO_CREATED = "photo.created"
+PHOTO_UPDATED = "photo.updated"
+
+
+def photo_event(type: str, id: int, photographer_id: int) -> dict[str, Any]:
+    """
+    Returns the event announcing the photo with `id` was created or updated. Events only hold IDs (NOTIFY payloads
+    are limited to 8000 bytes), clients fetch the records they care about via `/photos?ids=`.
+    """
+    return {"type": type, "id": id, "photographer_id": photographer_id}
+
+
+class Subscription:
+    """
+    Events for one subscriber (e.g. an open event stream), optionally only the ones of a photographer, buffered in
+    a bounded queue. A `None` in the queue means the subscription was dropped: events may have been missed since.
+    """
+
+    __slots__ = ("photographer_id", "queue", "dropped")
+
+    def __init__(self, photographer_id: Optional[int], queue_size: int):
+        self.photographer_id = photographer_id
+        self.queue: asyncio.Queue[Optional[dict[str, Any]]] = asyncio.Queue(maxsize=queue_size + 1)
+        self.dropped = False
+
+    def accepts(self, event: dict[str, Any]) -> bool:
+        """Returns whether `event` is one this subscriber asked for."""
+        return self.photographer_id is None or self.photographer_id == event["photographer_id"]
+
+
+class PhotoEvents:
+    """
+    Fans out photo create and update events to the subscribers of a worker. Writes publish events once their
+    transaction commits, as a Postgres NOTIFY on `channel`, so every worker hears them; each worker (event loop)
+    holds a single LISTEN connection while it has subscribers, and dispatches what it hears to them. Other
+    databases have no NOTIFY, there events only reach the subscribers of the worker that made the write.
+
+    Subscribers that fall `queue_size` events behind are dropped rather than buffered without bound, as are all
+    subscribers when the LISTEN connection is lost; they are expected to catch up via the change feed.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        channel: str,
+        queue_size: int,
+        heartbeat_seconds: float,
+        reconnect_seconds: float,
+        using: str = DEFAULT_DB_ALIAS,
+    ):
+        self.enabled = enabled
+        self.channel = channel
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.reconnect_seconds = reconnect_seconds
+        self.using = using
+        self.published = self.delivered = self.dropped = 0
+        self._subscribers: set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.listening = asyncio.Event()
+
+    @property
+    def uses_notify(self) -> bool:
+        """Whether events travel through Postgres NOTIFY (otherwise they stay in the worker that made the write)."""
+        return connections[self.using].vendor == "postgresql"
+
+    def publish(self, events: list[dict[str, Any]], using: str = DEFAULT_DB_ALIAS):
+        """Publishes `events` to subscribers once the current transaction on `using` commits."""
+        if self.enabled and events:
+            transaction.on_commit(partial(self._send, events, using), using=using, robust=True)
+
+    def _send(self, events: list[dict[str, Any]], using: str):
+        self.published += len(events)
+        if not self.uses_notify:
+            self._dispatch_threadsafe(events)
+            return
+        # one round trip for the whole batch, NOTIFY delivers each payload separately
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                [self.channel, [json.dumps(event, separators=(",", ":")) for event in events]],
+            )
+
+    def _dispatch_threadsafe(self, events: list[dict[str, Any]]):
+        # writes run in worker threads, subscribers live on the event loop
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.dispatch, events)
+
+    def dispatch(self, events: list[dict[str, Any]]):
+        """Queues `events` for the subscribers accepting them, dropping the ones whose queue is full."""
+        for subscription in list(self._subscribers):
+            for event in events:
+                if not subscription.accepts(event):
+                    continue
+                if subscription.queue.qsize() >= self.queue_size:
+                    self._drop(subscription)
+                    break
+                subscription.queue.put_nowait(event)
+                self.delivered += 1
+
+    def _drop(self, subscription: Subscription):
+        """Unsubscribes `subscription` and wakes up its consumer with the `None` marker."""
+        self._subscribers.discard(subscription)
+        if not subscription.dropped:
+            subscription.dropped = True
+            subscription.queue.put_nowait(None)
+            self.dropped += 1
+
+    async def subscribe(self, photographer_id: Optional[int] = None) -> Subscription:
+        """Subscribes to the events of the photos of `photographer_id` (all photos if None) in the running loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # subscribers and the listener belong to the loop they were created in
+            self._loop, self._subscribers, self._listener = loop, set(), None
+            self.listening = asyncio.Event()
+        subscription = Subscription(photographer_id, self.queue_size)
+        self._subscribers.add(subscription)
+        if self._listener is None and self.uses_notify:
+            self._listener = loop.create_task(self._listen())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Unsubscribes `subscription`, closing the LISTEN connection once the last subscriber is gone."""
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+            self.listening.clear()
+
+    async def _listen(self):
+        """Holds the LISTEN connection of this loop, dispatching notifications; reconnects when it's lost."""
+        import psycopg
+        from psycopg import sql
+
+        params = connections[self.using].get_connection_params()
+        # the Django cursor class is sync only, the adapters context and other options apply as is
+        params.pop("cursor_factory", None)
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**params, autocommit=True) as connection:
+                    await connection.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self.listening.set()
+                    async for notify in connection.notifies():
+                        self.dispatch([json.loads(notify.payload)])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("lost the %s LISTEN connection, reconnecting", self.channel)
+            # events sent while not listening are lost, so subscribers have to catch up
+            self.listening.clear()
+            for subscription in list(self._subscribers):
+                self._drop(subscription)
+            await asyncio.sleep(self.reconnect_seconds)
+
+    async def stream(self, photographer_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Yields the events of the photos of `photographer_id` (all photos if None) as server-sent events, with a
+        comment every `heartbeat_seconds` to keep idle connections open. Ends with a `resync` event if the
+        subscription is dropped.
+        """
+        subscription = await self.subscribe(photographer_id)
+        try:
+            # flushes the response headers right away, so clients know they're subscribed
+            yield b": subscribed\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield b": heartbeat\n\n"
+                    continue
+                if event is None:
+                    yield b'event: resync\ndata: {"reason":"dropped"}\n\n'
+                    return
+                data = json.dumps(event, separators=(",", ":"))
+                yield f"event: {event['type']}\ndata: {data}\n\n".encode("utf-8")
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict[str, int]:
+        """Returns the event counters, along with the number of subscribers in this worker."""
+        return {
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "subscribers": len(self._subscribers),
+        }
+
+
+def _build_photo_events() -> PhotoEvents:
+    """Builds the event hub from the `PHOTOS_EVENTS` setting."""
+    config = {**DEFAULT_EVENT_SETTINGS, **getattr(settings, "PHOTOS_EVENTS", {})}
+    return PhotoEvents(
+        enabled=config["ENABLED"],
+        channel=config["CHANNEL"],
+        queue_size=config["QUEUE_SIZE"],
+        heartbeat_seconds=config["HEARTBEAT_SECONDS"],
+        reconnect_seconds=config["RECONNECT_SECONDS"],
+    )
+
+
+photo_events = _build_photo_events()
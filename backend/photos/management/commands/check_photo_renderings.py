@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from photos.db import RECONCILE_BATCH_SIZE, check_photo_renderings
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks the pre-rendered JSON of photos (see `photos.renderings`) against renderings of their current "
+        "columns in batches, reporting the missing, stale and drifted ones, and repairing them if asked to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="only check the photos with these IDs")
+        parser.add_argument(
+            "--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="number of photos checked per batch"
+        )
+        parser.add_argument("--repair", action="store_true", help="store fresh renderings of the reported photos")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        report: dict[str, list[int]] = check_photo_renderings(
+            photograph_ids=opts["ids"] or None, batch_size=opts["batch_size"], dry_run=not opts["repair"]
+        )
+        for kind, ids in report.items():
+            self.stdout.write(f"{len(ids)} photos {kind}: {ids}")
+        if opts["repair"]:
+            self.stdout.write(self.style.SUCCESS(f"Done, repaired {sum(map(len, report.values()))} photos"))
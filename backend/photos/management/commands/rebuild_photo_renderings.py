@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from photos.db import RECONCILE_BATCH_SIZE, rebuild_photo_renderings
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders and stores the pre-rendered JSON of photos (see `photos.renderings`) in batches, e.g. before "
+        "enabling renderings on an existing catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="only render the photos with these IDs")
+        parser.add_argument(
+            "--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="number of photos rendered per batch"
+        )
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        report: dict[str, list[int]] = rebuild_photo_renderings(
+            photograph_ids=opts["ids"] or None, batch_size=opts["batch_size"]
+        )
+        counts = ", ".join(f"{len(ids)} {kind}" for kind, ids in report.items())
+        self.stdout.write(self.style.SUCCESS(f"Done, rebuilt the renderings ({counts} before)"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from photos.db import RECONCILE_BATCH_SIZE, reconcile_photographer_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Repairs drift in the denormalized photo stats of photographers (`photo_count`, `latest_photo_date`), "
+        "recomputing them from their photos in batches and only updating the ones that differ."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="only check the photographers with these IDs")
+        parser.add_argument(
+            "--batch-size", type=int, default=RECONCILE_BATCH_SIZE, help="number of photographers checked per batch"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="only report drifted photographers")
+
+    def handle(self, *args, **opts):
+        if opts["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        drifted: list[int] = reconcile_photographer_stats(
+            photographer_ids=opts["ids"] or None, batch_size=opts["batch_size"], dry_run=opts["dry_run"]
+        )
+        if opts["dry_run"]:
+            self.stdout.write(f"{len(drifted)} photographers drifted: {drifted}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Done, repaired {len(drifted)} photographers"))
@@ -0,0 +1,166 @@
+import csv
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import Truncator
+
+from photos.cache import photo_cache
+from photos.db import reconcile_photographer_stats
+from photos.models import Photograph, Photographer, PhotoSource
+from photos.signals import photographs_bulk_created
+from photos.source_templates import source_templates
+
+CSV_FILE = settings.BASE_DIR / "photos.csv"
+UserModel = get_user_model()
+
+SOURCE_COLUMNS = {
+    "original": "src_original",
+    "large_2x": "src_large2x",
+    "large": "src_large",
+    "medium": "src_medium",
+    "small": "src_small",
+    "portrait": "src_portrait",
+    "landscape": "src_landscape",
+    "tiny": "src_tiny",
+}
+"""Maps PhotoSource fields to the CSV columns they are seeded from."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds users, photographers, photos and photo sources from a CSV of photo data (default: photos.csv). "
+        "Rows are streamed and inserted in batches; re-runs update existing photos (matched by `url`) in place."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--csv", type=Path, default=CSV_FILE, help="CSV file of photo data to seed from")
+        parser.add_argument(
+            "--scale",
+            type=int,
+            default=1,
+            help="seed N copies of every CSV row (each copy with its own photo URLs and photographers)",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000, help="number of CSV rows inserted per batch")
+
+    def handle(self, *args, **opts):
+        if opts["scale"] < 1 or opts["batch_size"] < 1:
+            raise CommandError("--scale and --batch-size must be at least 1")
+        if not opts["csv"].exists():
+            raise CommandError(f"CSV file not found: {opts['csv']}")
+
+        # seeded users can't log in, so they share one unusable password rather than hashing one each
+        self.password = make_password(None)
+
+        # stream rows in batches, upserting each batch in a single transaction
+        rows: Iterator[dict[str, str]] = self._read_rows(opts["csv"], opts["scale"])
+        seeded = 0
+        while batch := list(islice(rows, opts["batch_size"])):
+            with transaction.atomic():
+                photographer_ids: dict[str, int] = self._ensure_photographers(batch)
+                photographs: list[Photograph] = self._upsert_photographs(batch, photographer_ids)
+                self._upsert_photo_sources(batch, photographs)
+                # `bulk_create` doesn't send `post_save`, so let receivers know about the photos
+                photographs_bulk_created.send(sender=Photograph, photographs=photographs)
+                # upserts count updated photos as created, so recompute the stats of their photographers
+                reconcile_photographer_stats(set(photographer_ids.values()))
+            seeded += len(batch)
+            self.stdout.write(f"Seeded {seeded} photos")
+
+        # photographers were created via `bulk_create` as well
+        photo_cache.invalidate("photographers")
+        self.stdout.write(self.style.SUCCESS(f"Done, seeded {seeded} photos from {opts['csv']}"))
+
+    def _read_rows(self, path: Path, scale: int) -> Iterator[dict[str, str]]:
+        """
+        Yields the rows of the CSV file at `path`, `scale` times. Each copy after the first gets its own photo URLs
+        and photographers, so it seeds new records rather than updating the first copy's.
+        """
+        for copy in range(scale):
+            with open(path, "r", newline="") as csvfile:
+                for row in csv.DictReader(csvfile):
+                    if copy:
+                        row["url"] = f"{row['url']}?copy={copy}"
+                        row["photographer_id"] = f"{row['photographer_id']}-{copy}"
+                    yield row
+
+    def _get_email(self, row: dict[str, str]) -> str:
+        """Returns the email address of the User seeded for the photographer of `row`."""
+        return f"photographer.{row['photographer_id']}@gmail.com"
+
+    def _ensure_photographers(self, batch: list[dict[str, str]]) -> dict[str, int]:
+        """Ensures a User and Photographer exist for every photographer in `batch`, returning their IDs by email."""
+        # insert users not seeded yet (skipping existing ones), then look up all of them
+        users: list[UserModel] = []
+        for email, row in {self._get_email(row): row for row in batch}.items():
+            first_name, _, last_name = row["photographer"].strip().partition(" ")
+            users.append(
+                UserModel(
+                    username=email,
+                    email=email,
+                    password=self.password,
+                    first_name=first_name[:150],
+                    last_name=last_name.strip()[:150],
+                )
+            )
+        UserModel.objects.bulk_create(users, ignore_conflicts=True)
+        user_ids: dict[str, int] = dict(
+            UserModel.objects.filter(email__in=[user.email for user in users]).values_list("email", "id")
+        )
+
+        # `bulk_create` skips the User post_save hook, so create missing Photographer records here
+        photographer_ids: dict[int, int] = dict(
+            Photographer.objects.filter(user_id__in=user_ids.values()).values_list("user_id", "id")
+        )
+        missing: list[Photographer] = [
+            Photographer(user_id=user_id) for user_id in user_ids.values() if user_id not in photographer_ids
+        ]
+        for photographer in Photographer.objects.bulk_create(missing):
+            photographer_ids[photographer.user_id] = photographer.id
+        return {email: photographer_ids[user_id] for email, user_id in user_ids.items()}
+
+    def _upsert_photographs(self, batch: list[dict[str, str]], photographer_ids: dict[str, int]) -> list[Photograph]:
+        """Inserts the photos in `batch`, updating existing ones with the same `url`."""
+        # an upsert can't touch the same row twice, so the last row wins for URLs repeated within the batch
+        photographs: dict[str, Photograph] = {
+            row["url"]: Photograph(
+                title=Truncator(row["alt"] or "Untitled").words(6),
+                url=row["url"],
+                avg_color=row["avg_color"] or None,
+                alt_text=row["alt"][:255] or None,
+                photographer_id=photographer_ids[self._get_email(row)],
+            )
+            for row in batch
+        }
+        for photograph in photographs.values():
+            photograph.sync_color()
+        return Photograph.objects.bulk_create(
+            photographs.values(),
+            update_conflicts=True,
+            unique_fields=["url"],
+            update_fields=["title", "avg_color", *Photograph.COLOR_FIELDS, "alt_text", "photographer", "last_updated"],
+        )
+
+    def _upsert_photo_sources(self, batch: list[dict[str, str]], photographs: list[Photograph]):
+        """Inserts the photo sources in `batch`, updating the existing source of each photo."""
+        photograph_ids: dict[str, int] = {photo.url: photo.id for photo in photographs}
+        urls: dict[int, dict[str, Optional[str]]] = {
+            photograph_ids[row["url"]]: {field: row[column] or None for field, column in SOURCE_COLUMNS.items()}
+            for row in batch
+        }
+        # catalogs share a few URL patterns, so store the sources compactly (see `photos.source_templates`)
+        source_templates.ensure(urls.values())
+        PhotoSource.objects.bulk_create(
+            [
+                PhotoSource(photograph_id=photograph_id, **source_templates.compact(fields))
+                for photograph_id, fields in urls.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["photograph"],
+            update_fields=[*SOURCE_COLUMNS, "template"],
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='photograph',
+            index=models.Index(fields=['photographer', 'id'], name='photograph_photographer_id_idx'),
+        ),
+    ]
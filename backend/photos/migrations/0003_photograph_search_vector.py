@@ -0,0 +1,93 @@
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 10_000
+"""Number of existing rows updated (and committed) per statement when backfilling `search_vector`."""
+
+
+def search_vector_sql(row: str) -> str:
+    """Returns the SQL building the `search_vector` of `row`, with title matches weighing more than alt text ones."""
+    # must match `photos.db.SEARCH_CONFIG`
+    return (
+        f"setweight(to_tsvector('english', coalesce({row}.title, '')), 'A') || "
+        f"setweight(to_tsvector('english', coalesce({row}.alt_text, '')), 'B')"
+    )
+
+
+def add_search_vector(apps, schema_editor):
+    """
+    Adds the `search_vector` column (PostgreSQL only, see `photos.db.search_photographs`) without holding long locks
+    on large tables. The column is added as nullable (a catalog-only change), a trigger keeps it current for new and
+    updated rows, existing rows are backfilled in batches (each committed on its own), and finally the GIN index is
+    built concurrently, so reads and writes carry on throughout.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("ALTER TABLE photos_photograph ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        cursor.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION photos_photograph_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := {search_vector_sql("NEW")};
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+            """
+        )
+        cursor.execute("DROP TRIGGER IF EXISTS photos_photograph_search_vector ON photos_photograph")
+        cursor.execute(
+            """
+            CREATE TRIGGER photos_photograph_search_vector
+            BEFORE INSERT OR UPDATE OF title, alt_text ON photos_photograph
+            FOR EACH ROW EXECUTE FUNCTION photos_photograph_search_vector()
+            """
+        )
+
+        # backfill rows that existed before the trigger, walking the primary key
+        last_id = 0
+        while True:
+            cursor.execute(
+                f"""
+                WITH batch AS (
+                    SELECT id FROM photos_photograph WHERE id > %s ORDER BY id LIMIT %s
+                )
+                UPDATE photos_photograph AS photo SET search_vector = {search_vector_sql("photo")}
+                FROM batch WHERE photo.id = batch.id
+                RETURNING photo.id
+                """,
+                [last_id, BACKFILL_BATCH_SIZE],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            last_id = max(ids)
+
+        cursor.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS photograph_search_vector_idx "
+            "ON photos_photograph USING GIN (search_vector)"
+        )
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP INDEX CONCURRENTLY IF EXISTS photograph_search_vector_idx")
+        cursor.execute("DROP TRIGGER IF EXISTS photos_photograph_search_vector ON photos_photograph")
+        cursor.execute("DROP FUNCTION IF EXISTS photos_photograph_search_vector()")
+        cursor.execute("ALTER TABLE photos_photograph DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+    # `CREATE INDEX CONCURRENTLY` can't run in a transaction, and each backfill batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('photos', '0002_photograph_photographer_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:10
+
+from django.db import migrations, models, transaction
+
+from photos.colors import hex_to_lab
+
+BACKFILL_BATCH_SIZE = 5_000
+"""Number of existing rows updated (and committed) per batch when backfilling the color components."""
+
+
+def backfill_color_lab(apps, schema_editor):
+    """Sets the CIELAB components of existing photos from their `avg_color`, walking the primary key in batches."""
+    Photograph = apps.get_model("photos", "Photograph")
+    alias = schema_editor.connection.alias
+    last_id = 0
+    while batch := list(
+        Photograph.objects.using(alias)
+        .filter(id__gt=last_id, avg_color__isnull=False)
+        .only("id", "avg_color")
+        .order_by("id")[:BACKFILL_BATCH_SIZE]
+    ):
+        for photo in batch:
+            photo.color_l, photo.color_a, photo.color_b = hex_to_lab(photo.avg_color) or (None, None, None)
+        with transaction.atomic(using=alias):
+            Photograph.objects.using(alias).bulk_update(batch, ["color_l", "color_a", "color_b"])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    # the (nullable) columns are added without a table rewrite, then each backfill batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('photos', '0003_photograph_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photograph',
+            name='color_a',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photograph',
+            name='color_b',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photograph',
+            name='color_l',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_color_lab, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:16
+
+from django.db import migrations, models, transaction
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BACKFILL_BATCH_SIZE = 1_000
+"""Number of photographers updated (and committed) per batch when backfilling their photo stats."""
+
+
+def backfill_photo_stats(apps, schema_editor):
+    """Sets `photo_count` and `latest_photo_date` of existing photographers, walking the primary key in batches."""
+    Photographer = apps.get_model("photos", "Photographer")
+    Photograph = apps.get_model("photos", "Photograph")
+    alias = schema_editor.connection.alias
+    photographs = (
+        Photograph.objects.using(alias).filter(photographer_id=OuterRef("id")).order_by().values("photographer_id")
+    )
+    photographers = Photographer.objects.using(alias).order_by("id")
+    last_id = 0
+    while ids := list(photographers.filter(id__gt=last_id).values_list("id", flat=True)[:BACKFILL_BATCH_SIZE]):
+        with transaction.atomic(using=alias):
+            photographers.filter(id__in=ids).update(
+                photo_count=Coalesce(
+                    Subquery(photographs.annotate(count=Count("id")).values("count"), output_field=IntegerField()), 0
+                ),
+                latest_photo_date=Subquery(photographs.annotate(latest=Max("date_created")).values("latest")),
+            )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # the columns are added without a table rewrite, then each backfill batch commits on its own
+    atomic = False
+
+    dependencies = [
+        ('photos', '0004_photograph_color_lab'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photographer',
+            name='latest_photo_date',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='photographer',
+            name='photo_count',
+            field=models.PositiveIntegerField(db_default=0, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_photo_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:54
+
+import hashlib
+from urllib.parse import urlsplit
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+# frozen copies of `photos.models.SOURCE_VARIANTS` and the helpers in `photos.source_templates`, so this migration
+# keeps doing what it did when it was written, whatever becomes of the app code
+SOURCE_VARIANTS = ("medium", "small", "tiny", "large", "large_2x", "portrait", "landscape")
+SUFFIX_MAX_LENGTH = 255
+CONVERT_BATCH_SIZE = 1000
+
+
+def get_variant_suffixes(fields):
+    """Returns the suffix each variant URL in `fields` adds to `original`, or None if any doesn't follow it."""
+    original = fields.get("original")
+    if not original:
+        return None
+    suffixes = []
+    for variant in SOURCE_VARIANTS:
+        url = fields.get(variant)
+        if url is None or not url.startswith(original) or len(url) - len(original) > SUFFIX_MAX_LENGTH:
+            return None
+        suffixes.append(url[len(original) :])
+    return tuple(suffixes)
+
+
+def get_template_name(original, suffixes):
+    """Returns a (deterministic) name for the template of `suffixes`, first seen with the `original` URL."""
+    digest = hashlib.sha1("\n".join(suffixes).encode("utf-8")).hexdigest()[:10]
+    return f"{urlsplit(original).hostname or 'photos'}-{digest}"
+
+
+def compact_sources(apps, schema_editor):
+    """Creates templates for the URL patterns shared by existing sources, then points their rows at them."""
+    PhotoSource = apps.get_model("photos", "PhotoSource")
+    SourceTemplate = apps.get_model("photos", "SourceTemplate")
+    using = schema_editor.connection.alias
+    sources = PhotoSource.objects.using(using).order_by("id")
+
+    # count the rows sharing each set of suffixes, creating templates for the ones shared by at least two rows
+    counts = {}
+    originals = {}
+    fields = ["id", "original", *SOURCE_VARIANTS]
+    last_id = 0
+    while batch := list(sources.filter(id__gt=last_id, template__isnull=True).values(*fields)[:CONVERT_BATCH_SIZE]):
+        for row in batch:
+            if suffixes := get_variant_suffixes(row):
+                counts[suffixes] = counts.get(suffixes, 0) + 1
+                originals.setdefault(suffixes, row["original"])
+        last_id = batch[-1]["id"]
+    SourceTemplate.objects.using(using).bulk_create(
+        [
+            SourceTemplate(
+                name=get_template_name(originals[suffixes], suffixes), **dict(zip(SOURCE_VARIANTS, suffixes))
+            )
+            for suffixes, count in counts.items()
+            if count >= 2
+        ],
+        ignore_conflicts=True,
+    )
+    templates = {
+        tuple(row[1:]): row[0] for row in SourceTemplate.objects.using(using).values_list("id", *SOURCE_VARIANTS)
+    }
+
+    # then point the rows at their template, dropping the URLs it rebuilds
+    last_id = 0
+    while batch := list(sources.filter(id__gt=last_id, template__isnull=True).only(*fields)[:CONVERT_BATCH_SIZE]):
+        compacted = []
+        for source in batch:
+            suffixes = get_variant_suffixes({field: getattr(source, field) for field in fields})
+            if suffixes in templates:
+                source.template_id = templates[suffixes]
+                for variant in SOURCE_VARIANTS:
+                    setattr(source, variant, None)
+                compacted.append(source)
+        with transaction.atomic(using=using):
+            PhotoSource.objects.using(using).bulk_update(compacted, [*SOURCE_VARIANTS, "template"])
+        last_id = batch[-1].id
+
+
+def expand_sources(apps, schema_editor):
+    """Writes the URLs rebuilt from templates back into their rows, before the templates are dropped."""
+    PhotoSource = apps.get_model("photos", "PhotoSource")
+    using = schema_editor.connection.alias
+    queryset = PhotoSource.objects.using(using).order_by("id").filter(template__isnull=False).select_related("template")
+    while batch := list(queryset[:CONVERT_BATCH_SIZE]):
+        for source in batch:
+            for variant in SOURCE_VARIANTS:
+                if getattr(source, variant) is None:
+                    setattr(source, variant, source.original + getattr(source.template, variant))
+            source.template = None
+        with transaction.atomic(using=using):
+            PhotoSource.objects.using(using).bulk_update(batch, [*SOURCE_VARIANTS, "template"])
+
+
+class Migration(migrations.Migration):
+    # existing rows are converted in batches that each commit on their own
+    atomic = False
+
+    dependencies = [
+        ('photos', '0005_photographer_photo_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('medium', models.CharField(max_length=255)),
+                ('small', models.CharField(max_length=255)),
+                ('tiny', models.CharField(max_length=255)),
+                ('large', models.CharField(max_length=255)),
+                ('large_2x', models.CharField(max_length=255)),
+                ('portrait', models.CharField(max_length=255)),
+                ('landscape', models.CharField(max_length=255)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('medium', 'small', 'tiny', 'large', 'large_2x', 'portrait', 'landscape'), name='sourcetemplate_variants_unique')],
+            },
+        ),
+        migrations.AddField(
+            model_name='photosource',
+            name='template',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='photos.sourcetemplate'),
+        ),
+        migrations.RunPython(compact_sources, expand_sources),
+    ]
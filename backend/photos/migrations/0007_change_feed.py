@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:05
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+CHANGES_INDEXES = {
+    "photograph": models.Index(fields=["last_updated", "id"], name="photograph_changes_idx"),
+    "photographer": models.Index(fields=["last_updated", "id"], name="photographer_changes_idx"),
+}
+"""Change feed indexes on the existing (possibly large) tables."""
+
+
+def add_changes_indexes(apps, schema_editor):
+    """Builds the change feed indexes, concurrently on PostgreSQL so writes carry on while they're built."""
+    for model_name, index in CHANGES_INDEXES.items():
+        model = apps.get_model("photos", model_name)
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(index.create_sql(model, schema_editor, concurrently=True))
+        else:
+            schema_editor.add_index(model, index)
+
+
+def remove_changes_indexes(apps, schema_editor):
+    """Drops the change feed indexes."""
+    for model_name, index in CHANGES_INDEXES.items():
+        schema_editor.remove_index(apps.get_model("photos", model_name), index)
+
+
+class Migration(migrations.Migration):
+    # indexes can't be built concurrently inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('photos', '0006_sourcetemplate_photosource_template'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('photo', 'Photograph'), ('photographer', 'Photographer')], max_length=20)),
+                ('record_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_default=django.db.models.functions.datetime.Now())),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in CHANGES_INDEXES.items()
+            ],
+            database_operations=[migrations.RunPython(add_changes_indexes, remove_changes_indexes)],
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_changes_idx'),
+        ),
+    ]
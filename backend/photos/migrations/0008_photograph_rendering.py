@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0007_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotographRendering',
+            fields=[
+                ('photograph', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rendering', serialize=False, to='photos.photograph')),
+                ('content', models.TextField()),
+                ('last_updated', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,14 +1,22 @@
+from typing import Optional
+
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models.functions import Now
 
+from photos.colors import Lab, hex_to_lab
+
+
+PHOTO_URL_MAX_LENGTH = 2048
+"""Maximum length of the URLs stored in a `PhotoURLField`."""
+
 
 class PhotoURLField(models.URLField):
     """Extension of URLField to enforce a common max_length, etc."""
 
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **{"max_length": 2048, "null": True, **kwargs})
+        super().__init__(*args, **{"max_length": PHOTO_URL_MAX_LENGTH, "null": True, **kwargs})
 
 
 class User(AbstractUser):
@@ -21,9 +29,18 @@ class Photographer(models.Model):
     """Represents a Photographer, who is a User, and may have 1 to many photographs."""
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # denormalized aggregates of `photographs`, maintained by `photos.signals` (see `reconcile_photographer_stats`)
+    photo_count = models.PositiveIntegerField(default=0, db_default=0, editable=False)
+    latest_photo_date = models.DateTimeField(null=True, editable=False)
     date_created = models.DateTimeField(auto_now_add=True, db_default=Now())
     last_updated = models.DateTimeField(auto_now=True, db_default=Now())
 
+    class Meta:
+        indexes = [
+            # supports the change feed (`WHERE last_updated > ? ORDER BY last_updated, id`)
+            models.Index(fields=["last_updated", "id"], name="photographer_changes_idx"),
+        ]
+
     def __str__(self):
         return self.user.email
 
@@ -38,15 +55,78 @@ class Photograph(models.Model):
     photographer = models.ForeignKey(
         Photographer, on_delete=models.CASCADE, related_name="photographs"
     )
+    # CIELAB components of `avg_color` (null if it isn't a hex color), for nearest color search
+    color_l = models.FloatField(null=True, editable=False)
+    color_a = models.FloatField(null=True, editable=False)
+    color_b = models.FloatField(null=True, editable=False)
     date_created = models.DateTimeField(auto_now_add=True, db_default=Now())
     last_updated = models.DateTimeField(auto_now=True, db_default=Now())
 
+    COLOR_FIELDS = ("color_l", "color_a", "color_b")
+    """Fields derived from `avg_color` by `sync_color`."""
+
+    class Meta:
+        indexes = [
+            # supports keyset pagination of a photographer's photos (`WHERE photographer_id = ? AND id > ?`)
+            models.Index(fields=["photographer", "id"], name="photograph_photographer_id_idx"),
+            # supports the change feed (`WHERE last_updated > ? ORDER BY last_updated, id`)
+            models.Index(fields=["last_updated", "id"], name="photograph_changes_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # keep the color components in sync with `avg_color`, even when saving specific fields
+        self.sync_color()
+        if (update_fields := kwargs.get("update_fields")) is not None and "avg_color" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *self.COLOR_FIELDS}
+        super().save(*args, **kwargs)
+
+    def sync_color(self):
+        """Sets the CIELAB components from `avg_color`. Call before `bulk_create`, which skips `save`."""
+        self.color_l, self.color_a, self.color_b = hex_to_lab(self.avg_color) or (None, None, None)
+
+    @property
+    def color_lab(self) -> Optional[Lab]:
+        """Returns the CIELAB components of `avg_color`, or None if it isn't a hex color."""
+        return None if self.color_l is None else (self.color_l, self.color_a, self.color_b)
+
+
+SOURCE_VARIANTS = ("medium", "small", "tiny", "large", "large_2x", "portrait", "landscape")
+"""PhotoSource URL fields that are variants of its `original` URL."""
+
+
+class SourceTemplate(models.Model):
+    """
+    Represents a named set of URL suffixes, one per PhotoSource variant, shared by every PhotoSource whose variant
+    URLs are its `original` URL followed by those suffixes (see `photos.source_templates`).
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    medium = models.CharField(max_length=255)
+    small = models.CharField(max_length=255)
+    tiny = models.CharField(max_length=255)
+    large = models.CharField(max_length=255)
+    large_2x = models.CharField(max_length=255)
+    portrait = models.CharField(max_length=255)
+    landscape = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=SOURCE_VARIANTS, name="sourcetemplate_variants_unique"),
+        ]
+
+    def __str__(self):
+        return self.name
+
 
 class PhotoSource(models.Model):
-    """Represents a PhotoSource, owned by a Photograph. Defines multiple different source URLs."""
+    """
+    Represents a PhotoSource, owned by a Photograph. Defines multiple different source URLs.
+    Compact rows only store `original` and a `template`, leaving the variant URLs that follow the template null;
+    the API rebuilds them as `original` + the template's suffix (see `photos.source_templates`).
+    """
 
     original = PhotoURLField()
     medium = PhotoURLField()
@@ -56,9 +136,54 @@ class PhotoSource(models.Model):
     large_2x = PhotoURLField()
     portrait = PhotoURLField()
     landscape = PhotoURLField()
+    # not indexed, rows are never looked up by template (only deleting a template would need it)
+    template = models.ForeignKey(
+        SourceTemplate, null=True, blank=True, on_delete=models.PROTECT, related_name="+", db_index=False
+    )
     photograph = models.OneToOneField(
         Photograph, on_delete=models.CASCADE, related_name="source"
     )
 
     def __str__(self):
         return f"photo.{self.photograph.id}"
+
+
+class PhotographRendering(models.Model):
+    """
+    Represents the pre-rendered JSON of a Photograph's list representation (`PhotographSlimSerializer`, with its
+    source), maintained by `photos.signals` when renderings are enabled (see `photos.renderings`). `last_updated`
+    is the one of the Photograph it was rendered from; renderings that don't match it are never served.
+    """
+
+    photograph = models.OneToOneField(
+        Photograph, on_delete=models.CASCADE, primary_key=True, related_name="rendering"
+    )
+    content = models.TextField()
+    last_updated = models.DateTimeField()
+
+    def __str__(self):
+        return f"photo.{self.photograph_id}"
+
+
+class Tombstone(models.Model):
+    """
+    Records the deletion of a Photograph or Photographer, so the change feed can report it to clients mirroring
+    the catalog (see `photos.db.get_changes`). Created by the `post_delete` receivers in `photos.signals`.
+    """
+
+    PHOTOGRAPH = "photo"
+    PHOTOGRAPHER = "photographer"
+    KIND_CHOICES = [(PHOTOGRAPH, "Photograph"), (PHOTOGRAPHER, "Photographer")]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    record_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_default=Now())
+
+    class Meta:
+        indexes = [
+            # supports the change feed (`WHERE deleted_at > ? ORDER BY deleted_at, id`)
+            models.Index(fields=["deleted_at", "id"], name="tombstone_changes_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}.{self.record_id}"
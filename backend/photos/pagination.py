@@ -0,0 +1,201 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Callable, Optional
+
+from django.db.models import Q, QuerySet
+
+DEFAULT_PAGE_LIMIT = 50
+"""Number of records returned by a list endpoint when `?limit=` is not provided."""
+
+MAX_PAGE_LIMIT = 500
+"""Upper bound on `?limit=`, keeps a single page cheap to query and serialize."""
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+    pass
+
+
+@dataclass
+class Page:
+    """
+    Represents a single page of records from a keyset paginated queryset.
+    `next` is the cursor to pass as `?after=` and `prev` the cursor to pass as `?before=`.
+    """
+
+    rows: list[Any]
+    next: Optional[str] = None
+    prev: Optional[str] = None
+
+    def as_result(self, results: list[Any]) -> dict[str, Any]:
+        """Returns the response envelope for this page wrapping the serialized `results`."""
+        return {"results": list(results), "next": self.next, "prev": self.prev}
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encodes the provided key values into an opaque, url-safe cursor string."""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> list[Any]:
+    """Decodes a cursor created by `encode_cursor` back into its key values."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if not isinstance(values, list) or not values:
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def decode_id_cursor(token: str) -> int:
+    """Decodes a cursor that holds a single integer `id` key."""
+    values = decode_cursor(token)
+    if len(values) != 1 or not isinstance(values[0], int) or isinstance(values[0], bool):
+        raise InvalidCursor("Invalid cursor")
+    return values[0]
+
+
+def decode_rank_cursor(token: str) -> tuple[float, int]:
+    """Decodes a cursor that holds a `(rank, id)` key, see `page_ranked_queryset`."""
+    values = decode_cursor(token)
+    if len(values) != 2 or any(isinstance(value, bool) for value in values):
+        raise InvalidCursor("Invalid cursor")
+    rank, id = values
+    if not isinstance(rank, (int, float)) or not isinstance(id, int):
+        raise InvalidCursor("Invalid cursor")
+    return float(rank), id
+
+
+CHANGES_STREAMS = ("photos", "photographers", "deleted")
+"""Streams of the change feed, each with its own `(timestamp, id)` position in a changes cursor."""
+
+ChangeKey = tuple[datetime, int]
+"""Position in a change feed stream: the `(last_updated, id)` (or `(deleted_at, id)`) key of the last record."""
+
+
+def encode_changes_cursor(*keys: Optional[ChangeKey]) -> str:
+    """Encodes the position reached in each of the `CHANGES_STREAMS` (None if nothing was read yet) into a cursor."""
+    return encode_cursor(*([key[0].isoformat(), key[1]] if key else None for key in keys))
+
+
+def decode_changes_cursor(token: str) -> tuple[Optional[ChangeKey], ...]:
+    """Decodes a cursor created by `encode_changes_cursor` back into the position in each stream."""
+    values = decode_cursor(token)
+    if len(values) != len(CHANGES_STREAMS):
+        raise InvalidCursor("Invalid cursor")
+    keys: list[Optional[ChangeKey]] = []
+    for value in values:
+        if value is None:
+            keys.append(None)
+            continue
+        if not isinstance(value, list) or len(value) != 2 or not isinstance(value[0], str):
+            raise InvalidCursor("Invalid cursor")
+        if not isinstance(value[1], int) or isinstance(value[1], bool):
+            raise InvalidCursor("Invalid cursor")
+        try:
+            timestamp = datetime.fromisoformat(value[0])
+        except ValueError as e:
+            raise InvalidCursor("Invalid cursor") from e
+        if timestamp.tzinfo is None:
+            raise InvalidCursor("Invalid cursor")
+        keys.append((timestamp, value[1]))
+    return tuple(keys)
+
+
+def changes_queryset(
+    queryset: QuerySet, field: str, after: Optional[ChangeKey], until: datetime, limit: int = DEFAULT_PAGE_LIMIT
+) -> QuerySet:
+    """
+    Applies keyset pagination on `(field, id)` to the provided queryset, where `field` is the time each row last
+    changed: returns the rows changed after the key `after` (if provided) and no later than `until`, in the order
+    they changed. One extra row is fetched to tell whether more changes follow.
+    """
+    queryset = queryset.filter(**{f"{field}__lte": until})
+    if after is not None:
+        changed, id = after
+        # the redundant `>=` bound lets the planner seek on the index rather than scan for the `OR`
+        queryset = queryset.filter(
+            Q(**{f"{field}__gt": changed}) | Q(**{field: changed, "id__gt": id}), **{f"{field}__gte": changed}
+        )
+    return queryset.order_by(field, "id")[: limit + 1]
+
+
+def page_queryset(
+    queryset: QuerySet,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+) -> QuerySet:
+    """
+    Applies keyset pagination on `id` to the provided queryset.
+    One extra row is fetched so `build_page` can tell whether another page exists.
+    Seeks via `id > after` / `id < before`, so deep pages cost the same as the first page.
+    """
+    if before is not None:
+        return queryset.filter(id__lt=before).order_by("-id")[: limit + 1]
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return queryset.order_by("id")[: limit + 1]
+
+
+def page_ranked_queryset(
+    queryset: QuerySet,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[tuple[float, int]] = None,
+    before: Optional[tuple[float, int]] = None,
+) -> QuerySet:
+    """
+    Applies keyset pagination on `(rank, id)` to the provided queryset, which must be annotated with a `rank`.
+    Rows are ordered by descending rank, ties by ID. Otherwise works like `page_queryset` (one extra row is
+    fetched for `build_page`, and deep pages cost the same as the first page).
+    """
+    if before is not None:
+        rank, id = before
+        return queryset.filter(Q(rank__gt=rank) | Q(rank=rank, id__lt=id)).order_by("rank", "-id")[: limit + 1]
+    if after is not None:
+        rank, id = after
+        queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__gt=id))
+    return queryset.order_by("-rank", "id")[: limit + 1]
+
+
+def build_page(
+    rows: list[Any],
+    limit: int = DEFAULT_PAGE_LIMIT,
+    after: Optional[int | tuple] = None,
+    before: Optional[int | tuple] = None,
+    key: Callable[[Any], int | tuple] = attrgetter("id"),
+) -> Page:
+    """
+    Builds a `Page` from the rows fetched with the matching `page_queryset` (or `page_ranked_queryset`) call.
+    `key` returns the `id` of a row, for rows that aren't model instances (e.g. `values_list` tuples), or the
+    `(rank, id)` key of a row for ranked pages.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    def cursor(value: int | tuple) -> str:
+        return encode_cursor(*value) if isinstance(value, tuple) else encode_cursor(value)
+
+    # paging backwards fetches rows in descending order, flip them back into key order
+    if before is not None:
+        rows.reverse()
+        # an empty page before `before` continues from just ahead of it (keys end with the `id`)
+        ahead = (*before[:-1], before[-1] - 1) if isinstance(before, tuple) else before - 1
+        return Page(
+            rows=rows,
+            next=cursor(key(rows[-1])) if rows else cursor(ahead),
+            prev=cursor(key(rows[0])) if rows and has_more else None,
+        )
+
+    return Page(
+        rows=rows,
+        next=cursor(key(rows[-1])) if rows and has_more else None,
+        prev=cursor(key(rows[0])) if rows and after is not None else None,
+    )
@@ -0,0 +1,95 @@
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Optional, Type
+
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+
+class SerializerProjection:
+    """
+    Fast, read-only equivalent of a (possibly nested) ModelSerializer's representation, for list endpoints.
+    Rows are fetched as `values_list` tuples of just the serialized columns (joining nested relations), and
+    turned into dicts by a function compiled once per serializer. The payload matches `serializer.data`:
+    same keys in the same order, `None` for missing nested relations, and any field that isn't already a JSON
+    native value (e.g. datetimes) formatted by that serializer field's own `to_representation`.
+    If `fields` is provided, the serializer is pruned to those field paths (see `photos.serializers.prune_fields`)
+    first, so only the columns (and joins) the remaining fields read are fetched. A serializer may fetch some
+    fields with an expression rather than their column, by mapping their names to functions of the lookup prefix
+    (e.g. `source__`) returning the expression in `Meta.projection_expressions`.
+    """
+
+    IDENTITY_FIELDS = (serializers.IntegerField, serializers.CharField)
+    """Fields whose `to_representation` returns the value as fetched from the database, so it can be skipped."""
+
+    def __init__(self, serializer_class: Type[serializers.ModelSerializer], fields: Optional[tuple[str, ...]] = None):
+        self.serializer_class = serializer_class
+        self.fields = fields
+        self.lookups: list[Any] = []
+        self._positions: dict[str, int] = {}
+        self._formatters: dict[str, Callable[[Any], Any]] = {}
+
+        # compile `to_dict(row)` as a single dict display, so there is no per field loop at runtime
+        serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+        expression = self._dict_expression(serializer, prefix="")
+        namespace = dict(self._formatters)
+        exec(
+            compile(f"def to_dict(row):\n    return {expression}\n", f"<{serializer_class.__name__}>", "exec"),
+            namespace,
+        )
+        self.to_dict: Callable[[tuple], dict[str, Any]] = namespace["to_dict"]
+        # rows are keyed (e.g. paginated) on `id`, so it's fetched even if it isn't serialized
+        self.pk: Callable[[tuple], Any] = itemgetter(self._index("id"))
+
+    def queryset(self, queryset: QuerySet) -> QuerySet:
+        """Returns `queryset` projected onto the columns `to_dict` reads."""
+        return queryset.values_list(*self.lookups)
+
+    def _index(self, lookup: str, expression: Optional[Any] = None) -> int:
+        """
+        Returns the position of `lookup` in the fetched rows, adding it (fetched via `expression`, if provided) if
+        it isn't fetched yet.
+        """
+        if lookup not in self._positions:
+            self._positions[lookup] = len(self.lookups)
+            self.lookups.append(lookup if expression is None else expression)
+        return self._positions[lookup]
+
+    def _dict_expression(self, serializer: serializers.ModelSerializer, prefix: str) -> str:
+        """Returns the source of a dict display building `serializer`'s representation from a fetched `row`."""
+        items: list[str] = []
+        expressions: dict[str, Callable[[str], Any]] = getattr(serializer.Meta, "projection_expressions", {})
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*" or "." in field.source:
+                raise TypeError(f"Cannot project {serializer.__class__.__name__}.{name}, source must be a column")
+
+            # nested serializers are joined, the representation is None when the related row is missing
+            if isinstance(field, serializers.BaseSerializer):
+                if not isinstance(field, serializers.ModelSerializer):
+                    raise TypeError(f"Cannot project {serializer.__class__.__name__}.{name}, must be a single record")
+                nested_prefix = f"{prefix}{field.source}__"
+                pk = f"row[{self._index(nested_prefix + field.Meta.model._meta.pk.name)}]"
+                items.append(f"{name!r}: None if {pk} is None else {self._dict_expression(field, nested_prefix)}")
+                continue
+
+            expression = expressions[name](prefix) if name in expressions else None
+            value = f"row[{self._index(prefix + field.source, expression)}]"
+            if not isinstance(field, self.IDENTITY_FIELDS):
+                formatter = f"_format_{len(self._formatters)}"
+                self._formatters[formatter] = field.to_representation
+                value = f"None if {value} is None else {formatter}({value})"
+            items.append(f"{name!r}: {value}")
+        return "{" + ", ".join(items) + "}"
+
+
+@lru_cache(maxsize=256)
+def get_projection(
+    serializer_class: Type[serializers.ModelSerializer], fields: Optional[tuple[str, ...]] = None
+) -> SerializerProjection:
+    """
+    Returns the (compiled once) `SerializerProjection` for `serializer_class`, pruned to `fields` if provided.
+    Field selections come from requests, so the number of compiled projections kept around is bounded.
+    """
+    return SerializerProjection(serializer_class, fields)
@@ -0,0 +1,175 @@
+import json
+from collections.abc import Mapping
+from typing import Any, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Case, F, QuerySet, When
+
+from photos.models import Photograph, PhotographRendering
+from photos.projections import SerializerProjection, get_projection
+from photos.serializers import PhotographSlimSerializer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - declared dependency, the stdlib encoder is only a safety net
+    orjson = None
+
+DEFAULT_RENDERING_SETTINGS = {
+    "ENABLED": False,
+}
+"""Defaults for the `PHOTOS_RENDERINGS` setting (see `backend/settings.py`)."""
+
+RENDERING_BATCH_SIZE = 1000
+"""Number of rows upserted per INSERT statement when storing renderings."""
+
+PAGE_LOOKUPS = ("id", Case(When(rendering__last_updated=F("last_updated"), then=F("rendering__content"))))
+"""
+Columns fetched for a page served from renderings (see `PhotoRenderings.records`): the ID, and the rendering if it
+is current (compared in the query, as decoding the timestamps would cost more than the rest of the row).
+"""
+
+
+def encode(record: dict[str, Any]) -> str:
+    """
+    Encodes `record` as compact, unicode JSON, producing the same text as `api.renderers.FastJSONRenderer` (and
+    DRF's JSONRenderer), so responses read the same whether their records were served from renderings or not.
+    """
+    if orjson is not None:
+        content: str = orjson.dumps(record).decode("utf-8")
+    else:
+        content = json.dumps(record, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    return content.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+class RenderedRecord(Mapping):
+    """
+    A record served from its stored rendering. Renderers splice its `content` into responses as is (see
+    `api.renderers.FastJSONRenderer`), it's only decoded when read as a mapping (e.g. by DRF's encoder).
+    """
+
+    __slots__ = ("content", "_data")
+
+    def __init__(self, content: str):
+        self.content = content
+        self._data: Optional[dict[str, Any]] = None
+
+    @property
+    def data(self) -> dict[str, Any]:
+        if self._data is None:
+            self._data = json.loads(self.content)
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __reduce__(self):
+        # cached pages are pickled by shared cache backends, only the content is worth keeping
+        return RenderedRecord, (self.content,)
+
+    def __repr__(self) -> str:
+        return f"RenderedRecord({self.content!r})"
+
+
+class PhotoRenderings:
+    """
+    Maintains the pre-rendered JSON of each Photograph's list representation (`PhotographSlimSerializer`, with its
+    source) in `PhotographRendering` records, and serves pages of Photograph records from them, so list endpoints
+    skip building a dict per row and renderers skip encoding it. Renderings are refreshed in the transaction of
+    the write that changes the photo or its source (see `photos.signals`), and stamped with the photo's
+    `last_updated`; a rendering that is missing or whose stamp is stale (e.g. after a write that bypassed the
+    receivers) is never served, its record is serialized from its columns instead.
+
+    Renderings only cover the default representation; pages that expand the photographer or select `fields` are
+    always serialized. `rebuild_photo_renderings` and `check_photo_renderings` (see `photos.db`) render existing
+    catalogs and repair drift, e.g. after a SourceTemplate changed the URLs of the sources following it.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.refreshed = self.served = self.fallbacks = 0
+
+    def serves(self, prefetch_photographer: Optional[bool], fields: Optional[tuple[str, ...]]) -> bool:
+        """Returns whether pages read with these options are served from renderings."""
+        return self.enabled and not prefetch_photographer and fields is None
+
+    @property
+    def projection(self) -> SerializerProjection:
+        return get_projection(PhotographSlimSerializer)
+
+    def render(self, queryset: QuerySet) -> list[PhotographRendering]:
+        """Renders the Photograph records of `queryset` from their current columns, in one query."""
+        projection: SerializerProjection = self.projection
+        rows = queryset.order_by().values_list(*projection.lookups, "last_updated")
+        return [
+            PhotographRendering(
+                photograph_id=projection.pk(row), content=encode(projection.to_dict(row)), last_updated=row[-1]
+            )
+            for row in rows
+        ]
+
+    def store(self, renderings: list[PhotographRendering], using: str = DEFAULT_DB_ALIAS):
+        """Inserts `renderings`, replacing the existing renderings of their photos."""
+        PhotographRendering.objects.using(using).bulk_create(
+            renderings,
+            batch_size=RENDERING_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["photograph"],
+            update_fields=["content", "last_updated"],
+        )
+        self.refreshed += len(renderings)
+
+    def refresh(self, photograph_ids: Iterable[int], using: str = DEFAULT_DB_ALIAS):
+        """Re-renders the Photograph records with `photograph_ids` and stores their renderings, if enabled."""
+        if not self.enabled:
+            return
+        renderings = self.render(Photograph.objects.using(using).filter(id__in=list(photograph_ids)))
+        if renderings:
+            self.store(renderings, using)
+
+    def stale_ids(self, rows: list[tuple]) -> list[int]:
+        """Returns the IDs of the rows (fetched via `PAGE_LOOKUPS`) whose rendering is missing or stale."""
+        return [id for id, content in rows if content is None]
+
+    def records(self, rows: list[tuple], fallback_rows: list[tuple]) -> list[Any]:
+        """
+        Returns the records of the rows fetched via `PAGE_LOOKUPS`: their renderings, or for the `stale_ids`, the
+        records serialized from `fallback_rows` (fetched via `projection`). Rows deleted in between are skipped.
+        """
+        projection: SerializerProjection = self.projection
+        fallback: dict[int, dict[str, Any]] = {projection.pk(row): projection.to_dict(row) for row in fallback_rows}
+        records: list[Any] = []
+        for id, content in rows:
+            if content is not None:
+                records.append(RenderedRecord(content))
+            elif id in fallback:
+                records.append(fallback[id])
+        self.served += len(records) - len(fallback)
+        self.fallbacks += len(fallback)
+        return records
+
+    def stats(self) -> dict[str, Any]:
+        """Returns whether renderings are enabled, along with the refresh and serve counters."""
+        served = self.served + self.fallbacks
+        return {
+            "enabled": self.enabled,
+            "refreshed": self.refreshed,
+            "served": self.served,
+            "fallbacks": self.fallbacks,
+            "ratio": round(self.served / served, 4) if served else 0.0,
+        }
+
+
+def _build_photo_renderings() -> PhotoRenderings:
+    """Builds the photo renderings from the `PHOTOS_RENDERINGS` setting."""
+    config = {**DEFAULT_RENDERING_SETTINGS, **getattr(settings, "PHOTOS_RENDERINGS", {})}
+    return PhotoRenderings(enabled=config["ENABLED"])
+
+
+photo_renderings = _build_photo_renderings()
@@ -0,0 +1,185 @@
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest
+
+DEFAULT_REPLICA_SETTINGS = {
+    "ALIASES": [],
+    "STICKY_SECONDS": 5.0,
+    "CACHE_ALIAS": "default",
+}
+"""
+Default replica routing settings, overridden by the `PHOTOS_REPLICAS` setting. `ALIASES` lists the entries in
+`DATABASES` that replicate `default` (none disables routing). After a write, the user's reads are pinned to
+`default` for `STICKY_SECONDS`, which should exceed the replication lag; pins are kept in the `CACHE_ALIAS`
+cache, which should be shared by all workers.
+"""
+
+_PIN_KEY_PREFIX = "photos:primary:"
+
+
+@dataclass
+class RoutingState:
+    """Routing state of the request being handled: the authenticated user, and whether it has written yet."""
+
+    user_id: Optional[int] = None
+    wrote: bool = False
+    pinned: Optional[bool] = None
+
+
+_routing_state: ContextVar[Optional[RoutingState]] = ContextVar("routing_state", default=None)
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+class ReplicaRouting:
+    """
+    Sends the reads of functions decorated with `reads_from_replica` to one of the replica `aliases`, unless the
+    current user wrote within the last `sticky_seconds` (read-your-writes), the current request already wrote,
+    or a transaction is open on `default`. Everything else, writes included, goes to `default`.
+    """
+
+    def __init__(self, aliases: list[str], sticky_seconds: float, cache_alias: str):
+        self.aliases = list(aliases)
+        self.sticky_seconds = sticky_seconds
+        self.cache_alias = cache_alias
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.aliases)
+
+    def db_for_read(self) -> Optional[str]:
+        """Returns the replica alias the current read should use, or `None` for `default`."""
+        if not self.enabled or not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        state = _routing_state.get()
+        if state is not None and self._pinned(state):
+            return None
+        return random.choice(self.aliases)
+
+    def record_write(self):
+        """Pins the current request, and its user for `sticky_seconds`, to `default`."""
+        state = _routing_state.get()
+        if not self.enabled or state is None or state.wrote:
+            return
+        state.wrote = state.pinned = True
+        if state.user_id is not None:
+            caches[self.cache_alias].set(_PIN_KEY_PREFIX + str(state.user_id), True, timeout=self.sticky_seconds)
+
+    def set_user(self, user_id: Optional[int]):
+        """Records the user the current request was authenticated as."""
+        state = _routing_state.get()
+        if state is not None:
+            state.user_id = user_id
+
+    def lagging(self, since: float) -> bool:
+        """
+        Whether a read in the current context may come from a replica that hasn't caught up with a write made at
+        `since` (a `time.time()` timestamp), i.e. reads go to a replica and the write is within `sticky_seconds`.
+        """
+        return time.time() - since < self.sticky_seconds and self.db_for_read() is not None
+
+    def _pinned(self, state: RoutingState) -> bool:
+        if state.pinned is None:
+            # looked up once per request, on its first replica read
+            state.pinned = state.user_id is not None and bool(
+                caches[self.cache_alias].get(_PIN_KEY_PREFIX + str(state.user_id))
+            )
+        return state.pinned
+
+
+def reads_from_replica(func):
+    """Lets the reads of the decorated function (sync or async) go to a replica (see `ReplicaRouting`)."""
+    if iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Database router (see `DATABASE_ROUTERS`) delegating to `replica_routing`."""
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        return replica_routing.db_for_read()
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        replica_routing.record_write()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *replica_routing.aliases}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None, **hints) -> Optional[bool]:
+        # replicas receive the schema through replication
+        return False if db in replica_routing.aliases else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Scopes the `ReplicaRouting` state (user and writes) to each request. The user is recorded once authenticated,
+    by `api.views.ProtectedView` / `api.async_views.AsyncProtectedView`. Supports both WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _routing_state.set(RoutingState())
+        try:
+            return self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+    async def __acall__(self, request: HttpRequest):
+        token = _routing_state.set(RoutingState())
+        try:
+            return await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+
+def _build_replica_routing() -> ReplicaRouting:
+    """Builds the module level routing from the `PHOTOS_REPLICAS` setting."""
+    config = {**DEFAULT_REPLICA_SETTINGS, **getattr(settings, "PHOTOS_REPLICAS", {})}
+    return ReplicaRouting(
+        aliases=config["ALIASES"], sticky_seconds=config["STICKY_SECONDS"], cache_alias=config["CACHE_ALIAS"]
+    )
+
+
+replica_routing = _build_replica_routing()
@@ -1,8 +1,53 @@
+from functools import partial
+from typing import Iterable, Iterator, Optional, Type
+
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from django.db import transaction
 
-from .models import Photograph, Photographer, PhotoSource
+from .models import SOURCE_VARIANTS, Photograph, Photographer, PhotoSource
+from .source_templates import source_url_expression
+
+
+def prune_fields(serializer: serializers.Serializer, paths: Iterable[str]):
+    """
+    Removes every field of `serializer` not named in `paths`. Nested serializer fields are pruned as well via
+    dotted paths (e.g. `source.tiny`), naming a nested serializer field itself (e.g. `source`) keeps it whole.
+    """
+    keep: dict[str, list[str]] = {}
+    for path in paths:
+        name, _, rest = path.partition(".")
+        keep.setdefault(name, []).append(rest)
+    for name in list(serializer.fields):
+        if name not in keep:
+            serializer.fields.pop(name)
+        elif "" not in keep[name]:
+            prune_fields(serializer.fields[name], keep[name])
+
+
+def get_field_paths(serializer_class: Type[serializers.Serializer]) -> list[str]:
+    """Returns the path of every readable field of `serializer_class` that `prune_fields` accepts."""
+
+    def paths(serializer: serializers.Serializer, prefix: str) -> Iterator[str]:
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            yield prefix + name
+            if isinstance(field, serializers.Serializer):
+                yield from paths(field, f"{prefix}{name}.")
+
+    return list(paths(serializer_class(), ""))
+
+
+class PrunableFieldsMixin:
+    """
+    Lets callers limit a serializer's representation to some of its fields, by passing `fields` (a list of field
+    paths, see `prune_fields`). All fields are kept if `fields` is None.
+    """
+
+    def __init__(self, *args, fields: Optional[Iterable[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            prune_fields(self, fields)
 
 
 class UserPublicSerializer(serializers.ModelSerializer):
@@ -14,7 +59,10 @@ class UserPublicSerializer(serializers.ModelSerializer):
 
 
 class PhotoSourceSerializer(serializers.ModelSerializer):
-    """Serializer for a PhotoSource model."""
+    """
+    Serializer for a PhotoSource model. Variant URLs of compact rows are rebuilt from their template, so records
+    must be read via a projection (see `photos.projections`), or expanded first (see `photos.source_templates`).
+    """
 
     class Meta:
         model = PhotoSource
@@ -29,17 +77,19 @@ class PhotoSourceSerializer(serializers.ModelSerializer):
             "portrait",
             "landscape",
         )
+        projection_expressions = {variant: partial(source_url_expression, variant) for variant in SOURCE_VARIANTS}
 
 
-class PhotographSlimSerializer(serializers.ModelSerializer):
+class PhotographSlimSerializer(PrunableFieldsMixin, serializers.ModelSerializer):
     """
     Serializer (slim) for a Photograph model that omits the Photographer field.
     Fetches the related `source` field for PhotoSource info.
     """
 
-    # Link in nested `source` field as writable (and not required)
+    # Link in nested `source` field (writes skip the serializers, see `validate_photograph` / `photos.db`)
     source = PhotoSourceSerializer(required=False)
-    photographer_id = serializers.IntegerField(source="photographer.id", read_only=True)
+    # read the FK column directly so the related Photographer is never loaded just for its ID
+    photographer_id = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Photograph
@@ -55,7 +105,7 @@ class PhotographSlimSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "date_created", "last_updated", "photographer_id")
 
 
-class PhotographerSerializer(serializers.ModelSerializer):
+class PhotographerSerializer(PrunableFieldsMixin, serializers.ModelSerializer):
     """
     Serializer (limited) for a Photographer model that omits the photographs field.
     Fetches the related `user` field for the parent User data.
@@ -65,15 +115,14 @@ class PhotographerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Photographer
-        fields = ["id", "user", "date_created", "last_updated"]
+        fields = ["id", "user", "photo_count", "latest_photo_date", "date_created", "last_updated"]
 
 
 class PhotographSerializer(PhotographSlimSerializer):
     """
     Serializer for a Photograph model that extends the `PhotographSlimSerializer`.
     Adds an additional fetch for the related `photographer` field to include the
-    link to Photographer information. Also auto-creates PhotoSource record if
-    created Photograph data includes source info.
+    link to Photographer information.
     """
 
     photographer = PhotographerSerializer(read_only=True)
@@ -83,32 +132,3 @@ class PhotographSerializer(PhotographSlimSerializer):
         fields = PhotographSlimSerializer.Meta.fields + [
             "photographer",
         ]
-
-    def create(self, validated_data):
-        # check for optional `source` data and auto-create PhotoSource record if defined
-        source_data = validated_data.pop("source", None)
-        photo = Photograph.objects.create(**validated_data)
-        if source_data:
-            PhotoSource.objects.create(photograph=photo, **source_data)
-        return photo
-
-    @transaction.atomic
-    def update(self, instance, validated_data):
-        # pull nested 'source' off the validated data
-        source_data = validated_data.pop("source", None)
-
-        # update Photograph fields in general
-        for attr, val in validated_data.items():
-            setattr(instance, attr, val)
-        instance.save()
-
-        # create/update PhotoSource data, if included
-        if source_data is not None:
-            if src := getattr(instance, "source", None):
-                for attr, val in source_data.items():
-                    setattr(src, attr, val)
-                src.save()
-            else:
-                PhotoSource.objects.create(photograph=instance, **source_data)
-
-        return instance
@@ -1,16 +1,35 @@
-from typing import TYPE_CHECKING
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
 
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Case, DateTimeField, F, IntegerField, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
 
-from photos.models import Photographer
+from photos.cache import photo_cache
+from photos.color_index import color_index
+from photos.events import PHOTO_CREATED, PHOTO_UPDATED, photo_event, photo_events
+from photos.models import Photograph, Photographer, PhotoSource, Tombstone
+from photos.renderings import photo_renderings
+from photos.serializers import UserPublicSerializer
+from photos.timing import time_queries
 
 if TYPE_CHECKING:
     from photos.models import User
 
 UserModel = get_user_model()
 
+photographs_bulk_created = Signal()
+"""
+Sent with the created `photographs` after Photograph records (and their PhotoSources) are inserted via
+`bulk_create`, which doesn't send `post_save`. Receivers of Photograph `post_save` should handle this as well.
+"""
+
 
 def _ensure_photographer_record(user_record: "User") -> Photographer:
     """Ensures a Photographer record is tied to provided User."""
@@ -21,6 +40,16 @@ def _ensure_photographer_record(user_record: "User") -> Photographer:
     return photographer
 
 
+def _invalidate_cache(*tags: str):
+    """
+    Invalidates cached read payloads (see `photos.db.cached`) tagged with any of the provided `tags`.
+    Invalidates immediately and again once the transaction commits, so a read that repopulates the cache
+    with not yet committed data in between is discarded as well.
+    """
+    photo_cache.invalidate(*tags)
+    transaction.on_commit(lambda: photo_cache.invalidate(*tags))
+
+
 @receiver(post_save, sender=UserModel)
 def on_user_created(sender, instance: "User", created: bool, **kwargs):
     """Custom post_save hook for User model, used to ensure Photographer records exist and are tied to users."""
@@ -29,3 +58,296 @@ def on_user_created(sender, instance: "User", created: bool, **kwargs):
 
     # ensure a photographer record exists for this user
     _ensure_photographer_record(instance)
+
+
+@receiver(post_save, sender=UserModel)
+def on_user_updated(sender, instance: "User", created: bool, update_fields=None, **kwargs):
+    """
+    Bumps `last_updated` on the Photographer records nesting the updated User, so conditional GET validators
+    and cached payloads pick up the change. Saves that only touch fields outside the public User payload
+    (e.g. `last_login`) are skipped.
+    """
+    if created or (update_fields and set(update_fields).isdisjoint(UserPublicSerializer.Meta.fields)):
+        return
+    photographer_ids = list(Photographer.objects.filter(user=instance).values_list("id", flat=True))
+    Photographer.objects.filter(id__in=photographer_ids).update(last_updated=timezone.now())
+    _invalidate_cache(f"user:{instance.id}", "photographers", *(f"photographer:{id}" for id in photographer_ids))
+
+
+@receiver(post_delete, sender=UserModel)
+def on_user_deleted(sender, instance: "User", **kwargs):
+    """Invalidates cached Photographer payloads that nest the deleted User."""
+    _invalidate_cache(f"user:{instance.id}", "photographers")
+
+
+@receiver(post_save, sender=Photographer)
+@receiver(post_delete, sender=Photographer)
+def on_photographer_changed(sender, instance: Photographer, **kwargs):
+    """Invalidates cached payloads for the changed Photographer, including full Photograph payloads nesting it."""
+    _invalidate_cache(f"photographer:{instance.id}", "photographers")
+
+
+@receiver(post_save, sender=Photograph)
+@receiver(post_delete, sender=Photograph)
+def on_photograph_changed(sender, instance: Photograph, **kwargs):
+    """Invalidates cached payloads for the changed Photograph and the photo lists that may include it."""
+    _invalidate_cache(f"photo:{instance.id}", "photos", f"photographer:{instance.photographer_id}:photos")
+
+
+@receiver(photographs_bulk_created)
+def on_photographs_bulk_created(sender, photographs: list[Photograph], **kwargs):
+    """Invalidates cached photo lists that may include the created Photographs."""
+    _invalidate_cache("photos", *{f"photographer:{photo.photographer_id}:photos" for photo in photographs})
+
+
+class _DeleteBatch(threading.local):
+    """
+    The Photographs and Photographers being deleted by the current `delete()` call of this thread (including the
+    ones it cascades to), collected from their `pre_delete` signals, which are all sent before any row is deleted.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, origin: Any = None):
+        self.origin = origin
+        self.photos: dict[int, Photograph] = {}
+        self.photographer_ids: set[int] = set()
+
+
+_delete_batch = _DeleteBatch()
+
+
+@receiver(pre_delete, sender=Photograph)
+@receiver(pre_delete, sender=Photographer)
+def on_record_deleting(sender, instance: Photograph | Photographer, origin: Any = None, **kwargs):
+    """Collects the Photograph or Photographer about to be deleted, see `on_records_deleted`."""
+    if _delete_batch.origin is not origin:
+        # a new `delete()` call (dropping whatever a failed one left behind)
+        _delete_batch.reset(origin)
+    if sender is Photograph:
+        _delete_batch.photos[instance.id] = instance
+    else:
+        _delete_batch.photographer_ids.add(instance.id)
+
+
+@receiver(post_delete, sender=Photograph)
+@receiver(post_delete, sender=Photographer)
+def on_records_deleted(sender, instance: Photograph | Photographer, using: str, origin: Any = None, **kwargs):
+    """
+    Handles every Photograph and Photographer deleted by a `delete()` call at once, along with the first
+    `post_delete` signal of the call (rows are deleted before any of their signals is sent, dependents first):
+    records their tombstones, so the change feed reports the deletes, and uncounts the deleted Photographs from
+    the stats of their Photographers (unless deleted as well), in a single statement each.
+    """
+    batch = _delete_batch
+    if batch.origin is not origin or not (batch.photos or batch.photographer_ids):
+        # handled along with the first row of the call
+        return
+    photos, photographer_ids = batch.photos, batch.photographer_ids
+    batch.reset()
+    Tombstone.objects.using(using).bulk_create(
+        [
+            *(Tombstone(kind=Tombstone.PHOTOGRAPH, record_id=id) for id in photos),
+            *(Tombstone(kind=Tombstone.PHOTOGRAPHER, record_id=id) for id in photographer_ids),
+        ]
+    )
+
+    stats: dict[int, tuple[int, Any]] = {}
+    for photo in photos.values():
+        if photo.photographer_id not in photographer_ids:
+            count, latest = stats.get(photo.photographer_id, (0, photo.date_created))
+            stats[photo.photographer_id] = (count + 1, max(latest, photo.date_created))
+    if stats:
+        _remove_photo_stats(stats, using)
+
+
+@receiver(post_save, sender=Photograph)
+def on_photograph_created_stats(sender, instance: Photograph, created: bool, **kwargs):
+    """
+    Counts the created Photograph in its Photographer's `photo_count` / `latest_photo_date`, updated in place by a
+    single UPDATE so concurrent creates never lose a count. Reassigning a photo to another photographer isn't
+    tracked, `reconcile_photographer_stats` repairs that.
+    """
+    if not created:
+        return
+    last_updated = _add_photo_stats({instance.photographer_id: (1, instance.date_created)})
+
+    # keep a loaded Photographer (e.g. nested in the response to the create) in step with its row
+    if Photograph.photographer.is_cached(instance):
+        photographer: Photographer = instance.photographer
+        photographer.photo_count += 1
+        photographer.latest_photo_date = max(filter(None, (photographer.latest_photo_date, instance.date_created)))
+        photographer.last_updated = last_updated
+
+
+@receiver(photographs_bulk_created)
+def on_photographs_bulk_created_stats(sender, photographs: list[Photograph], **kwargs):
+    """Counts the created Photographs in their Photographers' stats, in a single UPDATE."""
+    stats: dict[int, tuple[int, Any]] = {}
+    for photo in photographs:
+        count, latest = stats.get(photo.photographer_id, (0, photo.date_created))
+        stats[photo.photographer_id] = (count + 1, max(latest, photo.date_created))
+    if stats:
+        _add_photo_stats(stats)
+
+
+def _add_photo_stats(stats: dict[int, tuple[int, Any]]) -> datetime:
+    """
+    Adds `(count, latest date_created)` of new photos to the stats of each Photographer ID in `stats`, relative to
+    the stored values (via F-expressions), and invalidates their cached payloads. Returns the `last_updated` set.
+    """
+    last_updated = timezone.now()
+    count = Case(*(When(id=id, then=Value(n)) for id, (n, _) in stats.items()), output_field=IntegerField())
+    latest = Case(*(When(id=id, then=Value(date)) for id, (_, date) in stats.items()), output_field=DateTimeField())
+    Photographer.objects.filter(id__in=stats).update(
+        photo_count=F("photo_count") + count,
+        latest_photo_date=Greatest(Coalesce("latest_photo_date", latest), latest),
+        last_updated=last_updated,
+    )
+    _invalidate_cache("photographers", *(f"photographer:{id}" for id in stats))
+    return last_updated
+
+
+def _remove_photo_stats(stats: dict[int, tuple[int, Any]], using: str):
+    """
+    Removes `(count, latest date_created)` of deleted photos from the stats of each Photographer ID in `stats`, in a
+    single UPDATE that only recomputes `latest_photo_date` for the Photographers whose latest photo was deleted, and
+    invalidates their cached payloads.
+    """
+    count = Case(*(When(id=id, then=Value(n)) for id, (n, _) in stats.items()), output_field=IntegerField())
+    latest = Case(*(When(id=id, then=Value(date)) for id, (_, date) in stats.items()), output_field=DateTimeField())
+    latest_photo_date = Subquery(
+        Photograph.objects.filter(photographer_id=OuterRef("id"))
+        .order_by()
+        .values("photographer_id")
+        .annotate(latest=Max("date_created"))
+        .values("latest")
+    )
+    Photographer.objects.using(using).filter(id__in=stats).update(
+        photo_count=Greatest(F("photo_count") - count, 0),
+        latest_photo_date=Case(
+            When(latest_photo_date__gt=latest, then=F("latest_photo_date")), default=latest_photo_date
+        ),
+        last_updated=timezone.now(),
+    )
+    _invalidate_cache("photographers", *(f"photographer:{id}" for id in stats))
+
+
+@receiver(post_save, sender=Photograph)
+def on_photograph_color_saved(sender, instance: Photograph, **kwargs):
+    """Updates the color of the saved Photograph in the nearest-color index, once the transaction commits."""
+    id, lab = instance.id, instance.color_lab
+    transaction.on_commit(lambda: color_index.update(id, lab))
+
+
+@receiver(post_delete, sender=Photograph)
+def on_photograph_color_deleted(sender, instance: Photograph, **kwargs):
+    """Removes the deleted Photograph from the nearest-color index, once the transaction commits."""
+    id = instance.id
+    transaction.on_commit(lambda: color_index.remove(id))
+
+
+@receiver(photographs_bulk_created)
+def on_photographs_bulk_created_colors(sender, photographs: list[Photograph], **kwargs):
+    """Adds the created Photographs to the nearest-color index, once the transaction commits."""
+    colors = [(photo.id, photo.color_lab) for photo in photographs if photo.color_lab]
+    transaction.on_commit(lambda: [color_index.update(id, lab) for id, lab in colors])
+
+
+@receiver(post_save, sender=Photograph)
+def on_photograph_saved_event(sender, instance: Photograph, created: bool, using: str, **kwargs):
+    """Publishes the created or updated Photograph to live event subscribers, once the transaction commits."""
+    type = PHOTO_CREATED if created else PHOTO_UPDATED
+    photo_events.publish([photo_event(type, instance.id, instance.photographer_id)], using=using)
+
+
+@receiver(photographs_bulk_created)
+def on_photographs_bulk_created_events(sender, photographs: list[Photograph], **kwargs):
+    """Publishes the created Photographs to live event subscribers, in one batch once the transaction commits."""
+    photo_events.publish([photo_event(PHOTO_CREATED, photo.id, photo.photographer_id) for photo in photographs])
+
+
+@receiver(post_save, sender=Photograph)
+def on_photograph_created_source_pending(sender, instance: Photograph, created: bool, using: str, **kwargs):
+    """
+    Flags a created Photograph until its transaction commits, so the PhotoSource created along with it (see
+    `serialize_and_save_photograph`) isn't taken for an update of the photo by `on_photo_source_changed`.
+    """
+    if created:
+        instance._source_pending = True
+        transaction.on_commit(lambda: instance.__dict__.pop("_source_pending", None), using=using)
+
+
+@receiver(post_save, sender=PhotoSource)
+@receiver(post_delete, sender=PhotoSource)
+def on_photo_source_changed(
+    sender, instance: PhotoSource, using: str, created: bool = False, origin: Any = None, **kwargs
+):
+    """
+    Bumps `last_updated` on the Photograph nesting the changed PhotoSource, so conditional GET validators
+    pick up the change, invalidates its cached payloads and publishes the update to live event subscribers.
+    Skipped when the PhotoSource is deleted along with its Photograph, or created in the transaction that created
+    its Photograph, whose own receivers cover it.
+    """
+    if _is_cascading_delete(origin) or (created and _is_created_with_photograph(instance)):
+        return
+    Photograph.objects.filter(id=instance.photograph_id).update(last_updated=timezone.now())
+    tags = [f"photo:{instance.photograph_id}", "photos"]
+
+    # the serializer paths always have the Photograph loaded, only look up its Photographer when it is not
+    if PhotoSource.photograph.is_cached(instance):
+        photographer_id = instance.photograph.photographer_id
+    else:
+        photographer_id = (
+            Photograph.objects.filter(id=instance.photograph_id).values_list("photographer_id", flat=True).first()
+        )
+    if photographer_id:
+        tags.append(f"photographer:{photographer_id}:photos")
+        photo_events.publish([photo_event(PHOTO_UPDATED, instance.photograph_id, photographer_id)], using=using)
+    _invalidate_cache(*tags)
+
+
+def _is_created_with_photograph(source: PhotoSource) -> bool:
+    """Returns whether the created `source` belongs to a Photograph created in the same transaction."""
+    return PhotoSource.photograph.is_cached(source) and getattr(source.photograph, "_source_pending", False)
+
+
+def _is_cascading_delete(origin: Any) -> bool:
+    """Returns whether a PhotoSource signal with `origin` comes from deleting its Photograph (or Photographer)."""
+    # saves have no origin, deletes cascading from a Photograph (or its Photographer) have theirs
+    return not (origin is None or isinstance(origin, PhotoSource) or getattr(origin, "model", None) is PhotoSource)
+
+
+@receiver(post_save, sender=Photograph)
+def on_photograph_saved_rendering(sender, instance: Photograph, created: bool, using: str, **kwargs):
+    """
+    Refreshes the stored rendering of the updated Photograph (see `photos.renderings`), in the same transaction.
+    Created photos are rendered once their PhotoSource is saved.
+    """
+    if not created:
+        photo_renderings.refresh([instance.id], using=using)
+
+
+@receiver(photographs_bulk_created)
+def on_photographs_bulk_created_renderings(sender, photographs: list[Photograph], **kwargs):
+    """Stores the renderings of the created Photographs (along with their PhotoSources), in one batch."""
+    photo_renderings.refresh([photo.id for photo in photographs])
+
+
+@receiver(post_save, sender=PhotoSource)
+@receiver(post_delete, sender=PhotoSource)
+def on_photo_source_changed_rendering(sender, instance: PhotoSource, using: str, origin: Any = None, **kwargs):
+    """
+    Refreshes the stored rendering of the Photograph nesting the changed PhotoSource, once its `last_updated` is
+    bumped by `on_photo_source_changed` (unless the PhotoSource is deleted along with its Photograph).
+    """
+    if not _is_cascading_delete(origin):
+        photo_renderings.refresh([instance.photograph_id], using=using)
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+    """Times the queries of timed requests (see `photos.timing`) on every connection, including reconnects."""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
@@ -0,0 +1,235 @@
+import hashlib
+import threading
+import time
+from typing import Any, Iterable, Optional, Type
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import CharField, F, Func
+from django.db.models.functions import Coalesce
+
+from photos.models import SOURCE_VARIANTS, PhotoSource, SourceTemplate
+
+DEFAULT_SOURCE_TEMPLATE_SETTINGS = {
+    "COMPACT": True,
+    "TTL": 300,
+}
+"""Defaults for the `PHOTOS_SOURCE_TEMPLATES` setting (see `backend/settings.py`)."""
+
+SUFFIX_MAX_LENGTH = 255
+"""Maximum length of a template suffix (see `SourceTemplate`)."""
+
+CONVERT_BATCH_SIZE = 1000
+"""Number of PhotoSource rows converted (and committed) per batch by `convert_sources`."""
+
+
+def get_variant_suffixes(fields: dict[str, Any]) -> Optional[tuple[str, ...]]:
+    """
+    Returns the suffix each variant URL in `fields` adds to the `original` URL (in `SOURCE_VARIANTS` order), or
+    None if any variant is missing or isn't `original` followed by a suffix a template can hold.
+    """
+    original: Optional[str] = fields.get("original")
+    if not original:
+        return None
+    suffixes: list[str] = []
+    for variant in SOURCE_VARIANTS:
+        url: Optional[str] = fields.get(variant)
+        if url is None or not url.startswith(original) or len(url) - len(original) > SUFFIX_MAX_LENGTH:
+            return None
+        suffixes.append(url[len(original) :])
+    return tuple(suffixes)
+
+
+def get_template_name(original: str, suffixes: tuple[str, ...]) -> str:
+    """Returns a (deterministic) name for the template of `suffixes`, first seen with the `original` URL."""
+    digest = hashlib.sha1("\n".join(suffixes).encode("utf-8")).hexdigest()[:10]
+    return f"{urlsplit(original).hostname or 'photos'}-{digest}"
+
+
+class _JoinStrings(Func):
+    # `a || b`, unlike `Concat` (which treats nulls as empty strings), null if any part is null
+    arg_joiner = " || "
+    template = "(%(expressions)s)"
+    output_field = CharField()
+
+
+def source_url_expression(variant: str, prefix: str = "") -> Coalesce:
+    """
+    Returns an expression reading the `variant` URL of the PhotoSource at `prefix` (e.g. `source__`): the stored
+    URL, or for compact rows, `original` followed by the template's suffix.
+    """
+    return Coalesce(
+        F(f"{prefix}{variant}"),
+        _JoinStrings(F(f"{prefix}original"), F(f"{prefix}template__{variant}")),
+        output_field=CharField(),
+    )
+
+
+def convert_sources(
+    photo_source_model: Type[models.Model],
+    template_model: Type[models.Model],
+    compact: bool = True,
+    using: str = DEFAULT_DB_ALIAS,
+    batch_size: int = CONVERT_BATCH_SIZE,
+    min_rows: int = 2,
+) -> int:
+    """
+    Converts existing PhotoSource rows to compact storage, first creating templates for every set of suffixes
+    shared by at least `min_rows` rows (if `compact`), or back to explicit URLs (if not), walking the primary key
+    in batches that each commit on their own. Takes the models, so callers can pass historical models (migration
+    `0006` runs a frozen copy of it). Returns the number of rows converted.
+    """
+    sources = photo_source_model.objects.using(using).order_by("id")
+    if not compact:
+        converted = 0
+        queryset = sources.filter(template__isnull=False).select_related("template")
+        while batch := list(queryset[:batch_size]):
+            for source in batch:
+                for variant in SOURCE_VARIANTS:
+                    if getattr(source, variant) is None:
+                        setattr(source, variant, source.original + getattr(source.template, variant))
+                source.template = None
+            with transaction.atomic(using=using):
+                photo_source_model.objects.using(using).bulk_update(batch, [*SOURCE_VARIANTS, "template"])
+            converted += len(batch)
+        return converted
+
+    # count the rows sharing each set of suffixes, creating templates for the common ones
+    counts: dict[tuple[str, ...], int] = {}
+    originals: dict[tuple[str, ...], str] = {}
+    fields = ["id", "original", *SOURCE_VARIANTS]
+    last_id = 0
+    while batch := list(sources.filter(id__gt=last_id, template__isnull=True).values(*fields)[:batch_size]):
+        for row in batch:
+            if suffixes := get_variant_suffixes(row):
+                counts[suffixes] = counts.get(suffixes, 0) + 1
+                originals.setdefault(suffixes, row["original"])
+        last_id = batch[-1]["id"]
+    template_model.objects.using(using).bulk_create(
+        [
+            template_model(
+                name=get_template_name(originals[suffixes], suffixes), **dict(zip(SOURCE_VARIANTS, suffixes))
+            )
+            for suffixes, count in counts.items()
+            if count >= min_rows
+        ],
+        ignore_conflicts=True,
+    )
+    templates: dict[tuple[str, ...], int] = {
+        tuple(row[1:]): row[0] for row in template_model.objects.using(using).values_list("id", *SOURCE_VARIANTS)
+    }
+
+    # then point the rows at their template, dropping the URLs it rebuilds
+    converted = 0
+    last_id = 0
+    while batch := list(sources.filter(id__gt=last_id, template__isnull=True).only(*fields)[:batch_size]):
+        compacted = []
+        for source in batch:
+            suffixes = get_variant_suffixes({field: getattr(source, field) for field in fields})
+            if suffixes in templates:
+                source.template_id = templates[suffixes]
+                for variant in SOURCE_VARIANTS:
+                    setattr(source, variant, None)
+                compacted.append(source)
+        with transaction.atomic(using=using):
+            photo_source_model.objects.using(using).bulk_update(compacted, [*SOURCE_VARIANTS, "template"])
+        converted += len(compacted)
+        last_id = batch[-1].id
+    return converted
+
+
+class SourceTemplates:
+    """
+    In-process copy of the (small, append only) SourceTemplate table, used to store PhotoSource URLs compactly
+    (if `compact` is enabled) and to rebuild them. It's reloaded every `ttl` seconds, and whenever a template it
+    doesn't know is referenced. URLs that match no known template are simply stored as they are.
+    """
+
+    def __init__(self, compact: bool = True, ttl: float = 300):
+        self.compact_enabled = compact
+        self.ttl = ttl
+        self._by_suffixes: dict[tuple[str, ...], int] = {}
+        self._by_id: dict[int, tuple[str, ...]] = {}
+        self._expires_at: float = 0.0
+        self._lock = threading.Lock()
+
+    def compact(self, fields: dict[str, Any]) -> dict[str, Any]:
+        """
+        Returns the PhotoSource kwargs storing the URLs in `fields`: only `original` and the template, if the
+        variants follow a known template, the URLs as they are otherwise.
+        """
+        suffixes = get_variant_suffixes(fields) if self.compact_enabled else None
+        template_id: Optional[int] = self._get_by_suffixes(suffixes) if suffixes else None
+        if template_id is None:
+            return {**fields, "template_id": None}
+        return {**fields, **dict.fromkeys(SOURCE_VARIANTS), "template_id": template_id}
+
+    def expand(self, source: PhotoSource) -> dict[str, Any]:
+        """Returns the URLs of `source`, rebuilding the variants a compact row doesn't store."""
+        fields: dict[str, Any] = {field: getattr(source, field) for field in ("original", *SOURCE_VARIANTS)}
+        if source.template_id is not None:
+            for variant, suffix in zip(SOURCE_VARIANTS, self._get_by_id(source.template_id)):
+                if fields[variant] is None:
+                    fields[variant] = fields["original"] + suffix
+        return fields
+
+    def ensure(self, sources: Iterable[dict[str, Any]]):
+        """
+        Creates a template for every set of variant suffixes in `sources` (PhotoSource URL dicts) that has none
+        yet, e.g. before seeding a catalog from data known to follow a few templates.
+        """
+        self._load_if_expired()
+        missing: dict[tuple[str, ...], str] = {}
+        for fields in sources:
+            if (suffixes := get_variant_suffixes(fields)) and suffixes not in self._by_suffixes:
+                missing.setdefault(suffixes, fields["original"])
+        if not missing:
+            return
+        SourceTemplate.objects.bulk_create(
+            [
+                SourceTemplate(name=get_template_name(original, suffixes), **dict(zip(SOURCE_VARIANTS, suffixes)))
+                for suffixes, original in missing.items()
+            ],
+            ignore_conflicts=True,
+        )
+        self._load()
+
+    def clear(self):
+        """Drops the loaded templates, so they're reloaded on next use."""
+        with self._lock:
+            self._by_suffixes, self._by_id, self._expires_at = {}, {}, 0.0
+
+    def _get_by_suffixes(self, suffixes: tuple[str, ...]) -> Optional[int]:
+        self._load_if_expired()
+        return self._by_suffixes.get(suffixes)
+
+    def _get_by_id(self, template_id: int) -> tuple[str, ...]:
+        self._load_if_expired()
+        if template_id not in self._by_id:
+            # created since the last load (templates are never deleted while referenced)
+            self._load()
+        return self._by_id[template_id]
+
+    def _load_if_expired(self):
+        if time.monotonic() >= self._expires_at:
+            self._load()
+
+    def _load(self):
+        by_id: dict[int, tuple[str, ...]] = {
+            row[0]: tuple(row[1:]) for row in SourceTemplate.objects.values_list("id", *SOURCE_VARIANTS)
+        }
+        with self._lock:
+            self._by_id = by_id
+            self._by_suffixes = {suffixes: template_id for template_id, suffixes in by_id.items()}
+            self._expires_at = time.monotonic() + self.ttl
+
+
+def _build_source_templates() -> SourceTemplates:
+    """Builds the module level templates from the `PHOTOS_SOURCE_TEMPLATES` setting."""
+    config = {**DEFAULT_SOURCE_TEMPLATE_SETTINGS, **getattr(settings, "PHOTOS_SOURCE_TEMPLATES", {})}
+    return SourceTemplates(compact=config["COMPACT"], ttl=config["TTL"])
+
+
+source_templates = _build_source_templates()
+"""Templates shared by the write functions in `photos.db`."""
@@ -1,3 +1,1013 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import pickle
+import threading
+import time
+from io import StringIO
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpRequest
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from photos.cache import PhotoCache, _build_photo_cache, photo_cache
+from photos.coalescing import SingleFlight, single_flight
+from photos.color_index import color_index
+from photos.colors import hex_to_lab
+from photos.db import (
+    DbResult,
+    aget_photographs,
+    bulk_create_photographs,
+    check_photo_renderings,
+    get_changes,
+    get_photograph,
+    get_photograph_validators,
+    get_photographer,
+    get_photographer_validators,
+    get_photographers,
+    get_photographs,
+    get_photographs_by_color,
+    get_photographs_validators,
+    rebuild_photo_renderings,
+    reconcile_photographer_stats,
+    search_photographs,
+    serialize_and_save_photograph,
+    update_photograph,
+)
+from photos.events import PHOTO_CREATED, PHOTO_UPDATED, PhotoEvents, photo_event, photo_events
+from photos.models import (
+    PHOTO_URL_MAX_LENGTH,
+    SOURCE_VARIANTS,
+    Photograph,
+    Photographer,
+    PhotographRendering,
+    PhotoSource,
+    SourceTemplate,
+    Tombstone,
+)
+from photos.pagination import (
+    InvalidCursor,
+    decode_changes_cursor,
+    decode_id_cursor,
+    decode_rank_cursor,
+    encode_changes_cursor,
+    encode_cursor,
+)
+from photos.projections import get_projection
+from photos.renderings import RenderedRecord, photo_renderings
+from photos.routers import ReplicaRouter, ReplicaRoutingMiddleware, reads_from_replica, replica_routing
+from photos.serializers import PhotographerSerializer, PhotographSerializer, PhotographSlimSerializer
+from photos.source_templates import convert_sources, source_templates
+from photos.validators import (
+    validate_color_params,
+    validate_page_params,
+    validate_photograph,
+    validate_photograph_fields_params,
+    validate_search_params,
+)
+
+UserModel = get_user_model()
+
+
+def create_photographer(n: int) -> Photographer:
+    """Creates a User (and its auto-created Photographer record) for test `n`."""
+    user = UserModel.objects.create_user(username=f"user.{n}", email=f"user.{n}@example.com")
+    return Photographer.objects.get(user=user)
+
+
+def create_photograph(n: int, photographer: Photographer) -> Photograph:
+    """Creates a Photograph (with PhotoSource) for test `n`."""
+    url = f"https://images.example.com/photos/{n}.jpeg"
+    photo = Photograph.objects.create(
+        title=f"photo {n}", url=url, avg_color="#333831", alt_text=f"alt {n}", photographer=photographer
+    )
+    PhotoSource.objects.create(photograph=photo, original=url, tiny=f"{url}?h=200&w=280")
+    return photo
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographers = [create_photographer(n) for n in range(3)]
+        cls.photos = [create_photograph(n, cls.photographers[n % 2]) for n in range(7)]
+
+    def setUp(self):
+        photo_cache.clear()
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_id_cursor(encode_cursor(42)), 42)
+
+    def test_invalid_cursor_fails_validation(self):
+        for token in ("not-a-cursor", encode_cursor("42"), encode_cursor(1, 2)):
+            self.assertFalse(validate_page_params({"after": token}).success)
+        self.assertFalse(validate_page_params({"after": encode_cursor(1), "before": encode_cursor(2)}).success)
+        self.assertFalse(validate_page_params({"limit": "0"}).success)
+
+    def test_pages_forward_and_back(self):
+        ids = [p.id for p in self.photos]
+
+        first = get_photographs(limit=3).result
+        self.assertEqual([p["id"] for p in first["results"]], ids[:3])
+        self.assertIsNone(first["prev"])
+
+        second = get_photographs(limit=3, after=decode_id_cursor(first["next"])).result
+        self.assertEqual([p["id"] for p in second["results"]], ids[3:6])
+
+        last = get_photographs(limit=3, after=decode_id_cursor(second["next"])).result
+        self.assertEqual([p["id"] for p in last["results"]], ids[6:])
+        self.assertIsNone(last["next"])
+
+        back = get_photographs(limit=3, before=decode_id_cursor(last["prev"])).result
+        self.assertEqual([p["id"] for p in back["results"]], ids[3:6])
+        self.assertEqual(decode_id_cursor(back["prev"]), ids[3])
+
+    def test_filtered_by_photographer(self):
+        photographer = self.photographers[1]
+        result = get_photographs(photographer_id=photographer.id, limit=2).result
+        self.assertEqual(
+            [p["id"] for p in result["results"]], [p.id for p in self.photos if p.photographer == photographer][:2]
+        )
+
+    def test_photographers_paginated(self):
+        result = get_photographers(limit=2).result
+        self.assertEqual([p["id"] for p in result["results"]], [p.id for p in self.photographers[:2]])
+        self.assertIsNotNone(result["next"])
+
+
+class PhotoCacheTests(TestCase):
+    def test_lru_eviction(self):
+        cache = PhotoCache(max_entries=2, ttl=60)
+        for key in ("a", "b", "c"):
+            cache.set(key, key, cache.versions([key]))
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("c"), (True, "c"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "evictions": 1, "entries": 2})
+
+    def test_ttl_expiry(self):
+        cache = PhotoCache(max_entries=2, ttl=0)
+        cache.set("a", "a", cache.versions(["a"]))
+        self.assertEqual(cache.get("a"), (False, None))
+
+    def test_tag_invalidation(self):
+        cache = PhotoCache(max_entries=10, ttl=60)
+        cache.set("a", "a", cache.versions(["tag:a", "shared"]))
+        cache.set("b", "b", cache.versions(["tag:b"]))
+        cache.invalidate("shared")
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("b"), (True, "b"))
+
+    @override_settings(CACHES={"shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_shared_backend(self):
+        # two caches sharing a backend behave like two workers; an invalidation in one is seen by the other
+        worker_a = PhotoCache(max_entries=10, ttl=60, shared_alias="shared")
+        worker_b = PhotoCache(max_entries=10, ttl=60, shared_alias="shared")
+        worker_a.set("a", "a", worker_a.versions(["tag:a"]))
+        self.assertEqual(worker_b.get("a"), (True, "a"))
+        worker_a.invalidate("tag:a")
+        self.assertEqual(worker_b.get("a"), (False, None))
+
+    def test_local_cache_needs_single_worker(self):
+        # several workers only see each other's invalidations through a shared cache
+        for config, enabled in (
+            ({"WORKERS": 1}, True),
+            ({"WORKERS": 4, "SHARED_ALIAS": "shared"}, True),
+            ({"WORKERS": 1, "ENABLED": False}, False),
+        ):
+            with self.subTest(config=config), override_settings(PHOTOS_CACHE=config):
+                self.assertEqual(_build_photo_cache().enabled, enabled)
+        with override_settings(PHOTOS_CACHE={"WORKERS": 4}), self.assertLogs("photos.cache", "WARNING"):
+            self.assertFalse(_build_photo_cache().enabled)
+
+    def test_invalidated_at(self):
+        cache = PhotoCache(max_entries=10, ttl=60)
+        self.assertEqual(cache.invalidated_at(cache.versions(["tag:a", "tag:b"])), 0.0)
+        before = time.time()
+        cache.invalidate("tag:b")
+        self.assertGreaterEqual(cache.invalidated_at(cache.versions(["tag:a", "tag:b"])), round(before, 3))
+
+
+class CachedReadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photo = create_photograph(0, cls.photographer)
+
+    def setUp(self):
+        photo_cache.clear()
+
+    def test_photo_reads_cached_until_changed(self):
+        get_photograph(self.photo.id)
+        get_photographs(photographer_id=self.photographer.id)
+        with self.assertNumQueries(0):
+            get_photograph(self.photo.id)
+            get_photographs(photographer_id=self.photographer.id)
+
+        # changes to the photo or its source invalidate the cached detail and lists
+        self.photo.source.tiny = "https://images.example.com/photos/0.jpeg?h=100"
+        self.photo.source.save()
+        self.assertEqual(get_photograph(self.photo.id).result["source"]["tiny"], self.photo.source.tiny)
+        self.photo.title = "renamed"
+        self.photo.save()
+        result = get_photographs(photographer_id=self.photographer.id).result
+        self.assertEqual(result["results"][0]["title"], "renamed")
+
+    def test_user_change_invalidates_photographer(self):
+        self.assertEqual(get_photographer(self.photographer.id).result["user"]["first_name"], "")
+        self.assertEqual(
+            get_photograph(self.photo.id, prefetch_photographer=True).result["photographer"]["id"], self.photographer.id
+        )
+        user = self.photographer.user
+        user.first_name = "Felix"
+        user.save()
+        self.assertEqual(get_photographer(self.photographer.id).result["user"]["first_name"], "Felix")
+        photo = get_photograph(self.photo.id, prefetch_photographer=True).result
+        self.assertEqual(photo["photographer"]["user"]["first_name"], "Felix")
+
+
+class ReadCoalescingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(2)]
+
+    def setUp(self):
+        photo_cache.clear()
+        single_flight.clear()
+
+    def run_threads(self, flights: SingleFlight, call: Callable[[threading.Event], Any], count: int) -> list:
+        """
+        Runs `call` from `count` threads at once, returning their results or exceptions. `call` receives an event
+        its computation should wait for, set once every thread is waiting on it.
+        """
+        release, results = threading.Event(), []
+
+        def run():
+            try:
+                results.append(call(release))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while flights.counters().get("read", (0, 0))[0] < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_threads_share_computation(self):
+        flights, calls = SingleFlight(enabled=True), []
+
+        def compute(release: threading.Event):
+            release.wait(5)
+            calls.append(1)
+            return {"calls": len(calls)}
+
+        results = self.run_threads(flights, lambda release: flights.do("read", "key", lambda: compute(release)), 5)
+        self.assertEqual(results, [{"calls": 1}] * 5)
+        self.assertTrue(all(result is results[0] for result in results))
+
+        # errors are raised in every waiter, and the next call computes anew
+        errors = self.run_threads(flights, lambda release: flights.do("read", "key", lambda: release.wait(5) / 0), 3)
+        self.assertTrue(all(isinstance(error, ZeroDivisionError) for error in errors))
+        self.assertEqual(flights.do("read", "key", lambda: "fresh"), "fresh")
+        self.assertEqual(flights.stats(), {"calls": 9, "coalesced": 6, "ratio": 0.6667, "in_flight": 0})
+
+    def test_event_loops_share_computation(self):
+        # e.g. async views run by `async_to_sync` under WSGI, in an event loop per request
+        flights, calls = SingleFlight(enabled=True), []
+
+        async def compute(release: threading.Event):
+            await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+            calls.append(1)
+            return len(calls)
+
+        def call(release: threading.Event):
+            return asyncio.run(flights.ado("read", "key", lambda: compute(release)))
+
+        self.assertEqual(self.run_threads(flights, call, 4), [1] * 4)
+        self.assertEqual(flights.counters(), {"read": (4, 3)})
+
+    async def test_tasks_share_computation(self):
+        flights, release = SingleFlight(enabled=True), asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "result"
+
+        tasks = [asyncio.create_task(flights.ado("read", "key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # the caller that started the computation gives up, the others still get its result
+        tasks[0].cancel()
+        release.set()
+        self.assertEqual(await asyncio.gather(*tasks[1:]), ["result", "result"])
+        with self.assertRaises(asyncio.CancelledError):
+            await tasks[0]
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("failed")
+
+        errors = await asyncio.gather(*(flights.ado("read", "key", fail) for _ in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+        self.assertEqual(flights.counters(), {"read": (6, 4)})
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    def test_concurrent_reads_share_queries(self):
+        async def read(count: int) -> list[DbResult]:
+            return await asyncio.gather(*(aget_photographs(photographer_id=self.photographer.id) for _ in range(count)))
+
+        with CaptureQueriesContext(connection) as queries:
+            [expected] = async_to_sync(read)(1)
+        photo_cache.clear()
+        with self.assertNumQueries(len(queries)):
+            results = async_to_sync(read)(5)
+        self.assertEqual([result.result for result in results], [expected.result] * 5)
+        self.assertEqual(single_flight.counters()["photographs"], (6, 4))
+
+
+class PhotographValidationTests(SimpleTestCase):
+    def test_model_kwargs(self):
+        url = "https://images.example.com/photos/1.jpeg"
+        data = {"title": " photo ", "url": url, "photographer_id": "1", "source": {"original": url, "tiny": None}}
+        self.assertEqual(
+            validate_photograph(data).data,
+            {"title": "photo", "url": url, "photographer_id": 1, "source": {"original": url, "tiny": None}},
+        )
+        # nulls leave fields unchanged in updates
+        update = validate_photograph({"title": None, "alt_text": "alt", "source": {"tiny": None}}, is_update=True)
+        self.assertEqual(update.data, {"alt_text": "alt", "source": {}})
+
+    def test_model_constraints(self):
+        url = "https://images.example.com/photos/1.jpeg"
+        data = {"title": "photo", "url": url, "photographer_id": 1, "source": {}}
+        for invalid, error in (
+            ({"url": "images.example.com"}, "url"),
+            ({"url": f"{url}?{'a' * PHOTO_URL_MAX_LENGTH}"}, "string_too_long"),
+            ({"source": {"tiny": "ftp:/tiny"}}, "url"),
+            ({"title": "  "}, "string_too_short"),
+            ({"alt_text": "a" * 256}, "string_too_long"),
+            ({"id": 1}, "extra_forbidden"),
+        ):
+            result = validate_photograph({**data, **invalid})
+            self.assertFalse(result.success)
+            self.assertEqual([e["type"] for e in result.errors], [error])
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(replica_routing, "aliases", ["replica"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches[replica_routing.cache_alias].clear()
+        self.router = ReplicaRouter()
+
+    def request(self, user_id: int, write: bool = False, since: Optional[float] = None):
+        """
+        Handles a request of `user_id` (writing first, if `write`), returning the alias its `photos.db` reads use,
+        or whether they lag behind a write made at `since`.
+        """
+
+        @reads_from_replica
+        def read():
+            return self.router.db_for_read(Photograph) if since is None else replica_routing.lagging(since)
+
+        def view(request):
+            replica_routing.set_user(user_id)
+            if write:
+                self.router.db_for_write(Photograph)
+            return read()
+
+        return ReplicaRoutingMiddleware(view)(HttpRequest())
+
+    def test_reads_from_replica(self):
+        self.assertEqual(self.request(1), "replica")
+        # any other read goes to the primary
+        self.assertIsNone(self.router.db_for_read(Photograph))
+        self.assertIsNone(self.router.db_for_write(Photograph))
+
+    def test_read_your_writes(self):
+        self.assertIsNone(self.request(1, write=True))
+        self.assertIsNone(self.request(1))
+        self.assertEqual(self.request(2), "replica")
+        # once the stickiness window is over, the user reads from the replica again
+        caches[replica_routing.cache_alias].clear()
+        self.assertEqual(self.request(1), "replica")
+
+    def test_lagging(self):
+        self.assertTrue(self.request(1, since=time.time()))
+        self.assertFalse(self.request(1, since=time.time() - replica_routing.sticky_seconds))
+        # reads pinned to the primary never lag
+        self.assertFalse(self.request(1, write=True, since=time.time()))
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(3)]
+
+    def setUp(self):
+        photo_cache.clear()
+
+    def test_detail_validators_track_changes(self):
+        photo = self.photos[0]
+        etag = get_photograph_validators(photo.id).result["etag"]
+        photo.source.small = "https://images.example.com/photos/0.jpeg?h=130"
+        photo.source.save()
+        self.assertNotEqual(get_photograph_validators(photo.id).result["etag"], etag)
+
+        etag = get_photographer_validators(self.photographer.id).result["etag"]
+        self.photographer.user.last_name = "Doe"
+        self.photographer.user.save()
+        self.assertNotEqual(get_photographer_validators(self.photographer.id).result["etag"], etag)
+        self.assertEqual(get_photograph_validators(0).http_code, 404)
+
+    def test_detail_validators_track_nested_photographer(self):
+        photo = self.photos[0]
+        etag = get_photograph_validators(photo.id, prefetch_photographer=True).result["etag"]
+        self.assertNotEqual(get_photograph_validators(photo.id).result["etag"], etag)
+        self.assertNotEqual(get_photograph_validators(photo.id, fields=("id",)).result["etag"], etag)
+        # the photographer's stats change, but the photo doesn't
+        create_photograph(9, self.photographer)
+        validators = get_photograph_validators(photo.id, prefetch_photographer=True).result
+        self.assertNotEqual(validators["etag"], etag)
+        self.assertEqual(validators["last_modified"], Photographer.objects.get(id=self.photographer.id).last_updated)
+
+    def test_page_validators_track_membership(self):
+        etag = get_photographs_validators(limit=2).result["etag"]
+        self.assertIsNone(get_photographs_validators(limit=2).result["last_modified"])
+        self.photos[1].delete()
+        self.assertNotEqual(get_photographs_validators(limit=2).result["etag"], etag)
+        # pages outside the changed window keep their validators
+        etag = get_photographs_validators(limit=1).result["etag"]
+        create_photograph(9, self.photographer)
+        self.assertEqual(get_photographs_validators(limit=1).result["etag"], etag)
+
+
+class ProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photographer.user.first_name = 'Zoë \u2028 "Ansel"'
+        cls.photographer.user.save()
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(3)]
+        # photos without a source serialize it as null
+        cls.photos.append(
+            Photograph.objects.create(
+                title="no source", url="https://images.example.com/x.jpeg", photographer=cls.photographer
+            )
+        )
+
+    def setUp(self):
+        photo_cache.clear()
+
+    def test_matches_serializers(self):
+        querysets = {
+            PhotographerSerializer: Photographer.objects.all(),
+            PhotographSlimSerializer: Photograph.objects.all(),
+            PhotographSerializer: Photograph.objects.all(),
+        }
+        for serializer_class, queryset in querysets.items():
+            projection = get_projection(serializer_class)
+            rows = [projection.to_dict(row) for row in projection.queryset(queryset.order_by("id"))]
+            data = serializer_class(queryset.order_by("id"), many=True).data
+            # compare rendered output too, as key order is part of it
+            self.assertEqual(rows, data)
+            self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(data))
+
+    def test_list_reads_use_projection(self):
+        with self.assertNumQueries(1):
+            result = get_photographs(prefetch_photographer=True).result
+        self.assertEqual(result["results"], PhotographSerializer(Photograph.objects.order_by("id"), many=True).data)
+        self.assertIsNone(result["results"][-1]["source"])
+
+
+def get_source_urls(url: str) -> dict[str, str]:
+    """Returns PhotoSource URLs for `url` following the pattern of `photos.csv`."""
+    suffixes = {
+        "medium": "?auto=compress&cs=tinysrgb&h=350",
+        "small": "?auto=compress&cs=tinysrgb&h=130",
+        "tiny": "?auto=compress&cs=tinysrgb&dpr=1&fit=crop&h=200&w=280",
+        "large": "?auto=compress&cs=tinysrgb&h=650&w=940",
+        "large_2x": "?auto=compress&cs=tinysrgb&dpr=2&h=650&w=940",
+        "portrait": "?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=800",
+        "landscape": "?auto=compress&cs=tinysrgb&fit=crop&h=627&w=1200",
+    }
+    return {"original": url, **{variant: url + suffix for variant, suffix in suffixes.items()}}
+
+
+class SourceTemplateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(3)]
+        for photo in cls.photos[:2]:
+            PhotoSource.objects.filter(photograph=photo).update(**get_source_urls(photo.url))
+
+    def setUp(self):
+        photo_cache.clear()
+        source_templates.clear()
+        self.addCleanup(source_templates.clear)
+
+    def _get_sources(self) -> list[dict]:
+        projection = get_projection(PhotographSerializer)
+        rows = projection.queryset(Photograph.objects.order_by("id"))
+        return [projection.to_dict(row)["source"] for row in rows]
+
+    def test_convert_sources(self):
+        explicit = self._get_sources()
+        self.assertEqual(convert_sources(PhotoSource, SourceTemplate, batch_size=1), 2)
+        self.assertEqual(SourceTemplate.objects.count(), 1)
+        compact = PhotoSource.objects.get(photograph=self.photos[0])
+        self.assertIsNotNone(compact.template_id)
+        self.assertEqual([getattr(compact, variant) for variant in SOURCE_VARIANTS], [None] * len(SOURCE_VARIANTS))
+        # the third source follows no shared pattern, so it's left as it was
+        self.assertIsNone(PhotoSource.objects.get(photograph=self.photos[2]).template_id)
+        self.assertEqual(self._get_sources(), explicit)
+
+        self.assertEqual(convert_sources(PhotoSource, SourceTemplate, compact=False), 2)
+        self.assertFalse(PhotoSource.objects.filter(template__isnull=False).exists())
+        self.assertEqual(self._get_sources(), explicit)
+
+    def test_migration_converts_sources(self):
+        # the migration runs its own copy of `convert_sources`, which must keep converting the same way
+        migration = importlib.import_module("photos.migrations.0006_sourcetemplate_photosource_template")
+        schema_editor = SimpleNamespace(connection=connection)
+        explicit = self._get_sources()
+        migration.compact_sources(django_apps, schema_editor)
+        self.assertEqual(PhotoSource.objects.filter(template__isnull=False).count(), 2)
+        self.assertEqual(self._get_sources(), explicit)
+        migration.expand_sources(django_apps, schema_editor)
+        self.assertFalse(PhotoSource.objects.filter(template__isnull=False).exists())
+        self.assertEqual(self._get_sources(), explicit)
+
+    def test_writes_store_sources_compactly(self):
+        source_templates.ensure([get_source_urls(self.photos[0].url)])
+        urls = get_source_urls("https://images.example.com/photos/new.jpeg")
+        data = {"title": "new", "url": urls["original"], "photographer_id": self.photographer.id, "source": urls}
+        created = serialize_and_save_photograph(validate_photograph(data)).result
+        source = PhotoSource.objects.get(photograph_id=created["id"])
+        self.assertEqual(created["source"], {"id": source.id, **urls})
+        self.assertIsNotNone(source.template_id)
+        self.assertIsNone(source.medium)
+
+        # updating a URL the template rebuilds keeps the other ones as they were
+        update = {"source": {"original": "https://images.example.com/photos/moved.jpeg"}}
+        updated = update_photograph(created["id"], validate_photograph(update, is_update=True)).result
+        self.assertEqual(updated["source"], {"id": source.id, **urls, "original": update["source"]["original"]})
+        self.assertEqual(get_photograph(created["id"]).result["source"], updated["source"])
+        self.assertIsNone(PhotoSource.objects.get(id=source.id).template_id)
+
+
+class ChangeFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(2)]
+
+    def test_cursor_round_trip(self):
+        keys = (None, (self.photos[0].last_updated, self.photos[0].id), None)
+        self.assertEqual(decode_changes_cursor(encode_changes_cursor(*keys)), keys)
+        for values in ([None], [None, None, ["2026-01-01T00:00:00", 1]], [None, None, ["2026-01-01T00:00:00Z", True]]):
+            with self.assertRaises(InvalidCursor):
+                decode_changes_cursor(encode_cursor(*values))
+
+    def test_reports_settled_changes(self):
+        # changes younger than the settle window aren't reported yet, and the cursor doesn't move past them
+        result = get_changes().result
+        self.assertEqual((result["photos"], result["has_more"]), ([], False))
+        self.assertEqual(decode_changes_cursor(result["next"]), (None, None, None))
+        with mock.patch("photos.db.CHANGES_SETTLE_SECONDS", 0):
+            result = get_changes().result
+        self.assertEqual([photo["id"] for photo in result["photos"]], [photo.id for photo in self.photos])
+        self.assertEqual(result["photos"][0], get_photograph(self.photos[0].id).result)
+
+    def test_deletes_leave_tombstones(self):
+        photographer_id, photo_ids = self.photographer.id, [photo.id for photo in self.photos]
+        self.photographer.user.delete()
+        tombstones = Tombstone.objects.order_by("id").values_list("kind", "record_id")
+        self.assertCountEqual(
+            tombstones, [*((Tombstone.PHOTOGRAPH, id) for id in photo_ids), (Tombstone.PHOTOGRAPHER, photographer_id)]
+        )
+        with mock.patch("photos.db.CHANGES_SETTLE_SECONDS", 0):
+            result = get_changes(limit=2).result
+        self.assertEqual(len(result["deleted"]), 2)
+        self.assertTrue(result["has_more"])
+        with mock.patch("photos.db.CHANGES_SETTLE_SECONDS", 0):
+            result = get_changes(since=decode_changes_cursor(result["next"])).result
+        self.assertEqual(len(result["deleted"]), 1)
+
+
+class PhotoEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+
+    def setUp(self):
+        # dispatch in the test loop only, without a LISTEN connection
+        patcher = mock.patch.object(PhotoEvents, "uses_notify", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.events = PhotoEvents(
+            enabled=True, channel="test", queue_size=2, heartbeat_seconds=0.01, reconnect_seconds=0
+        )
+
+    def test_writes_publish_on_commit(self):
+        with mock.patch.object(photo_events, "_send") as send:
+            # the source created along with the photo isn't an update of it
+            with self.captureOnCommitCallbacks(execute=True):
+                photo = create_photograph(0, self.photographer)
+            id, pid = photo.id, self.photographer.id
+            last_updated = Photograph.objects.get(id=id).last_updated
+            self.assertEqual(last_updated, photo.last_updated)
+            # changing it later is
+            with self.captureOnCommitCallbacks(execute=True):
+                photo.source.small = "https://images.example.com/photos/0.jpeg?h=130"
+                photo.source.save()
+            self.assertGreater(Photograph.objects.get(id=id).last_updated, last_updated)
+            # deleting the photo deletes its source, which isn't an update either
+            with self.captureOnCommitCallbacks(execute=True):
+                photo.delete()
+        self.assertEqual(
+            [call.args[0] for call in send.call_args_list],
+            [[photo_event(PHOTO_CREATED, id, pid)], [photo_event(PHOTO_UPDATED, id, pid)]],
+        )
+
+    async def test_dispatch_filters_and_bounds_subscriptions(self):
+        everything = await self.events.subscribe()
+        own = await self.events.subscribe(photographer_id=1)
+        first, second = photo_event(PHOTO_CREATED, 1, 1), photo_event(PHOTO_UPDATED, 2, 2)
+        self.events.dispatch([first, second])
+        self.assertEqual(own.queue.get_nowait(), first)
+        self.assertTrue(own.queue.empty())
+
+        # the slow subscriber is dropped when its queue is full, and told so after the events it did get
+        self.events.dispatch([photo_event(PHOTO_UPDATED, 1, 1)])
+        self.assertTrue(everything.dropped)
+        self.assertEqual([everything.queue.get_nowait() for _ in range(3)], [first, second, None])
+        self.assertFalse(own.dropped)
+        self.assertEqual(self.events.stats(), {"published": 0, "delivered": 4, "dropped": 1, "subscribers": 1})
+
+    async def test_stream(self):
+        stream = self.events.stream(photographer_id=1)
+        self.assertEqual(await anext(stream), b": subscribed\n\n")
+        self.assertEqual(await anext(stream), b": heartbeat\n\n")
+        self.events.dispatch([photo_event(PHOTO_CREATED, 3, 2), photo_event(PHOTO_CREATED, 4, 1)])
+        self.assertEqual(
+            await anext(stream), b'event: photo.created\ndata: {"type":"photo.created","id":4,"photographer_id":1}\n\n'
+        )
+
+        self.events.dispatch([photo_event(PHOTO_UPDATED, 4, 1)] * 3)
+        chunks = [chunk async for chunk in stream]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[-1], b'event: resync\ndata: {"reason":"dropped"}\n\n')
+        self.assertEqual(self.events.stats()["subscribers"], 0)
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(3)]
+
+    def setUp(self):
+        photo_cache.clear()
+
+    def test_fields_prune_payload_and_columns(self):
+        params = validate_photograph_fields_params({"fields": "source.tiny,id, id"}).data
+        self.assertEqual(params.read_options(), {"fields": ("id", "source.tiny"), "prefetch_photographer": False})
+        with CaptureQueriesContext(connection) as queries:
+            result = get_photographs(**params.read_options()).result
+        self.assertEqual(
+            result["results"][0], {"id": self.photos[0].id, "source": {"tiny": self.photos[0].source.tiny}}
+        )
+        self.assertNotIn("alt_text", queries[0]["sql"])
+        # `tiny` reads `original` too, to rebuild the URL of compact rows
+        self.assertNotIn('"photos_photosource"."medium"', queries[0]["sql"])
+
+        # relations only selected in `fields` aren't joined at all
+        with CaptureQueriesContext(connection) as queries:
+            photo = get_photograph(self.photos[0].id, fields=("title",)).result
+        self.assertEqual(photo, {"title": "photo 0"})
+        self.assertNotIn("photos_photosource", queries[0]["sql"])
+
+    def test_fields_expand_relations(self):
+        params = validate_photograph_fields_params({"fields": "title,photographer.user.username"}).data
+        self.assertTrue(params.prefetch_photographer)
+        photo = get_photograph(self.photos[0].id, **params.read_options()).result
+        self.assertEqual(photo, {"title": "photo 0", "photographer": {"user": {"username": "user.0"}}})
+
+        # pruned payloads are still invalidated by changes to the records they nest
+        user = self.photographer.user
+        user.username = "renamed"
+        user.save()
+        photo = get_photograph(self.photos[0].id, **params.read_options()).result
+        self.assertEqual(photo["photographer"]["user"]["username"], "renamed")
+        photographer = get_photographer(self.photographer.id, fields=("user.username",)).result
+        self.assertEqual(photographer, {"user": {"username": "renamed"}})
+
+        params = validate_photograph_fields_params({"expand": "photographer"}).data
+        photo = get_photograph(self.photos[0].id, **params.read_options()).result
+        self.assertEqual(photo["photographer"]["id"], self.photographer.id)
+
+    def test_unknown_fields_fail_validation(self):
+        self.assertFalse(validate_photograph_fields_params({"fields": "id,password"}).success)
+        self.assertFalse(validate_photograph_fields_params({"fields": "photographer.user.password"}).success)
+        self.assertFalse(validate_photograph_fields_params({"expand": "user"}).success)
+        self.assertIsNone(validate_photograph_fields_params({"fields": ""}).data.fields)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(5)]
+
+    def setUp(self):
+        photo_cache.clear()
+
+    def test_pages_through_matches(self):
+        page = validate_search_params({"q": " photo ", "limit": "2"}).data.model_dump()
+        self.assertEqual(page["q"], "photo")
+        seen: list[int] = []
+        while True:
+            result = search_photographs(**page).result
+            seen += [photo["id"] for photo in result["results"]]
+            if not result["next"]:
+                break
+            page["after"] = decode_rank_cursor(result["next"])
+        self.assertEqual(seen, [photo.id for photo in self.photos])
+
+        # paging backwards returns the previous page
+        result = search_photographs(q="photo", limit=2, before=decode_rank_cursor(result["prev"])).result
+        self.assertEqual([photo["id"] for photo in result["results"]], seen[2:4])
+        self.assertEqual(search_photographs(q="alt 3").result["results"][0]["id"], self.photos[3].id)
+
+    def test_invalid_params_fail_validation(self):
+        self.assertFalse(validate_search_params({"q": " "}).success)
+        for token in (encode_cursor(1), encode_cursor(0.5, "1"), encode_cursor(True, 1)):
+            self.assertFalse(validate_search_params({"q": "photo", "after": token}).success)
+        self.assertEqual(decode_rank_cursor(encode_cursor(0.25, 3)), (0.25, 3))
+
+
+class ColorSearchTests(TestCase):
+    COLORS = ["#ff0000", "#fe0101", "#00ff00", "#0000ff", "#808080", "#7f7f80", "#ffffff", None]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(len(cls.COLORS))]
+        for photo, color in zip(cls.photos, cls.COLORS):
+            photo.avg_color = color
+            photo.save()
+
+    def setUp(self):
+        photo_cache.clear()
+        color_index.clear()
+        self.addCleanup(setattr, color_index, "enabled", color_index.enabled)
+
+    def nearest(self, color: str, limit: int = 3) -> list[tuple[int, float]]:
+        photo_cache.clear()
+        results = get_photographs_by_color(color=color, limit=limit, fields=("id",)).result["results"]
+        return [(photo["id"], photo["distance"]) for photo in results]
+
+    def test_color_components(self):
+        self.assertEqual([round(value, 2) for value in hex_to_lab("#f00")], [53.24, 80.09, 67.2])
+        self.assertIsNone(hex_to_lab("red"))
+        self.assertIsNone(self.photos[-1].color_l)
+        self.assertEqual(validate_color_params({"color": "FF0000", "limit": "5"}).data.color, "#ff0000")
+        for params in ({"color": "#ff00"}, {}, {"color": "#ff0000", "limit": "101"}):
+            self.assertFalse(validate_color_params(params).success)
+
+    def test_index_matches_scan(self):
+        for color in ("#ff0000", "#777777", "#00f", "#123456"):
+            indexed = self.nearest(color, limit=10)
+            color_index.enabled = False
+            scanned = self.nearest(color, limit=10)
+            color_index.enabled = True
+            self.assertEqual([id for id, _ in indexed], [id for id, _ in scanned])
+            for (_, indexed_distance), (_, scanned_distance) in zip(indexed, scanned):
+                self.assertAlmostEqual(indexed_distance, scanned_distance, places=2)
+        self.assertEqual(len(self.nearest("#000000", limit=100)), len(self.COLORS) - 1)
+        self.assertEqual([id for id, _ in self.nearest("#ff0000", limit=2)], [p.id for p in self.photos[:2]])
+
+    def test_index_tracks_changes(self):
+        self.assertEqual(self.nearest("#00ff00", limit=1)[0][0], self.photos[2].id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.photos[2].delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.photos[3].avg_color = "#00ff00"
+            self.photos[3].save(update_fields=["avg_color"])
+        self.assertEqual(self.nearest("#00ff00", limit=1), [(self.photos[3].id, 0.0)])
+        self.assertEqual(Photograph.objects.get(id=self.photos[3].id).color_lab, self.photos[3].color_lab)
+
+        # photos created elsewhere are picked up before searching
+        create_photograph(100, self.photographer)
+        self.assertEqual(self.nearest("#333831", limit=1), [(Photograph.objects.get(title="photo 100").id, 0.0)])
+        self.assertEqual(color_index.stats()["photos"], len(self.COLORS) - 1)
+
+    def test_load_does_not_block_updates(self):
+        load = color_index._load
+
+        def slow_load():
+            # a save committed elsewhere during the load must neither wait for it nor be lost
+            writer = threading.Thread(target=color_index.update, args=(self.photos[0].id, hex_to_lab("#00ff00")))
+            writer.start()
+            writer.join(timeout=5)
+            self.assertFalse(writer.is_alive())
+            return load()
+
+        with mock.patch.object(color_index, "_load", slow_load):
+            self.assertEqual(self.nearest("#00ff00", limit=1), [(self.photos[0].id, 0.0)])
+        self.assertEqual(color_index.stats()["rebuilds"], 1)
+
+
+class PhotographerStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographers = [create_photographer(n) for n in range(2)]
+        cls.photos = [create_photograph(n, cls.photographers[0]) for n in range(3)]
+
+    def setUp(self):
+        photo_cache.clear()
+
+    def stats(self, photographer: Photographer) -> tuple[int, object]:
+        photographer.refresh_from_db()
+        return photographer.photo_count, photographer.latest_photo_date
+
+    def test_tracks_creates_and_deletes(self):
+        self.assertEqual(self.stats(self.photographers[0]), (3, self.photos[2].date_created))
+        self.assertEqual(self.stats(self.photographers[1]), (0, None))
+
+        # deleting an older photo keeps the latest date, deleting the latest recomputes it
+        self.photos[0].delete()
+        self.assertEqual(self.stats(self.photographers[0]), (2, self.photos[2].date_created))
+        self.photos[2].delete()
+        self.assertEqual(self.stats(self.photographers[0]), (1, self.photos[1].date_created))
+
+        # aggregates are served with the record, and cached payloads pick up changes
+        self.assertEqual(get_photographer(id=self.photographers[0].id).result["photo_count"], 1)
+        create_photograph(3, self.photographers[0])
+        self.assertEqual(get_photographer(id=self.photographers[0].id).result["photo_count"], 2)
+
+    def test_reconciles_drift(self):
+        Photographer.objects.filter(id=self.photographers[0].id).update(photo_count=7)
+        Photographer.objects.filter(id=self.photographers[1].id).update(photo_count=1)
+        ids = [photographer.id for photographer in self.photographers]
+        self.assertEqual(reconcile_photographer_stats(dry_run=True), ids)
+        self.assertEqual(self.stats(self.photographers[0])[0], 7)
+
+        out = StringIO()
+        call_command("reconcile_photographer_stats", batch_size=1, stdout=out)
+        self.assertIn("repaired 2 photographers", out.getvalue())
+        self.assertEqual(self.stats(self.photographers[0]), (3, self.photos[2].date_created))
+        self.assertEqual(self.stats(self.photographers[1]), (0, None))
+        self.assertEqual(reconcile_photographer_stats(ids), [])
+
+    def test_deletes_in_bulk(self):
+        # deleting a photographer costs the same statements however many photos it cascades to
+        for n, photo_count in enumerate((1, 5)):
+            photographer = create_photographer(10 + n)
+            for m in range(photo_count):
+                create_photograph(100 * (n + 1) + m, photographer)
+            user = photographer.user
+            # collecting the rows (4 SELECTs), 8 DELETEs and the tombstones' INSERT
+            with self.assertNumQueries(12):
+                user.delete()
+        self.assertEqual(Tombstone.objects.filter(kind=Tombstone.PHOTOGRAPH).count(), 6)
+
+        # photos deleted together are uncounted from each of their photographers in one statement
+        photo = create_photograph(3, self.photographers[1])
+        # collecting the rows (2 SELECTs), 3 DELETEs, the tombstones' INSERT and the stats' UPDATE
+        with self.assertNumQueries(7):
+            Photograph.objects.filter(id__in=[self.photos[2].id, photo.id]).delete()
+        self.assertEqual(self.stats(self.photographers[0]), (2, self.photos[1].date_created))
+        self.assertEqual(self.stats(self.photographers[1]), (0, None))
+
+
+class PhotoRenderingsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.photographer = create_photographer(0)
+        # created before renderings are enabled, so they have none yet
+        cls.photos = [create_photograph(n, cls.photographer) for n in range(3)]
+
+    def setUp(self):
+        photo_cache.clear()
+        patcher = mock.patch.object(photo_renderings, "enabled", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def serialized(self) -> list[dict]:
+        # pages are cached the same way whether they were served from renderings or not
+        photo_cache.clear()
+        with mock.patch.object(photo_renderings, "enabled", False):
+            results = get_photographs(limit=100).result["results"]
+        photo_cache.clear()
+        return results
+
+    def test_pages_served_from_renderings(self):
+        serialized = self.serialized()
+        with self.assertNumQueries(2):
+            records = get_photographs(limit=100).result["results"]
+        # missing renderings are never served, their records are serialized instead
+        self.assertEqual(records, serialized)
+        self.assertFalse(any(isinstance(record, RenderedRecord) for record in records))
+
+        ids = [photo.id for photo in self.photos]
+        self.assertEqual(rebuild_photo_renderings(batch_size=2), {"missing": ids, "stale": [], "drifted": []})
+        photo_cache.clear()
+        with self.assertNumQueries(1):
+            page = get_photographs(limit=2).result
+        self.assertTrue(all(isinstance(record, RenderedRecord) for record in page["results"]))
+        self.assertEqual(page["results"], serialized[:2])
+        self.assertEqual(get_photographs(limit=2, before=ids[2]).result["results"], page["results"])
+        self.assertEqual(async_to_sync(aget_photographs)(limit=100).result["results"], serialized)
+        # options renderings don't cover are serialized
+        self.assertNotIsInstance(get_photographs(fields=("id",)).result["results"][0], RenderedRecord)
+        self.assertNotIsInstance(get_photographs(prefetch_photographer=True).result["results"][0], RenderedRecord)
+
+        # records round trip through shared caches
+        record = page["results"][0]
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        self.assertEqual(pickle.loads(pickle.dumps(record)).content, record.content)
+
+    def test_writes_refresh_renderings(self):
+        urls = get_source_urls("https://images.example.com/photos/new.jpeg")
+        data = {"title": "new", "url": urls["original"], "photographer_id": self.photographer.id, "source": urls}
+        created = serialize_and_save_photograph(validate_photograph(data)).result
+        update = {"title": "renamed", "source": {"tiny": "https://images.example.com/photos/tiny.jpeg"}}
+        update_photograph(self.photos[0].id, validate_photograph(update, is_update=True))
+        bulk = {**data, "url": "https://images.example.com/photos/bulk.jpeg"}
+        bulk_create_photographs([validate_photograph(bulk)])
+        PhotoSource.objects.filter(photograph=self.photos[1]).delete()
+
+        # only the untouched photo is left without a rendering, all others are current
+        report = check_photo_renderings()
+        self.assertEqual(report, {"missing": [self.photos[2].id], "stale": [], "drifted": []})
+        rendered = {rendering.photograph_id: rendering for rendering in PhotographRendering.objects.all()}
+        self.assertEqual(json.loads(rendered[created["id"]].content)["source"], {"id": created["source"]["id"], **urls})
+        self.assertEqual(json.loads(rendered[self.photos[0].id].content)["title"], "renamed")
+        self.assertIsNone(json.loads(rendered[self.photos[1].id].content)["source"])
+        self.assertEqual(get_photographs(limit=100).result["results"], self.serialized())
+
+        # deleting a photo deletes its rendering
+        self.photos[0].delete()
+        self.assertFalse(PhotographRendering.objects.filter(photograph_id=self.photos[0].id).exists())
+
+    def test_checks_and_repairs_drift(self):
+        rebuild_photo_renderings()
+        ids = [photo.id for photo in self.photos]
+        # writes bypassing the receivers leave stale renderings, which are never served
+        Photograph.objects.filter(id=ids[0]).update(title="renamed", last_updated=timezone.now())
+        PhotographRendering.objects.filter(photograph_id=ids[1]).update(content="{}")
+        PhotographRendering.objects.filter(photograph_id=ids[2]).delete()
+        self.assertEqual(get_photographs(limit=100).result["results"][0]["title"], "renamed")
+
+        expected = {"missing": [ids[2]], "stale": [ids[0]], "drifted": [ids[1]]}
+        self.assertEqual(check_photo_renderings(), expected)
+        out = StringIO()
+        call_command("check_photo_renderings", batch_size=1, stdout=out)
+        self.assertIn(f"1 photos drifted: [{ids[1]}]", out.getvalue())
+        self.assertEqual(PhotographRendering.objects.get(photograph_id=ids[1]).content, "{}")
+
+        call_command("check_photo_renderings", repair=True, stdout=out)
+        self.assertIn("repaired 3 photos", out.getvalue())
+        self.assertEqual(check_photo_renderings(), {"missing": [], "stale": [], "drifted": []})
+        self.assertEqual(get_photographs(limit=100).result["results"], self.serialized())
+
+
+class SeedPhotosCommandTests(TestCase):
+    def test_seeds_idempotently(self):
+        self.addCleanup(source_templates.clear)
+        call_command("seed_photos", scale=2, batch_size=4, stdout=StringIO())
+        counts = (UserModel.objects.count(), Photographer.objects.count(), Photograph.objects.count())
+        self.assertEqual(counts[2], PhotoSource.objects.count())
+        self.assertFalse(UserModel.objects.first().has_usable_password())
+        # the sources of `photos.csv` share one URL pattern, so they're stored compactly
+        self.assertFalse(PhotoSource.objects.filter(template__isnull=True).exists())
+
+        # re-runs update the seeded records in place
+        photo = Photograph.objects.first()
+        photo.title = "renamed"
+        photo.save()
+        call_command("seed_photos", scale=2, stdout=StringIO())
+        self.assertEqual((UserModel.objects.count(), Photographer.objects.count(), Photograph.objects.count()), counts)
+        self.assertNotEqual(Photograph.objects.get(id=photo.id).title, "renamed")
+        self.assertEqual(Photograph.objects.filter(url__endswith="?copy=1").count(), counts[2] // 2)
+        self.assertEqual(reconcile_photographer_stats(), [])
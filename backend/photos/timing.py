@@ -0,0 +1,95 @@
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from functools import wraps
+from time import perf_counter
+from typing import Optional
+
+DB_PHASE = "db"
+"""Phase the time spent executing queries (see `time_queries`) is recorded under."""
+
+
+@dataclass
+class RequestTimings:
+    """
+    Holds the time spent in each phase of the request being handled (e.g. `auth`, `validate`, `db`), in seconds,
+    along with the number of queries it executed. Phases may overlap, e.g. the query JWT auth makes to look up the
+    user counts towards both `auth` and `db`.
+    """
+
+    phases: dict[str, float] = field(default_factory=dict)
+    queries: int = 0
+
+    def add(self, phase: str, seconds: float):
+        """Adds `seconds` to the time spent in `phase`."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def start_timings() -> tuple[RequestTimings, Token]:
+    """
+    Starts recording the timings of the current request (see `api.metrics.MetricsMiddleware`), returning them
+    along with the token to pass to `stop_timings`. Context variables are copied into the threads `sync_to_async`
+    runs code in, so phases timed there are recorded as well.
+    """
+    timings = RequestTimings()
+    return timings, _request_timings.set(timings)
+
+
+def stop_timings(token: Token):
+    """Stops recording the timings started by `start_timings`."""
+    _request_timings.reset(token)
+
+
+class timed:
+    """
+    Records the time spent in a block (`with timed("auth"): ...`), or in every call of a decorated function
+    (`@timed("validate")`), as `phase` of the current request. Does nothing outside of a timed request.
+    """
+
+    __slots__ = ("phase", "_timings", "_start")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self._timings = _request_timings.get()
+        if self._timings is not None:
+            self._start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self._timings is not None:
+            self._timings.add(self.phase, perf_counter() - self._start)
+
+    def __call__(self, func):
+        phase = self.phase
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _request_timings.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings.add(phase, perf_counter() - start)
+
+        return wrapper
+
+
+def time_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper (see `connection.execute_wrapper`) counting the queries of the current request and recording
+    the time spent executing them as its `DB_PHASE`. Installed on every connection by `photos.signals`.
+    """
+    timings = _request_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add(DB_PHASE, perf_counter() - start)
+        timings.queries += 1
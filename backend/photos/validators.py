@@ -1,51 +1,324 @@
 from dataclasses import dataclass
-from typing import Annotated, Any, Optional
+from datetime import datetime
+from typing import Annotated, Any, ClassVar, Literal, Optional
 
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import URLValidator
 from pydantic import (
+    AfterValidator,
     BaseModel,
     ConfigDict,
+    Field,
+    RootModel,
     StringConstraints,
+    TypeAdapter,
     ValidationError,
+    field_validator,
+    model_validator,
+    with_config,
 )
+from pydantic_core import PydanticCustomError
+from typing_extensions import NotRequired, TypedDict
+
+from photos.color_index import DEFAULT_COLOR_LIMIT, MAX_COLOR_LIMIT
+from photos.colors import parse_hex
+from photos.models import PHOTO_URL_MAX_LENGTH
+from photos.pagination import (
+    DEFAULT_PAGE_LIMIT,
+    MAX_PAGE_LIMIT,
+    decode_changes_cursor,
+    decode_id_cursor,
+    decode_rank_cursor,
+)
+from photos.serializers import PhotographerSerializer, PhotographSerializer, get_field_paths
+from photos.timing import timed
+
+MAX_BULK_PHOTOGRAPHS = 5000
+"""Upper bound on the number of photos in a single bulk create request."""
+
+MAX_BATCH_IDS = 500
+"""Upper bound on the number of IDs resolved by a single batch read (`?ids=`)."""
 
 NameField = Annotated[str, StringConstraints(max_length=50)]
 """Provides constraints for a str field representing a name."""
 
 
-class PhotoSourceValidator(BaseModel):
-    """Validator for PhotoSource payloads."""
+_url_validator = URLValidator()
+
+
+def _check_url(value: str) -> str:
+    # the check `PhotoURLField` (Django's `URLValidator`, its regexes are compiled once) makes on save
+    try:
+        _url_validator(value)
+    except DjangoValidationError:
+        raise PydanticCustomError("url", "Enter a valid URL.") from None
+    return value
+
+
+TextField = Annotated[
+    str, StringConstraints(strip_whitespace=True, min_length=1, max_length=255, pattern=r"^[^\x00]*$")
+]
+"""Provides the constraints of a non-blank `CharField(max_length=255)`, trimmed like the DRF serializers do."""
+
+PhotoURL = Annotated[
+    str,
+    StringConstraints(strip_whitespace=True, min_length=1, max_length=PHOTO_URL_MAX_LENGTH),
+    AfterValidator(_check_url),
+]
+"""Provides the constraints of a `PhotoURLField`."""
+
+
+@with_config(ConfigDict(extra="forbid"))
+class PhotoSourceData(TypedDict, total=False):
+    """PhotoSource payload, validated into `PhotoSource` model kwargs."""
+
+    original: Optional[PhotoURL]
+    medium: Optional[PhotoURL]
+    small: Optional[PhotoURL]
+    tiny: Optional[PhotoURL]
+    large: Optional[PhotoURL]
+    large_2x: Optional[PhotoURL]
+    portrait: Optional[PhotoURL]
+    landscape: Optional[PhotoURL]
+
+
+@with_config(ConfigDict(extra="forbid"))
+class PhotographData(TypedDict):
+    """Payload for creating a new Photograph record, validated into `Photograph` model kwargs (and its `source`)."""
 
-    model_config = ConfigDict(extra="forbid")
-    original: Optional[str] = None
-    medium: Optional[str] = None
-    small: Optional[str] = None
-    tiny: Optional[str] = None
-    large: Optional[str] = None
-    large_2x: Optional[str] = None
-    portrait: Optional[str] = None
-    landscape: Optional[str] = None
+    title: TextField
+    url: PhotoURL
+    photographer_id: int
+    source: PhotoSourceData
+    avg_color: NotRequired[Optional[TextField]]
+    alt_text: NotRequired[Optional[TextField]]
 
 
-class PhotographValidator(BaseModel):
-    """Validator for creating a new Photograph record."""
+@with_config(ConfigDict(extra="forbid"))
+class PhotographUpdateData(TypedDict, total=False):
+    """Payload for updating a Photograph record, validated into the `Photograph` (and `source`) fields to set."""
 
-    model_config = ConfigDict(extra="forbid")
-    title: str
-    url: str
-    source: PhotoSourceValidator
-    avg_color: Optional[str] = None
-    alt_text: Optional[str] = None
+    title: Optional[TextField]
+    url: Optional[PhotoURL]
+    source: Optional[PhotoSourceData]
+    avg_color: Optional[TextField]
+    alt_text: Optional[TextField]
 
 
-class PhotographUpdateValidator(BaseModel):
-    """Validator used for updating a Photograph record."""
+# built once, validation then runs entirely in pydantic-core
+_photograph_adapter: TypeAdapter[PhotographData] = TypeAdapter(PhotographData)
+_photograph_update_adapter: TypeAdapter[PhotographUpdateData] = TypeAdapter(PhotographUpdateData)
+
+
+class PhotographBatchValidator(RootModel[Annotated[list[Any], Field(min_length=1, max_length=MAX_BULK_PHOTOGRAPHS)]]):
+    """Validator for the shape of a bulk create payload, a list of Photograph payloads (validated individually)."""
+
+
+class BulkParamsValidator(BaseModel):
+    """Validator for bulk create query params (`?partial=`)."""
+
+    model_config = ConfigDict(extra="ignore")
+    partial: bool = False
+
+
+class PageParamsValidator(BaseModel):
+    """Validator for keyset pagination query params on list endpoints (`?limit=`, `?after=`, `?before=`)."""
+
+    model_config = ConfigDict(extra="ignore")
+    limit: Annotated[int, Field(ge=1, le=MAX_PAGE_LIMIT)] = DEFAULT_PAGE_LIMIT
+    after: Optional[int] = None
+    before: Optional[int] = None
+
+    @field_validator("after", "before", mode="before")
+    @classmethod
+    def decode_cursor(cls, value: Any) -> Optional[int]:
+        # cursors are opaque strings to clients, decode them into the `id` key they hold
+        return decode_id_cursor(value) if value else None
+
+    @model_validator(mode="after")
+    def check_single_direction(self) -> "PageParamsValidator":
+        if self.after is not None and self.before is not None:
+            raise ValueError("Only one of `after` or `before` may be provided")
+        return self
+
+
+class SearchParamsValidator(BaseModel):
+    """
+    Validator for photo search query params (`?q=`), along with keyset pagination params on the `(rank, id)` key
+    of search results (`?limit=`, `?after=`, `?before=`).
+    """
+
+    model_config = ConfigDict(extra="ignore")
+    q: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=200)]
+    limit: Annotated[int, Field(ge=1, le=MAX_PAGE_LIMIT)] = DEFAULT_PAGE_LIMIT
+    after: Optional[tuple[float, int]] = None
+    before: Optional[tuple[float, int]] = None
+
+    @field_validator("after", "before", mode="before")
+    @classmethod
+    def decode_cursor(cls, value: Any) -> Optional[tuple[float, int]]:
+        # cursors are opaque strings to clients, decode them into the `(rank, id)` key they hold
+        return decode_rank_cursor(value) if value else None
+
+    @model_validator(mode="after")
+    def check_single_direction(self) -> "SearchParamsValidator":
+        if self.after is not None and self.before is not None:
+            raise ValueError("Only one of `after` or `before` may be provided")
+        return self
+
+
+class ColorParamsValidator(BaseModel):
+    """
+    Validator for nearest-color query params: `?color=` (a `#RRGGBB` or `#RGB` hex color, the `#` is optional as it
+    has to be escaped in URLs) and `?limit=`. The color is returned normalized as lowercase `#rrggbb`, so equivalent
+    colors share cache entries.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+    color: str
+    limit: Annotated[int, Field(ge=1, le=MAX_COLOR_LIMIT)] = DEFAULT_COLOR_LIMIT
+
+    @field_validator("color", mode="before")
+    @classmethod
+    def normalize_color(cls, value: Any) -> str:
+        rgb = parse_hex(value) if isinstance(value, str) else None
+        if rgb is None:
+            raise ValueError("Color must be a hex color, e.g. `#1e90ff`")
+        return "#{:02x}{:02x}{:02x}".format(*rgb)
+
+
+class ExportParamsValidator(BaseModel):
+    """Validator for catalog export query params (`?format=`, `?photographer_id=`, `?after_id=`)."""
+
+    model_config = ConfigDict(extra="ignore")
+    format: Literal["ndjson", "json"] = "ndjson"
+    photographer_id: Annotated[Optional[int], Field(ge=1)] = None
+    after_id: Annotated[Optional[int], Field(ge=0)] = None
+
+
+class EventsParamsValidator(BaseModel):
+    """Validator for live event stream query params (`?photographer_id=`, all photos if not provided)."""
+
+    model_config = ConfigDict(extra="ignore")
+    photographer_id: Annotated[Optional[int], Field(ge=1)] = None
+
+
+class ChangesParamsValidator(BaseModel):
+    """
+    Validator for change feed query params: `?since=` (the `next` cursor of the previous sync, from the start if
+    not provided) and `?limit=` (records per stream).
+    """
+
+    model_config = ConfigDict(extra="ignore")
+    since: Optional[tuple[Optional[tuple[datetime, int]], ...]] = None
+    limit: Annotated[int, Field(ge=1, le=MAX_PAGE_LIMIT)] = DEFAULT_PAGE_LIMIT
+
+    @field_validator("since", mode="before")
+    @classmethod
+    def decode_cursor(cls, value: Any) -> Optional[tuple[Optional[tuple[datetime, int]], ...]]:
+        # cursors are opaque strings to clients, decode them into the position in each stream they hold
+        return decode_changes_cursor(value) if value else None
+
+
+BatchIds = Annotated[tuple[Annotated[int, Field(ge=1)], ...], Field(min_length=1, max_length=MAX_BATCH_IDS)]
+"""Provides the constraints of the IDs requested by a batch read."""
+
+
+class IdsParamsValidator(BaseModel):
+    """
+    Validator for batch read query params on list endpoints: `?ids=` (comma separated IDs of the records to return,
+    in that order). Repeated IDs are dropped, keeping the first. If it's not provided, `ids` is None and the
+    endpoint returns a page as usual.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+    ids: Optional[BatchIds] = None
 
-    model_config = ConfigDict(extra="forbid")
-    title: Optional[str] = None
-    url: Optional[str] = None
-    source: Optional[PhotoSourceValidator] = None
-    avg_color: Optional[str] = None
-    alt_text: Optional[str] = None
+    @field_validator("ids", mode="before")
+    @classmethod
+    def split_list(cls, value: Any) -> Any:
+        # lists are passed as comma separated strings
+        if isinstance(value, str):
+            return tuple(item.strip() for item in value.split(",") if item.strip())
+        return value
+
+    @field_validator("ids")
+    @classmethod
+    def drop_repeats(cls, value: Optional[tuple[int, ...]]) -> Optional[tuple[int, ...]]:
+        return tuple(dict.fromkeys(value)) if value is not None else None
+
+
+class FieldsParamsValidator(BaseModel):
+    """
+    Base validator for sparse fieldset query params on read endpoints: `?fields=` (comma separated field paths to
+    return, e.g. `id,title,source.tiny`, see `photos.serializers.prune_fields`) and `?expand=` (comma separated
+    relations to nest). When `fields` is provided, it alone decides which fields (and relations) are returned.
+    Both are returned sorted and deduplicated, so equivalent selections share compiled projections and cache entries.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+    fields: Optional[tuple[str, ...]] = None
+    expand: tuple[str, ...] = ()
+
+    FIELD_PATHS: ClassVar[frozenset[str]] = frozenset()
+    """Field paths accepted by `fields`."""
+    EXPANSIONS: ClassVar[frozenset[str]] = frozenset()
+    """Relations accepted by `expand`."""
+
+    @field_validator("fields", "expand", mode="before")
+    @classmethod
+    def split_list(cls, value: Any) -> Any:
+        # lists are passed as comma separated strings, an empty one is the same as not passing it
+        if isinstance(value, str):
+            return tuple(item.strip() for item in value.split(",") if item.strip())
+        return value
+
+    @field_validator("fields")
+    @classmethod
+    def check_fields(cls, value: Optional[tuple[str, ...]]) -> Optional[tuple[str, ...]]:
+        if not value:
+            return None
+        if unknown := [path for path in value if path not in cls.FIELD_PATHS]:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return tuple(sorted(set(value)))
+
+    @field_validator("expand")
+    @classmethod
+    def check_expand(cls, value: tuple[str, ...]) -> tuple[str, ...]:
+        if unknown := [name for name in value if name not in cls.EXPANSIONS]:
+            raise ValueError(f"Unknown relations: {', '.join(unknown)}")
+        return tuple(sorted(set(value)))
+
+    def read_options(self) -> dict[str, Any]:
+        """Returns the keyword arguments selecting these fields for the read functions in `photos.db`."""
+        return {"fields": self.fields}
+
+
+class PhotographFieldsParamsValidator(FieldsParamsValidator):
+    """
+    Validator for sparse fieldset query params on photo endpoints. `source` is nested by default, `photographer`
+    only when expanded (or selected in `fields`).
+    """
+
+    FIELD_PATHS = frozenset(get_field_paths(PhotographSerializer))
+    EXPANSIONS = frozenset({"photographer", "source"})
+
+    @property
+    def prefetch_photographer(self) -> bool:
+        """Whether the photographer is nested, i.e. the full Photograph serializer is needed."""
+        if self.fields is not None:
+            return any(path.partition(".")[0] == "photographer" for path in self.fields)
+        return "photographer" in self.expand
+
+    def read_options(self) -> dict[str, Any]:
+        return {**super().read_options(), "prefetch_photographer": self.prefetch_photographer}
+
+
+class PhotographerFieldsParamsValidator(FieldsParamsValidator):
+    """Validator for sparse fieldset query params on photographer endpoints. `user` is nested by default."""
+
+    FIELD_PATHS = frozenset(get_field_paths(PhotographerSerializer))
+    EXPANSIONS = frozenset({"user"})
 
 
 @dataclass
@@ -56,17 +329,25 @@ class ValidatedData:
     If `success` is False, the `data` property will be null and `errors` will be populated.
     """
 
-    data: BaseModel | None
+    data: BaseModel | dict[str, Any] | None
     success: bool
     errors: list[dict[str, Any]] | None
 
 
+@timed("validate")
 def validate_photograph(data: dict[str, Any], is_update: Optional[bool] = False) -> ValidatedData:
-    """Validates incoming new Photograph data and returns the result."""
-    validated_data: BaseModel | None = None
+    """
+    Validates incoming new Photograph data (or an update, if `is_update`) and returns the result. The validated
+    data holds model kwargs, with the `source` kwargs nested; as in an update `null` means "unchanged", nulls are
+    dropped from updates. Every field constraint of the models is checked, only uniqueness is left to the database.
+    """
+    validated_data: dict[str, Any] | None = None
     errors: list[dict[str, Any]] | None = None
     try:
-        validated_data = PhotographUpdateValidator(**data) if is_update else PhotographValidator(**data)
+        if is_update:
+            validated_data = _drop_nulls(_photograph_update_adapter.validate_python(data))
+        else:
+            validated_data = _photograph_adapter.validate_python(data)
     except ValidationError as e:
         errors = e.errors()
     return ValidatedData(
@@ -76,3 +357,209 @@ def validate_photograph(data: dict[str, Any], is_update: Optional[bool] = False)
             "errors": errors,
         }
     )
+
+
+def _drop_nulls(data: dict[str, Any]) -> dict[str, Any]:
+    return {
+        key: _drop_nulls(value) if isinstance(value, dict) else value
+        for key, value in data.items()
+        if value is not None
+    }
+
+
+@timed("validate")
+def validate_page_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming pagination query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = PageParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_search_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming photo search query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = SearchParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_color_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming nearest-color query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = ColorParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_changes_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming change feed query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = ChangesParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_events_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming live event stream query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = EventsParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_export_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming catalog export query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = ExportParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_photograph_batch(data: Any) -> ValidatedData:
+    """Validates the shape of an incoming bulk create payload and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = PhotographBatchValidator(data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False, include_input=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_bulk_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming bulk create query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = BulkParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_ids_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming batch read query params and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = IdsParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_photograph_fields_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming sparse fieldset query params for photo endpoints and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = PhotographFieldsParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )
+
+
+@timed("validate")
+def validate_photographer_fields_params(data: dict[str, Any]) -> ValidatedData:
+    """Validates incoming sparse fieldset query params for photographer endpoints and returns the result."""
+    validated_data: BaseModel | None = None
+    errors: list[dict[str, Any]] | None = None
+    try:
+        validated_data = PhotographerFieldsParamsValidator(**data)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_context=False)
+    return ValidatedData(
+        **{
+            "data": validated_data,
+            "success": True if errors is None else False,
+            "errors": errors,
+        }
+    )